@@ -1,24 +1,348 @@
-from flask import Flask, render_template, request, redirect, session
+import math
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from flask import Flask, render_template, request, redirect, session, jsonify, abort, \
+    make_response, send_from_directory, Response, g, before_render_template, template_rendered
+from flask.sessions import SecureCookieSession, SessionInterface
 from models.AuthManager import AuthManager
-from controllers.SystemController import SystemController
+from controllers.SystemController import SystemController, CheckoutError
+from storage.RepositoryFactory import createRepository
+from storage.IDAllocator import IDAllocator
+from storage.RateLimiter import ConcurrencyLimiter, TokenBucketLimiter
+from storage.ResponseCache import ResponseCache
+from storage.SessionStore import SessionStore, SqliteSessionBackend
+from storage.Metrics import metrics
+from storage.Profiler import SlowRequestProfiler
+import config
 
 app = Flask(__name__)
 app.secret_key = "secret123"   # Needed for login session
 
-auth = AuthManager()
-system = SystemController()
+# one storage backend (config.STORAGE_MODE) shared by users and the rest of the data
+repo = createRepository()
+ids = IDAllocator(config.COUNTER_FILE, config.ID_BLOCK_SIZE)
+auth = AuthManager(repo=repo, ids=ids)
+system = SystemController(repo=repo, ids=ids)
+
+# rendered pages and JSON, dropped when the controller changes what they show
+responseCache = ResponseCache(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL)
+system.addListener(responseCache.invalidate)
+
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = config.STATIC_MAX_AGE
+
+# ============================================================
+# SESSIONS (server-side, the cookie only carries the session ID)
+# ============================================================
+sessionStore = SessionStore(config.SESSION_MAX_ENTRIES, config.SESSION_TTL,
+                            SqliteSessionBackend(config.SESSION_FILE)
+                            if config.SESSION_BACKEND == "sqlite" else None,
+                            config.SESSION_RECHECK)
+
+class ServerSession(SecureCookieSession):
+    """Flask's session dict, backed by a StoredSession of sessionStore."""
+
+    def __init__(self, initial=None, stored=None):
+        super().__init__(initial)
+        self.stored = stored
+
+class ServerSessionInterface(SessionInterface):
+    def open_session(self, app, request):
+        stored = sessionStore.get(request.cookies.get(self.get_cookie_name(app)))
+        return ServerSession(stored.data if stored else None, stored)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            # logout (session.clear())
+            if session.stored is not None:
+                sessionStore.revoke(session.stored.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+
+        if session.stored is None or session.get("userID") != session.stored.userID:
+            # a login gets a new ID, so an ID handed out before it is never trusted after it
+            if session.stored is not None:
+                sessionStore.revoke(session.stored.sid)
+            session.stored = sessionStore.create(session)
+        else:
+            sessionStore.save(session.stored, session)
+
+        response.set_cookie(name, session.stored.sid,
+                            expires=datetime.fromtimestamp(session.stored.expires, timezone.utc),
+                            httponly=self.get_cookie_httponly(app), secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app), domain=domain, path=path)
+
+app.session_interface = ServerSessionInterface()
+
+def loggedInUser():
+    """The logged-in user object, looked up once per session (None if not logged in)."""
+    stored = session.stored
+    if stored is None or stored.userID is None:
+        return None
+    if stored.user is None:
+        stored.user = auth.getUserByID(stored.userID)
+    return stored.user
+
+def loggedInAdmin():
+    """
+    The logged-in user if they are an admin, else None. The admin flag comes
+    from the stored user row, read again on every call (not from the session),
+    so taking it away locks the user out at their next admin request.
+    Reading it catches up with the storage (the write lock): only for
+    admin-only actions, pages for everyone use loggedInUser().
+    """
+    stored = session.stored
+    if stored is None or stored.userID is None:
+        return None
+    stored.user = auth.reloadUser(stored.userID)
+    return stored.user if stored.user is not None and stored.user.isAdmin else None
+
+def adminOnly(view):
+    """403 unless loggedInAdmin(); put it above @cached so cached answers are checked too."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if loggedInAdmin() is None:
+            return jsonify({"error": "Admins only"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def _role():
+    # cache key of a perUser page: the session's user object, no storage read
+    user = loggedInUser()
+    return (user.userID, bool(user.isAdmin)) if user is not None else None
+
+def cached(*tags, perUser=False):
+    """
+    Serves GET requests of a view from responseCache, with ETag / Last-Modified
+    and 304 answers. `tags` are the collections the response is built from.
+    Pages that depend on the session use perUser=True (keyed by the logged-in
+    user and whether they are an admin, so login checks inside the view
+    still run for anyone else). Only 200 responses are stored.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET":
+                return view(*args, **kwargs)
+
+            key = (request.full_path, _role() if perUser else None)
+            entry = responseCache.get(key)
+            if entry is None:
+                # taken first: a change committed while the view runs keeps its result out of the cache
+                generation = responseCache.generation(tags)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                entry = responseCache.put(key, response.get_data(), response.mimetype, tags, generation)
+
+            response = Response(entry.body, mimetype=entry.mimetype)
+            response.set_etag(entry.etag)
+            response.last_modified = entry.lastModified
+            # browsers keep it, but ask again each time (usually a cheap 304)
+            response.cache_control.no_cache = True
+            if perUser:
+                response.cache_control.private = True
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+# ============================================================
+# REQUEST METRICS
+# ============================================================
+REQUEST_SECONDS = metrics.histogram("snp_http_request_seconds", "Time spent answering requests",
+                                    ["method", "route", "status"])
+TEMPLATE_SECONDS = metrics.histogram("snp_template_seconds", "Time spent rendering templates",
+                                     ["template"])
+
+# opt-in (config.PROFILE_SLOW_REQUESTS): stacks of slow requests go to PROFILE_DIR
+profiler = SlowRequestProfiler(config.PROFILE_SLOW_REQUESTS, config.PROFILE_INTERVAL_MS / 1000,
+                               config.PROFILE_DIR, config.PROFILE_KEEP) \
+    if config.PROFILE_SLOW_REQUESTS > 0 else None
+
+def _routeLabel():
+    # the URL rule, not the path, so /frontend/<path:filename> is one series
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+@app.before_request
+def startTimer():
+    g.requestStart = time.perf_counter()
+    if profiler:
+        g.profile = profiler.start()
+
+@app.after_request
+def keepStatus(response):
+    g.status = response.status_code
+    return response
+
+@app.teardown_request
+def stopTimer(error=None):
+    if "requestStart" not in g:
+        return
+    route = _routeLabel()
+    REQUEST_SECONDS.observe(time.perf_counter() - g.requestStart, method=request.method,
+                            route=route, status=g.get("status", 500))
+    if profiler and "profile" in g:
+        profiler.stop(g.profile, f"{request.method} {route}")
+
+@before_render_template.connect_via(app)
+def startTemplateTimer(sender, template, context, **extra):
+    g.templateStart = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def stopTemplateTimer(sender, template, context, **extra):
+    if "templateStart" in g:
+        TEMPLATE_SECONDS.observe(time.perf_counter() - g.pop("templateStart"),
+                                 template=template.name or "string")
+
+def _cacheMetrics():
+    return [
+        ("snp_response_cache_hits_total", "Responses served from the cache", "counter", {},
+         responseCache.hits),
+        ("snp_response_cache_misses_total", "Cacheable responses that had to be built", "counter", {},
+         responseCache.misses),
+        ("snp_response_cache_entries", "Responses held in the cache", "gauge", {},
+         len(responseCache.entries)),
+        ("snp_sessions_in_memory", "Sessions held in memory by this worker", "gauge", {},
+         len(sessionStore.entries)),
+        ("snp_idempotent_replays_total", "Retried purchases answered from the dedup cache", "counter",
+         {}, system.completed.hits),
+    ]
+
+def _writeBehindMetrics():
+    queue = repo.getMetrics().get("writeBehind")
+    if not queue:
+        return []
+    return [
+        ("snp_write_behind_queue_depth", "Changes waiting to be written", "gauge", {},
+         queue["queueDepth"]),
+        ("snp_write_behind_lag_seconds", "How long the oldest change not on disk yet has waited",
+         "gauge", {}, queue["lagSeconds"]),
+        ("snp_write_behind_last_flush_seconds", "Duration of the last background flush", "gauge", {},
+         queue["lastFlushMs"] / 1000),
+        ("snp_write_behind_flushes_total", "Background flushes", "counter", {}, queue["flushes"]),
+        ("snp_write_behind_failures_total", "Background flushes that failed", "counter", {},
+         queue["failures"]),
+    ]
+
+metrics.addCollector(_cacheMetrics)
+metrics.addCollector(_writeBehindMetrics)
+
+@app.route("/metrics")
+def prometheus_metrics():
+    # for the Prometheus scraper: keep it off the public network (or turn it off)
+    if not config.METRICS_ENABLED:
+        return jsonify({"error": "Metrics are turned off"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# ============================================================
+# RATE LIMITING AND ADMISSION CONTROL
+# ============================================================
+REJECTED = metrics.counter("snp_rate_limited_total", "Requests refused with a 429",
+                           ["group", "reason"])
+ADMISSION_WAIT = metrics.histogram("snp_admission_wait_seconds",
+                                   "Time requests waited for a free place", ["group"])
+
+class LimitGroup:
+    """The buckets and the concurrency limit of one config.RATE_LIMITS entry."""
+
+    def __init__(self, name, settings):
+        self.name = name
+        self.perIP = TokenBucketLimiter(*settings["perIP"]) if settings.get("perIP") else None
+        self.perUser = TokenBucketLimiter(*settings["perUser"]) if settings.get("perUser") else None
+        self.concurrency = ConcurrencyLimiter(settings["concurrency"], settings.get("queue", 0),
+                                              settings.get("queueTimeout", 1.0)) \
+            if settings.get("concurrency") else None
+        self.retryAfter = settings.get("retryAfter", 1)
+
+limitGroups = {name: LimitGroup(name, settings) for name, settings in config.RATE_LIMITS.items()}
+
+def _tooMany(group, reason, wait):
+    REJECTED.inc(group=group.name, reason=reason)
+    response = jsonify({"error": "Too many requests, please try again shortly."})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+    return response
+
+def limited(name, userKey):
+    """
+    Applies the limits of config.RATE_LIMITS[name] to the POST requests of
+    a view: per client IP, per user (userKey() gives the key, None skips
+    that bucket), then the group's concurrency limit. Over a limit the
+    answer is a 429 with Retry-After, before any real work is done.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            group = limitGroups.get(name)
+            if not config.RATE_LIMIT_ENABLED or group is None or request.method != "POST":
+                return view(*args, **kwargs)
+
+            if group.perIP:
+                wait = group.perIP.take(request.remote_addr)
+                if wait:
+                    return _tooMany(group, "ip", wait)
+            key = userKey()
+            if group.perUser and key:
+                wait = group.perUser.take(key)
+                if wait:
+                    return _tooMany(group, "user", wait)
+
+            if group.concurrency is None:
+                return view(*args, **kwargs)
+            start = time.perf_counter()
+            if not group.concurrency.acquire():
+                return _tooMany(group, "busy", group.retryAfter)
+            ADMISSION_WAIT.observe(time.perf_counter() - start, group=name)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                group.concurrency.release()
+        return wrapper
+    return decorator
+
+def _limitMetrics():
+    rows = []
+    for name, group in limitGroups.items():
+        if group.concurrency:
+            rows.append(("snp_admission_active", "Requests running inside a concurrency limit",
+                         "gauge", {"group": name}, group.concurrency.active))
+    for name, group in limitGroups.items():
+        if group.concurrency:
+            rows.append(("snp_admission_waiting", "Requests queued for a concurrency limit",
+                         "gauge", {"group": name}, group.concurrency.waiting))
+    return rows
+
+metrics.addCollector(_limitMetrics)
 
 # ============================================================
 # HOME PAGE
 # ============================================================
 @app.route("/")
+@cached()
 def home():
     return render_template("home.html")
 
+# ============================================================
+# FRONTEND PAGES AND IMAGES (conditional GET: ETag / Last-Modified)
+# ============================================================
+@app.route("/frontend/")
+@app.route("/frontend/<path:filename>")
+def frontend(filename="homepage.html"):
+    return send_from_directory("frontend", filename, max_age=config.STATIC_MAX_AGE)
+
 # ============================================================
 # LOGIN PAGE
 # ============================================================
 @app.route("/login", methods=["GET", "POST"])
+@limited("login", lambda: request.form.get("username"))
 def login():
     if request.method == "POST":
         username = request.form["username"]
@@ -29,7 +353,6 @@ def login():
         if user:
             session["userID"] = user.userID
             session["username"] = user.username
-            session["isAdmin"] = user.isAdmin
             return redirect("/dashboard")
         else:
             return render_template("login.html", error="Invalid username or password")
@@ -42,7 +365,7 @@ def login():
 @app.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
-        userID = f"U{len(auth.users)+1}"
+        userID = auth.nextUserID()
         username = request.form["username"]
         password = request.form["password"]
         email = request.form["email"]
@@ -63,18 +386,73 @@ def register():
 # DASHBOARD
 # ============================================================
 @app.route("/dashboard")
+@cached("statistics", perUser=True)
 def dashboard():
     if "username" not in session:
         return redirect("/login")
 
+    user = loggedInUser()
+    isAdmin = user is not None and user.isAdmin
+    report = system.statistic.generateReport() if isAdmin else None
+
     return render_template("dashboard.html",
                            username=session["username"],
-                           isAdmin=session["isAdmin"])
+                           isAdmin=isAdmin,
+                           report=report)
+
+# ============================================================
+# ADMIN DASHBOARD DATA (JSON)
+# ============================================================
+@app.route("/api/admin/dashboard")
+@adminOnly
+@cached("statistics", perUser=True)
+def admin_dashboard():
+    return jsonify(system.getDashboard())
+
+@app.route("/api/admin/reports")
+@adminOnly
+@cached("orders", "tickets", "merch", "reviews", "catalog", perUser=True)
+def admin_reports():
+    # optional ?from=YYYY-MM-DD&to=YYYY-MM-DD (sale / review dates)
+    return jsonify(system.getReports(request.args.get("from"), request.args.get("to")))
+
+@app.route("/api/admin/storage")
+@adminOnly
+def admin_storage():
+    return jsonify(repo.getMetrics())
+
+@app.route("/api/admin/sessions/revoke", methods=["POST"])
+@adminOnly
+def revoke_sessions():
+    """Logs a user out everywhere, e.g. after their admin flag changed or their account was blocked."""
+    userID = (request.get_json(silent=True) or {}).get("userID")
+    if not userID:
+        return jsonify({"error": "userID is required"}), 400
+
+    # the next login reads the stored user again (other workers: within SESSION_RECHECK)
+    auth.forgetUser(userID)
+    return jsonify({"userID": userID, "revoked": sessionStore.revokeUser(userID)})
+
+# ============================================================
+# IDEMPOTENCY KEYS (retried purchases)
+# ============================================================
+def idempotencyKey():
+    """
+    The client's key for this purchase: the Idempotency-Key header, or an
+    idempotencyKey form field. None if there is none, and then a retry buys
+    again. The shipped frontend/ pages do not post purchases to the server,
+    so only clients of the JSON API that send a key are protected.
+    """
+    key = (request.headers.get("Idempotency-Key") or request.form.get("idempotencyKey") or "").strip()
+    if len(key) > config.IDEMPOTENCY_KEY_MAX:
+        abort(400, f"Idempotency-Key is longer than {config.IDEMPOTENCY_KEY_MAX} characters")
+    return key or None
 
 # ============================================================
 # PURCHASE TICKET
 # ============================================================
 @app.route("/purchase_ticket", methods=["GET", "POST"])
+@limited("purchase", lambda: session.get("userID"))
 def purchase_ticket():
     if "username" not in session:
         return redirect("/login")
@@ -95,37 +473,115 @@ def purchase_ticket():
         }
 
         # find customer object
-        currentUser = next(u for u in auth.users if u.userID == session["userID"])
+        currentUser = loggedInUser()
 
-        system.purchaseTicket(currentUser, ticketData)
-        return render_template("purchase_ticket.html", success=True)
+        if system.purchaseTicket(currentUser, ticketData, idempotencyKey()):
+            return render_template("purchase_ticket.html", success=True)
+        else:
+            return render_template("purchase_ticket.html", error="Not enough tickets left for that date.")
 
     return render_template("purchase_ticket.html")
 
+# ============================================================
+# TICKET AVAILABILITY (JSON, polled by the booking page)
+# ============================================================
+@app.route("/api/availability")
+@cached("capacity")
+def availability():
+    parkName = request.args.get("parkName", "")
+    visitDate = request.args.get("visitDate", "")
+    ticketName = request.args.get("ticketName", "")
+
+    return jsonify({
+        "parkName": parkName,
+        "visitDate": visitDate,
+        "ticketName": ticketName,
+        "available": system.ticketAvailability(parkName, visitDate, ticketName)
+    })
+
 # ============================================================
 # PURCHASE MERCHANDISE
 # ============================================================
 @app.route("/purchase_merch", methods=["GET", "POST"])
+@limited("purchase", lambda: session.get("userID"))
 def purchase_merch():
     if "username" not in session:
         return redirect("/login")
 
     if request.method == "POST":
+        # price, category and stock come from the catalog, not the form
         merchData = {
             "name": request.form["name"],
-            "price": float(request.form["price"]),
-            "qty": int(request.form["qty"]),
-            "category": request.form["category"],
-            "stock": int(request.form["stock"])
+            "qty": int(request.form["qty"])
         }
 
-        currentUser = next(u for u in auth.users if u.userID == session["userID"])
+        currentUser = loggedInUser()
 
-        system.purchaseMerch(currentUser, merchData)
-        return render_template("purchase_merch.html", success=True)
+        if system.purchaseMerch(currentUser, merchData, idempotencyKey()):
+            return render_template("purchase_merch.html", success=True)
+        else:
+            return render_template("purchase_merch.html", error="Sorry, that item is out of stock.")
 
     return render_template("purchase_merch.html")
 
+# ============================================================
+# MERCHANDISE CATALOG (JSON)
+# ============================================================
+@app.route("/api/catalog")
+@cached("catalog")
+def catalog():
+    return jsonify(system.catalog.listItems(request.args.get("category")))
+
+# ============================================================
+# CHECKOUT (JSON, the whole cart in one request)
+# ============================================================
+@app.route("/api/checkout", methods=["POST"])
+@limited("purchase", lambda: session.get("userID"))
+def checkout():
+    if "username" not in session:
+        return jsonify({"error": "Please log in first"}), 401
+
+    body = request.get_json(silent=True) or {}
+    currentUser = loggedInUser()
+
+    try:
+        result = system.checkout(currentUser, body.get("items"), idempotencyKey())
+    except CheckoutError as e:
+        return jsonify({"error": str(e)}), 409
+
+    return jsonify(result), 201
+
+# ============================================================
+# ORDER HISTORY (JSON, paginated)
+# ============================================================
+def order_history(customerID):
+    args = request.args
+    if args.get("when") not in (None, "upcoming", "past") or \
+            args.get("sort") not in (None, "newest", "oldest"):
+        return jsonify({"error": "when must be upcoming/past, sort newest/oldest"}), 400
+
+    return jsonify(system.getOrderHistory(
+        customerID=customerID,
+        status=args.get("status"),
+        parkName=args.get("park"),
+        when=args.get("when"),
+        sort=args.get("sort", "newest"),
+        cursor=args.get("cursor"),
+        limit=args.get("limit", type=int)
+    ))
+
+@app.route("/api/orders")
+def my_orders():
+    if "username" not in session:
+        return jsonify({"error": "Please log in first"}), 401
+
+    return order_history(session["userID"])
+
+@app.route("/api/admin/orders")
+@adminOnly
+def all_orders():
+    return order_history(request.args.get("customerID"))
+
 # ============================================================
 # CANCEL TICKET (REPLACES REFUND)
 # ============================================================
@@ -138,6 +594,11 @@ def cancel_ticket():
         orderID = request.form["orderID"]
         itemID = request.form["itemID"]
 
+        # customers cancel their own orders only, admins any order
+        order = system.getOrder(orderID)
+        if order is not None and order["customerID"] != session["userID"] and loggedInAdmin() is None:
+            abort(403)
+
         if system.cancelTicket(orderID, itemID):
             return render_template("cancel_ticket.html", success=True)
         else:
@@ -157,13 +618,50 @@ def review():
         reviewData = {
             "customerID": session["userID"],
             "rating": int(request.form["rating"]),
-            "comment": request.form["comment"]
+            "comment": request.form["comment"],
+            "parkName": request.form.get("parkName") or None
         }
         system.submitReview(reviewData)
         return render_template("review.html", success=True)
 
     return render_template("review.html")
 
+# ============================================================
+# REVIEW SEARCH, RATINGS AND MODERATION (JSON)
+# ============================================================
+@app.route("/api/reviews/search")
+def search_reviews():
+    # ?q=words&park=...&minRating=4&limit=20
+    query = request.args.get("q", "")
+    if not query.strip():
+        return jsonify({"error": "q is required"}), 400
+
+    return jsonify(system.searchReviews(query, request.args.get("park"),
+                                        request.args.get("minRating", type=int),
+                                        request.args.get("limit", type=int)))
+
+@app.route("/api/reviews/ratings")
+def review_ratings():
+    return jsonify(system.getRatingSummary(request.args.get("park")))
+
+@app.route("/api/admin/reviews/queue")
+@adminOnly
+def moderation_queue():
+    return jsonify(system.getModerationQueue(request.args.get("cursor"),
+                                             request.args.get("limit", type=int)))
+
+@app.route("/api/admin/reviews/<reviewID>/moderate", methods=["POST"])
+@adminOnly
+def moderate_review(reviewID):
+    action = (request.get_json(silent=True) or {}).get("action")
+    if action not in ("approve", "hide"):
+        return jsonify({"error": "action must be approve or hide"}), 400
+
+    row = system.moderateReview(loggedInUser(), reviewID, approve=action == "approve")
+    if row is None:
+        return jsonify({"error": "Review not found"}), 404
+    return jsonify(row)
+
 # ============================================================
 # LOGOUT
 # ============================================================
@@ -175,5 +673,6 @@ def logout():
 # ============================================================
 # RUN APP
 # ============================================================
+# development server; for production use serve.py (asgi.py under uvicorn)
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,121 @@
+"""
+ASGI entry point: the Flask app served by an asyncio server (see serve.py).
+
+    uvicorn asgi:application
+
+The WSGI -> ASGI translation is asgiref's WsgiToAsgi. Connections live on
+the event loop: a client that is slow to send its request or read the
+answer, or that keeps its connection open between pages, costs no thread.
+Only while the app itself runs (views, sessions, storage reads and writes,
+all of them blocking code) does a request use a thread, taken from one of
+two pools:
+- "read": GET / HEAD / OPTIONS (browsing), config.SERVER_THREADS threads
+- "write": every other method (logins, purchases, checkout, moderation),
+  config.SERVER_WRITE_THREADS threads
+so a burst of purchases can never take every thread away from browsing,
+and a crowd of browsers cannot starve the purchases. Purchases stay
+serialized by repo.transaction() (one writer at a time, across worker
+processes too) exactly as under the development server.
+A request whose client disconnects before its body has arrived is
+dropped without running the app.
+On shutdown (after the server stopped taking requests and let the running
+ones finish) the pools are drained and the repository is closed, which
+writes out any write-behind queue.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+from app import app, repo, system
+from storage.Metrics import metrics
+import config
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# larger bodies get a 413 from Flask
+app.config["MAX_CONTENT_LENGTH"] = config.SERVER_MAX_BODY
+
+class ClientDisconnected(Exception):
+    """The client went away before the whole request body arrived."""
+
+def _plainRunWsgiApp():
+    # the function under asgiref's @sync_to_async: not public API, so
+    # requirements.txt pins asgiref below 4 and an import fails loudly if it moved
+    wrapped = WsgiToAsgiInstance.__dict__.get("run_wsgi_app")
+    function = getattr(wrapped, "func", None)
+    if not callable(function):
+        raise ImportError("asgi.py needs asgiref 3.x (WsgiToAsgiInstance.run_wsgi_app "
+                          "under @sync_to_async), see requirements.txt")
+    return function
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    """asgiref's per-request WSGI runner, run in one of our pools instead of its single thread."""
+
+    runWsgiApp = _plainRunWsgiApp()
+
+    def __init__(self, wsgiApp, pool):
+        super().__init__(wsgiApp)
+        self.pool = pool
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self.runWsgiApp, thread_sensitive=False, executor=self.pool)(body)
+
+class AsgiApp:
+    """The WSGI app in two thread pools, plus the lifespan (startup / graceful shutdown)."""
+
+    def __init__(self, wsgiApp, threads, writeThreads):
+        self.wsgiApp = wsgiApp
+        self.pools = {
+            "read": ThreadPoolExecutor(threads, thread_name_prefix="snp-read"),
+            "write": ThreadPoolExecutor(writeThreads, thread_name_prefix="snp-write"),
+        }
+        self.inFlight = {"read": 0, "write": 0}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+
+    async def _http(self, scope, receive, send):
+        async def receiveRequest():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnected()
+            return message
+
+        poolName = "read" if scope["method"] in READ_METHODS else "write"
+        self.inFlight[poolName] += 1
+        try:
+            await PooledWsgiInstance(self.wsgiApp, self.pools[poolName])(scope, receiveRequest, send)
+        except ClientDisconnected:
+            pass    # a cut-off body is never handed to the app (half a form could buy the wrong thing)
+        finally:
+            self.inFlight[poolName] -= 1
+
+    async def _lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # build the review index before the first search needs it
+                await loop.run_in_executor(self.pools["read"], system.getRatingSummary)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await loop.run_in_executor(None, self.close)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def close(self):
+        """Waits for the running requests, then writes out pending changes."""
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
+        repo.close()
+
+application = AsgiApp(app, config.SERVER_THREADS, config.SERVER_WRITE_THREADS)
+
+def _serverMetrics():
+    return [("snp_asgi_requests_in_flight", "Requests running in a pool thread", "gauge",
+             {"pool": name}, count) for name, count in application.inFlight.items()]
+
+metrics.addCollector(_serverMetrics)
@@ -0,0 +1,116 @@
+"""
+Micro-benchmarks of SystemController and AuthManager at several data sizes.
+
+    python benchmarks/controller_ops.py [--sizes 1000,100000,1000000] [--mode journal]
+                                        [--ops 200] [--repeat 3] [--logins 20] [--save-baseline]
+
+For every size a fresh data folder is seeded with that many past orders
+(and a tenth as many customers), then each operation is timed one call
+at a time, in `--repeat` rounds of which the fastest is reported:
+- loadData: a new repository and controller reading the seeded files
+  (`--load-runs` times, the median is reported)
+- purchaseTicket, purchaseMerch: `--ops` purchases by random customers
+- cancelTicket: cancelling the orders bought by purchaseTicket
+- authenticate: `--logins` logins at the configured password cost
+Prints operations per second and p50 / p99 latency, then compares them
+with benchmarks/baseline.json and exits with status 1 on a regression
+(see harness.py). The 1M size needs a few GB of memory and some minutes.
+"""
+import argparse
+import gc
+import random
+import time
+
+from harness import PARKS, PASSWORD, TICKETS, PRICES, CATALOG, addBaselineArguments, finish, \
+    prepareFolder, printResults, seed, summarize, timeEach
+
+class FakeCustomer:
+    def __init__(self, userID):
+        self.userID = userID
+
+def runSize(size, mode, ops, logins, loadRuns, repeat):
+    prepareFolder(mode)
+    from controllers.SystemController import SystemController
+    from models.AuthManager import AuthManager
+    from storage.IDAllocator import IDAllocator
+    from storage.RepositoryFactory import createRepository
+    import config
+
+    ids = IDAllocator(config.COUNTER_FILE, config.ID_BLOCK_SIZE)
+    repo = createRepository()
+    users = max(size // 10, 10)
+
+    start = time.perf_counter()
+    gc.disable()
+    try:
+        seed(SystemController(repo=repo, ids=ids), AuthManager(repo=repo, ids=ids), size, users)
+    finally:
+        gc.enable()
+    repo.close()
+    print(f"seeded {size} orders, {users} users in {time.perf_counter() - start:.1f} s")
+
+    results = {}
+    loads = []
+    for _ in range(loadRuns):
+        gc.collect()
+        repo = createRepository()
+        began = time.perf_counter()
+        system = SystemController(repo=repo, ids=ids)
+        loads.append(time.perf_counter() - began)
+        if len(loads) < loadRuns:
+            repo.close()
+    results[f"loadData@{size}"] = summarize(loads, sum(loads))
+    auth = AuthManager(repo=repo, ids=ids)
+
+    rng = random.Random(size)
+    customers = [FakeCustomer(f"U{n}") for n in range(1, users + 1)]
+
+    def purchaseTicket(i):
+        # a customer of its own, so cancelTicket can find the order again
+        ticket = rng.choice(TICKETS)
+        system.purchaseTicket(FakeCustomer(f"BENCH{i}"), {
+            "ticketName": ticket, "price": PRICES[ticket], "qty": 2,
+            "visitDate": "2027-01-15", "parkName": rng.choice(PARKS)})
+
+    def purchaseMerch(i):
+        system.purchaseMerch(rng.choice(customers), {"name": rng.choice(CATALOG)["catalogID"], "qty": 1})
+
+    results[f"purchaseTicket@{size}"] = timeEach(purchaseTicket, ops, repeat)
+    results[f"purchaseMerch@{size}"] = timeEach(purchaseMerch, ops, repeat)
+
+    toCancel = [system.getOrdersByCustomer(f"BENCH{i}")[0]["orderID"] for i in range(ops * repeat)]
+    results[f"cancelTicket@{size}"] = timeEach(lambda i: system.cancelTicket(toCancel[i], None), ops,
+                                               repeat)
+
+    def authenticate(i):
+        # every fourth attempt uses a wrong password
+        if auth.authenticate(f"user{rng.randrange(users)}", PASSWORD if i % 4 else "wrong") is None and i % 4:
+            raise RuntimeError("A seeded user could not log in")
+
+    results[f"authenticate@{size}"] = timeEach(authenticate, logins)
+    repo.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,100000,1000000",
+                        help="comma-separated numbers of seeded orders")
+    parser.add_argument("--mode", default="journal", choices=["json", "journal", "sqlite"])
+    parser.add_argument("--ops", type=int, default=200, help="purchases / cancellations per size")
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--load-runs", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="rounds of --ops per operation, the fastest one is reported")
+    addBaselineArguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        results.update(runSize(size, args.mode, args.ops, args.logins, args.load_runs, args.repeat))
+
+    print()
+    printResults(results)
+    finish(f"controller-{args.mode}", results, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Shared parts of the benchmark suite (controller_ops.py, load_test.py):
+seeding a data folder, latency summaries and the stored baseline.
+
+Baselines live in benchmarks/baseline.json, one entry per measured
+"name@size". A run is a regression when its throughput or its median
+latency is more than `tolerance` worse than the baseline (50% by default:
+sub-millisecond operations easily vary by 20-30% between runs, the
+check is meant to catch real slowdowns, not noise). Record a new baseline
+(--save-baseline) on the machine the numbers should hold for; results
+from another CPU count are only compared with a warning.
+"""
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+PARKS = ["Bako National Park", "Gunung Mulu National Park", "Niah National Park",
+         "Kubah National Park"]
+TICKETS = ["Adult", "Child", "Senior"]
+PRICES = {"Adult": 25.0, "Child": 10.0, "Senior": 15.0}
+
+# merchandise the seeded catalog sells, with stock that never runs out during a run
+CATALOG = [
+    {"catalogID": "totebag", "name": "Tote Bag", "unitPrice": 32.0, "category": "Accessories"},
+    {"catalogID": "keychain", "name": "Keychain", "unitPrice": 12.0, "category": "Accessories"},
+    {"catalogID": "tshirt", "name": "T-Shirt", "unitPrice": 45.0, "category": "Apparel"},
+]
+
+PASSWORD = "benchmark-pw"
+
+# ---------------------------------------------
+# Data folder
+# ---------------------------------------------
+def prepareFolder(mode, prefix="snp-bench-"):
+    """
+    Makes a fresh temporary data folder the working directory and sets the
+    environment for the run. Call it before anything imports config.
+    """
+    folder = tempfile.mkdtemp(prefix=prefix)
+    os.chdir(folder)
+    os.makedirs("data")
+    os.environ["SNP_STORAGE_MODE"] = mode
+    os.environ["SNP_DAILY_CAPACITY"] = str(10 ** 9)     # seats are not what is measured
+    os.environ["SNP_SNAPSHOT_DIR"] = ""
+    with open("data/catalog.json", "w", encoding="utf-8") as file:
+        json.dump([dict(item, stock=10 ** 9) for item in CATALOG], file)
+    return folder
+
+def randomCart(rng, day):
+    park, ticket = rng.choice(PARKS), rng.choice(TICKETS)
+    cart = [{"type": "ticket", "ticketName": ticket, "price": PRICES[ticket], "qty": rng.randint(1, 4),
+             "visitDate": day, "parkName": park}]
+    if rng.random() < 0.3:
+        cart.append({"type": "merch", "name": rng.choice(CATALOG)["catalogID"], "qty": 1})
+    return cart
+
+def seed(system, auth, orders, users, seedValue=1):
+    """
+    Fills the (empty) data folder with `users` customers and `orders` past
+    orders spread over 2026, through the bulk import, then writes
+    everything out so the next load starts from the data files.
+    """
+    rng = random.Random(seedValue)
+    hashed = auth.hasher.hash(PASSWORD)     # one hash shared by every seeded user
+    auth.importUsers({"username": f"user{n}", "password": hashed, "email": f"user{n}@example.com",
+                      "fullName": f"User {n}", "customerType": "Adult"} for n in range(users))
+
+    days = [f"2026-{month:02d}-{day:02d}" for month in range(1, 13) for day in range(1, 29)]
+    records = ({"customerID": f"U{rng.randrange(1, users + 1)}", "date": rng.choice(days),
+                "items": randomCart(rng, rng.choice(days))} for _ in range(orders))
+    summary = system.importOrders(records)
+    system.saveData()
+    return summary
+
+# ---------------------------------------------
+# Measuring
+# ---------------------------------------------
+def percentile(sortedValues, fraction):
+    if not sortedValues:
+        return 0.0
+    index = min(len(sortedValues) - 1, max(0, round(fraction * len(sortedValues) + 0.5) - 1))
+    return sortedValues[index]
+
+def summarize(latencies, elapsed):
+    """{ops, opsPerSec, p50Ms, p99Ms} from per-operation seconds and the wall time of the run."""
+    ordered = sorted(latencies)
+    return {
+        "ops": len(ordered),
+        "opsPerSec": round(len(ordered) / elapsed, 3) if elapsed else 0.0,
+        "p50Ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p99Ms": round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+def timeEach(operation, count, repeat=1):
+    """
+    Runs operation(i) `count` times, one after the other, `repeat` times over
+    (i keeps counting up) and returns the summary of the fastest round:
+    the best of a few rounds filters out pauses caused by the rest of the machine.
+    """
+    rounds = []
+    for r in range(repeat):
+        latencies = []
+        start = time.perf_counter()
+        for i in range(r * count, (r + 1) * count):
+            began = time.perf_counter()
+            operation(i)
+            latencies.append(time.perf_counter() - began)
+        rounds.append(summarize(latencies, time.perf_counter() - start))
+    return min(rounds, key=lambda row: row["p50Ms"])
+
+def printResults(results):
+    print(f"{'benchmark':34} {'ops':>7} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, row in results.items():
+        print(f"{name:34} {row['ops']:>7} {row['opsPerSec']:>10.1f} {row['p50Ms']:>10.3f} {row['p99Ms']:>10.3f}")
+
+# ---------------------------------------------
+# Baseline
+# ---------------------------------------------
+def machine():
+    return {"cpus": os.cpu_count(), "python": platform.python_version(), "platform": platform.platform()}
+
+def saveBaseline(suite, results, path=BASELINE_FILE):
+    """Stores `results` as the baseline of `suite` (other suites' entries are kept)."""
+    baseline = _readBaseline(path)
+    entry = baseline.setdefault(suite, {"machine": machine(), "results": {}})
+    entry["machine"] = machine()
+    entry["results"].update(results)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(baseline, file, indent=4, sort_keys=True)
+        file.write("\n")
+
+def compareBaseline(suite, results, tolerance, path=BASELINE_FILE):
+    """
+    Prints how each result compares with the baseline and returns the
+    names of the regressions (empty if there is nothing to compare with).
+    """
+    entry = _readBaseline(path).get(suite)
+    if not entry:
+        print(f"\nNo baseline for {suite} in {path} (record one with --save-baseline)")
+        return []
+
+    if entry["machine"].get("cpus") != os.cpu_count():
+        print(f"\nWarning: the baseline was recorded with {entry['machine'].get('cpus')} CPUs, "
+              f"this machine has {os.cpu_count()}")
+
+    print(f"\n{'against baseline':34} {'ops/s':>10} {'p50':>10}")
+    regressions = []
+    for name, row in results.items():
+        old = entry["results"].get(name)
+        if old is None:
+            continue
+        throughput = row["opsPerSec"] / old["opsPerSec"] - 1 if old["opsPerSec"] else 0.0
+        latency = row["p50Ms"] / old["p50Ms"] - 1 if old["p50Ms"] else 0.0
+        regressed = throughput < -tolerance or latency > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:34} {throughput:>+10.0%} {latency:>+10.0%}  {'REGRESSION' if regressed else 'ok'}")
+    return regressions
+
+def _readBaseline(path):
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+def addBaselineArguments(parser):
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the new baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown before a result counts as a regression (0.5 = 50%%)")
+
+def finish(suite, results, args):
+    """Saves or checks the baseline; exits with status 1 on a regression."""
+    if args.save_baseline:
+        saveBaseline(suite, results, args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+    regressions = compareBaseline(suite, results, args.tolerance, args.baseline)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
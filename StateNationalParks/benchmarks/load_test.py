@@ -0,0 +1,127 @@
+"""
+Load test of the Flask app with concurrent synthetic customers.
+
+    python benchmarks/load_test.py [--customers 16] [--rounds 25] [--orders 100000]
+                                   [--mode journal] [--save-baseline]
+
+Seeds a fresh data folder with `--orders` past orders, then every
+customer (one thread and one Flask test client each, so its own session)
+logs in, then all of them repeat `--rounds` times what the booking page does:
+availability check, catalog, checkout of a random cart, order history.
+Requests go through the whole app (routing, sessions, response cache,
+JSON) but not a network socket or a WSGI server, so the numbers are an
+upper bound for one worker process: multiply by the workers a machine
+can run to size it, and run the real server for the network part.
+Prints requests per second and p50 / p99 latency per route, then
+compares them with benchmarks/baseline.json (see harness.py).
+"""
+import argparse
+import gc
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import PASSWORD, addBaselineArguments, finish, prepareFolder, printResults, \
+    randomCart, seed, summarize
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=16, help="concurrent customers (threads)")
+    parser.add_argument("--rounds", type=int, default=25, help="booking rounds per customer")
+    parser.add_argument("--orders", type=int, default=100000, help="past orders seeded first")
+    parser.add_argument("--mode", default="journal", choices=["json", "journal", "sqlite"])
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep config.RATE_LIMITS on (every customer shares one IP here)")
+    addBaselineArguments(parser)
+    args = parser.parse_args()
+
+    prepareFolder(args.mode, "snp-load-")
+    if not args.rate_limit:
+        os.environ["SNP_RATE_LIMIT"] = "0"
+    from controllers.SystemController import SystemController
+    from models.AuthManager import AuthManager
+    from storage.RepositoryFactory import createRepository
+    from storage.IDAllocator import IDAllocator
+    import config
+
+    users = max(args.orders // 10, args.customers)
+    start = time.perf_counter()
+    repo = createRepository()
+    ids = IDAllocator(config.COUNTER_FILE, config.ID_BLOCK_SIZE)
+    gc.disable()
+    try:
+        seed(SystemController(repo=repo, ids=ids), AuthManager(repo=repo, ids=ids), args.orders, users)
+    finally:
+        gc.enable()
+    repo.close()
+    print(f"seeded {args.orders} orders, {users} users in {time.perf_counter() - start:.1f} s")
+
+    # imported after seeding: app.py loads the data when it is imported
+    from app import app
+    app.testing = True
+
+    latencies = {}      # route -> [seconds]
+    failures = []
+    rejected = []       # 429 answers (with --rate-limit)
+    lock = threading.Lock()
+
+    def call(client, route, method, path, **options):
+        began = time.perf_counter()
+        response = client.open(path, method=method, **options)
+        elapsed = time.perf_counter() - began
+        with lock:
+            latencies.setdefault(route, []).append(elapsed)
+            if response.status_code == 429:
+                rejected.append(route)
+            elif response.status_code >= 400:
+                failures.append(f"{method} {path}: {response.status_code}")
+        return response
+
+    clients = [app.test_client() for _ in range(args.customers)]
+
+    def login(n):
+        call(clients[n], "login", "POST", "/login", data={"username": f"user{n}", "password": PASSWORD})
+
+    def customer(n):
+        rng = random.Random(n)
+        client = clients[n]
+        for _ in range(args.rounds):
+            cart = randomCart(rng, f"2027-02-{rng.randint(1, 28):02d}")
+            ticket = cart[0]
+            call(client, "availability", "GET", "/api/availability", query_string={
+                "parkName": ticket["parkName"], "visitDate": ticket["visitDate"],
+                "ticketName": ticket["ticketName"]})
+            call(client, "catalog", "GET", "/api/catalog")
+            call(client, "checkout", "POST", "/api/checkout", json={"items": cart})
+            call(client, "orders", "GET", "/api/orders", query_string={"limit": 20})
+
+    # logins (slow on purpose, see config.PASSWORD_ITERATIONS) are timed on their own
+    with ThreadPoolExecutor(args.customers) as pool:
+        start = time.perf_counter()
+        list(pool.map(login, range(args.customers)))
+        loginTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        list(pool.map(customer, range(args.customers)))
+        elapsed = time.perf_counter() - start
+
+    suffix = f"@{args.customers}x{args.orders}"
+    logins = latencies.pop("login")
+    results = {f"{route}{suffix}": summarize(values, elapsed) for route, values in sorted(latencies.items())}
+    results[f"booking{suffix}"] = summarize([v for values in latencies.values() for v in values], elapsed)
+    results[f"login{suffix}"] = summarize(logins, loginTime)
+
+    print()
+    printResults(results)
+    if rejected:
+        print(f"\n{len(rejected)} requests refused with 429 by the rate limits")
+    if failures:
+        print(f"\n{len(failures)} failed requests, e.g. {failures[0]}")
+    finish(f"load-{args.mode}", results, args)
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
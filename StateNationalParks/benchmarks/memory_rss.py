@@ -0,0 +1,101 @@
+"""
+Resident memory of the running app at season scale.
+
+    python benchmarks/memory_rss.py [--orders 1000000] [--mode journal]
+
+Seeds a fresh data folder with `--orders` past orders (and a tenth as many
+customers), then starts a new process that loads it the way app.py does
+(one repository, SystemController and AuthManager) and reports its RSS:
+- baseline: after the imports, before any data is read
+- loaded:   after startup (big files are only indexed, see LAZY_LOAD)
+- touched:  after every stored row was read once (what a long-running
+            worker ends up holding once reports, exports and lookups
+            have visited the whole history)
+and the bytes per order of the last two over the baseline. This is the
+number that decides how many workers fit on a box; it counts the
+repository rows, the indexes and everything else a worker keeps.
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+from harness import prepareFolder, seed
+
+COLLECTIONS = ["orders", "tickets", "merch", "payments", "receipts", "reviews", "users"]
+
+def rss():
+    """Resident set size of this process in bytes (Linux /proc, else the peak from getrusage)."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def child():
+    # runs in the data folder, with the environment prepareFolder set
+    from controllers.SystemController import SystemController
+    from models.AuthManager import AuthManager
+    from storage.RepositoryFactory import createRepository
+    from storage.IDAllocator import IDAllocator
+    import config
+
+    gc.collect()
+    result = {"baseline": rss()}
+    repo = createRepository()
+    ids = IDAllocator(config.COUNTER_FILE, config.ID_BLOCK_SIZE)
+    AuthManager(repo=repo, ids=ids)
+    SystemController(repo=repo, ids=ids)
+    gc.collect()
+    result["loaded"] = rss()
+
+    for name in COLLECTIONS:
+        for row in repo.all(name):
+            pass
+    gc.collect()
+    result["touched"] = rss()
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--mode", default="journal", choices=["json", "journal", "sqlite"])
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    prepareFolder(args.mode, "snp-memory-")
+    from controllers.SystemController import SystemController
+    from models.AuthManager import AuthManager
+    from storage.RepositoryFactory import createRepository
+    from storage.IDAllocator import IDAllocator
+    import config
+
+    users = max(args.orders // 10, 10)
+    start = time.perf_counter()
+    repo = createRepository()
+    ids = IDAllocator(config.COUNTER_FILE, config.ID_BLOCK_SIZE)
+    seed(SystemController(repo=repo, ids=ids), AuthManager(repo=repo, ids=ids), args.orders, users)
+    repo.close()
+    print(f"seeded {args.orders} orders, {users} users in {time.perf_counter() - start:.1f} s")
+
+    # a new process, so nothing left over from seeding is counted
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    print(f"mode                      {args.mode}")
+    print(f"baseline                  {result['baseline'] / 2 ** 20:8.0f} MB")
+    for stage in ("loaded", "touched"):
+        used = result[stage] - result["baseline"]
+        print(f"{stage:<26}{result[stage] / 2 ** 20:8.0f} MB   {used / args.orders:7.1f} bytes per order")
+
+if __name__ == "__main__":
+    main()
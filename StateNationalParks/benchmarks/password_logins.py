@@ -0,0 +1,76 @@
+"""
+Login throughput at a given password hashing cost.
+
+    python benchmarks/password_logins.py [--scheme pbkdf2_sha256] [--iterations 120000] [--threads 16] [--logins 400]
+
+Registers a few users in a fresh temporary data folder, then logs in from
+many request threads at once through AuthManager.authenticate. Prints the
+cost of one hash and the logins per second the hashing pool sustains, so
+the cost in config.py can be picked for the expected opening-time load.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USERS = 20
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scheme", default="pbkdf2_sha256", choices=["pbkdf2_sha256", "scrypt"])
+    parser.add_argument("--iterations", type=int, default=120000)
+    parser.add_argument("--scrypt-n", type=int, default=2 ** 14)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=400)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="snp-logins-")
+    os.chdir(folder)
+    os.makedirs("data")
+
+    from models.AuthManager import AuthManager
+    from models.Customer import Customer
+    from models.PasswordHasher import PasswordHasher
+
+    hasher = PasswordHasher(args.scheme, args.iterations, scryptN=args.scrypt_n,
+                            workers=args.workers)
+    auth = AuthManager(hasher=hasher)
+    for n in range(USERS):
+        auth.registerUser(Customer(auth.nextUserID(), f"user{n}", f"pw{n}",
+                                   f"user{n}@example.com", f"User {n}", "Adult"))
+
+    start = time.perf_counter()
+    hasher.hash("warm-up")
+    hashTime = time.perf_counter() - start
+
+    def login(i):
+        n = i % USERS
+        # every fourth attempt uses a wrong password
+        password = f"pw{n}" if i % 4 else "wrong"
+        return (auth.authenticate(f"user{n}", password) is not None) == bool(i % 4)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        results = list(pool.map(login, range(args.logins)))
+    elapsed = time.perf_counter() - start
+
+    print(f"scheme              {args.scheme}")
+    print(f"cost                {args.iterations if args.scheme == 'pbkdf2_sha256' else args.scrypt_n}")
+    print(f"hash workers        {hasher.workers}")
+    print(f"one hash            {hashTime * 1000:.1f} ms")
+    print(f"logins              {args.logins} from {args.threads} threads in {elapsed:.2f} s")
+    print(f"logins per second   {args.logins / elapsed:.0f}")
+    print(f"all results correct {all(results)}")
+
+    hasher.close()
+    auth.repo.close()
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == "__main__":
+    main()
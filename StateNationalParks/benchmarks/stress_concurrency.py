@@ -0,0 +1,97 @@
+"""
+Stress test for SystemController under threads and worker processes.
+
+    python benchmarks/stress_concurrency.py [--mode journal] [--processes 4] [--threads 8] [--purchases 50]
+
+Every worker buys tickets and cancels some orders against the same data
+folder (a fresh temporary one). At the end the data is reloaded and the
+totals must be exact: no lost orders, no duplicate IDs, no lost revenue.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PRICE = 12.5
+QTY = 2
+
+class FakeCustomer:
+    def __init__(self, userID):
+        self.userID = userID
+
+def worker(args):
+    mode, workerNo, threads, purchases = args
+    from controllers.SystemController import SystemController
+    system = SystemController(storageMode=mode)
+
+    def buy(threadNo):
+        customer = FakeCustomer(f"U{workerNo}-{threadNo}")
+        for i in range(purchases):
+            system.purchaseTicket(customer, {
+                "ticketName": "Adult", "price": PRICE, "qty": QTY,
+                "visitDate": "2026-12-01", "parkName": f"Park{i % 3}"
+            })
+        # cancel the first order twice from this thread (the second time changes nothing)
+        first = system.getOrdersByCustomer(customer.userID)[0]["orderID"]
+        system.cancelTicket(first, None)
+        system.cancelTicket(first, None)
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(buy, range(threads)))
+    system.repo.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", default="journal", choices=["json", "journal", "sqlite"])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--purchases", type=int, default=50)
+    parser.add_argument("--compact-every", type=int, default=200)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="snp-stress-")
+    os.chdir(folder)
+    os.makedirs("data")
+    os.environ["SNP_JOURNAL_COMPACT_EVERY"] = str(args.compact_every)
+    os.environ["SNP_DAILY_CAPACITY"] = str(10 ** 9)   # capacity is not what is tested here
+
+    jobs = [(args.mode, p, args.threads, args.purchases) for p in range(args.processes)]
+    with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+        pool.map(worker, jobs)
+
+    from controllers.SystemController import SystemController
+    system = SystemController(storageMode=args.mode)
+
+    expectedOrders = args.processes * args.threads * args.purchases
+    tickets = system.ticketList
+    orders = system.orderList
+    cancelled = system.repo.find("orders", "status", "cancelled")
+
+    checks = {
+        "orders": (len(orders), expectedOrders),
+        "tickets": (len(tickets), expectedOrders),
+        "unique ticket IDs": (len({t["itemID"] for t in tickets}), expectedOrders),
+        "unique order IDs": (len({o["orderID"] for o in orders}), expectedOrders),
+        "cancelled orders": (len(cancelled), args.processes * args.threads),
+        "statistic.totalOrders": (system.statistic.totalOrders, expectedOrders),
+        # each thread cancelled one order, its revenue is taken back out
+        "statistic.totalRevenue": (system.statistic.totalRevenue,
+                                   (expectedOrders - args.processes * args.threads) * PRICE * QTY),
+        "statistic.cancelledOrders": (system.statistic.data["cancelledOrders"], args.processes * args.threads),
+    }
+
+    failed = False
+    for name, (actual, expected) in checks.items():
+        status = "ok" if actual == expected else "MISMATCH"
+        failed = failed or actual != expected
+        print(f"{name:24} {actual!s:>10} expected {expected!s:>10}  {status}")
+    print(f"data folder: {folder}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
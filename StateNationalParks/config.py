@@ -0,0 +1,262 @@
+import os
+
+# ============================================================
+# STORAGE
+# ============================================================
+# "json"    -> every change rewrites the data/*.json files (old behaviour)
+# "journal" -> every change appends one record to the journal,
+#              the data/*.json files are only rewritten by compaction
+# "sqlite"  -> everything lives in SQLITE_FILE
+#              (import the JSON files first with: python -m tools.migrate)
+STORAGE_MODE = os.environ.get("SNP_STORAGE_MODE", "journal")
+
+DATA_FILES = {
+    "orders": "data/orders.json",
+    "tickets": "data/tickets.json",
+    "merch": "data/merchandise.json",
+    "payments": "data/payments.json",
+    "receipts": "data/receipts.json",
+    "reviews": "data/reviews.json",
+    "users": "data/users.json",
+    "capacity": "data/capacity.json",
+    "catalog": "data/catalog.json",
+    "statistics": "data/statistics.json",
+}
+
+SQLITE_FILE = os.environ.get("SNP_SQLITE_FILE", "data/parks.db")
+
+JOURNAL_FILE = os.environ.get("SNP_JOURNAL_FILE", "data/journal.log")
+
+# number of journal records before a background compaction starts
+JOURNAL_COMPACT_EVERY = int(os.environ.get("SNP_JOURNAL_COMPACT_EVERY", "1000"))
+
+# fsync after every record (slower, but survives power loss, not just crashes)
+JOURNAL_FSYNC = os.environ.get("SNP_JOURNAL_FSYNC", "0") == "1"
+
+# checksummed copies of the data files, used if a file is found corrupted
+# (set SNP_SNAPSHOT_DIR to an empty value to turn them off)
+SNAPSHOT_DIR = os.environ.get("SNP_SNAPSHOT_DIR", "data/snapshots")
+
+# at most one snapshot per file every N seconds
+SNAPSHOT_INTERVAL = int(os.environ.get("SNP_SNAPSHOT_INTERVAL", "300"))
+
+# big data files ("json" / "journal" modes) are loaded lazily: startup only
+# builds the keys and indexes, rows are parsed the first time they are read
+LAZY_LOAD = os.environ.get("SNP_LAZY_LOAD", "1") == "1"
+LAZY_LOAD_MIN_BYTES = int(os.environ.get("SNP_LAZY_LOAD_MIN_BYTES", str(8 * 1024 * 1024)))
+
+# write-behind ("json" / "journal" modes): changes are acknowledged from
+# memory and written by a background thread, at most WRITE_BEHIND_MAX_DELAY
+# seconds later. Only for a single worker process (threads are fine).
+WRITE_BEHIND = os.environ.get("SNP_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_MAX_DELAY = float(os.environ.get("SNP_WRITE_BEHIND_MAX_DELAY", "1.0"))
+
+# "sync": on disk before the request is answered, "lazy": written later
+# (collections not listed are lazy)
+WRITE_DURABILITY = {
+    "payments": "sync",
+    "receipts": "sync",
+    "users": "sync",
+    "orders": "lazy",
+    "tickets": "lazy",
+    "merch": "lazy",
+    "capacity": "lazy",
+    "catalog": "lazy",
+    "reviews": "lazy",
+}
+
+# ============================================================
+# IDS
+# ============================================================
+# last reserved number per ID prefix (ORD, T, M, R, U, ...)
+COUNTER_FILE = os.environ.get("SNP_COUNTER_FILE", "data/counters.json")
+
+# IDs reserved per trip to the counter file
+ID_BLOCK_SIZE = int(os.environ.get("SNP_ID_BLOCK_SIZE", "50"))
+
+# ============================================================
+# CONCURRENCY
+# ============================================================
+# writers in all worker processes take this lock (see Repository.transaction)
+WRITE_LOCK_FILE = os.environ.get("SNP_WRITE_LOCK_FILE", "data/.write.lock")
+
+# in-process locks shared by entity keys (order IDs, parks, items)
+LOCK_STRIPES = int(os.environ.get("SNP_LOCK_STRIPES", "64"))
+
+# ============================================================
+# TICKET CAPACITY
+# ============================================================
+# seats per (park, visit date, ticket type) unless listed in PARK_CAPACITY
+DEFAULT_DAILY_CAPACITY = int(os.environ.get("SNP_DAILY_CAPACITY", "100"))
+PARK_CAPACITY = {}      # e.g. {"Bako National Park": 250}
+
+# parks tickets are sold for (bulk imports reject tickets for any other park)
+PARKS = [park.strip() for park in os.environ.get(
+    "SNP_PARKS", "Skyline Canyon,Evergreen Reserve,Meadow Basin,Sunset Ridge,Crystal Falls").split(",")
+    if park.strip()]
+
+# how long reserve() keeps seats before they go back on sale
+CAPACITY_HOLD_SECONDS = int(os.environ.get("SNP_CAPACITY_HOLD_SECONDS", "600"))
+
+# ============================================================
+# STATISTICS
+# ============================================================
+# number of best sellers kept by Statistic
+TOP_SELLERS = int(os.environ.get("SNP_TOP_SELLERS", "5"))
+
+# ============================================================
+# PASSWORDS
+# ============================================================
+# "pbkdf2_sha256" or "scrypt"; stored hashes made with another scheme or
+# cost (and old plaintext passwords) are rehashed on the next login
+PASSWORD_SCHEME = os.environ.get("SNP_PASSWORD_SCHEME", "pbkdf2_sha256")
+PASSWORD_ITERATIONS = int(os.environ.get("SNP_PASSWORD_ITERATIONS", "120000"))
+PASSWORD_SCRYPT_N = int(os.environ.get("SNP_PASSWORD_SCRYPT_N", str(2 ** 14)))
+
+# threads that hash / verify passwords (0 = one per CPU)
+PASSWORD_WORKERS = int(os.environ.get("SNP_PASSWORD_WORKERS", "0"))
+
+# ============================================================
+# USERS
+# ============================================================
+# a username or user ID not found in memory makes AuthManager catch up
+# with users registered by other workers at most this often (seconds);
+# the refresh takes the storage write lock, so unknown names must not
+# trigger one each
+USER_REFRESH_SECONDS = float(os.environ.get("SNP_USER_REFRESH_SECONDS", "1"))
+
+# ============================================================
+# IDEMPOTENT PURCHASES
+# ============================================================
+# a purchase sent again with the same Idempotency-Key (per customer) within
+# this many seconds returns the first result instead of buying again
+IDEMPOTENCY_TTL = int(os.environ.get("SNP_IDEMPOTENCY_TTL", str(24 * 3600)))
+
+# results kept in memory per worker; older keys are found on the orders
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("SNP_IDEMPOTENCY_CACHE_SIZE", "10000"))
+
+# a customer's most recent orders looked at for a key missing from memory
+IDEMPOTENCY_SCAN = 50
+
+IDEMPOTENCY_KEY_MAX = 255
+
+# ============================================================
+# ORDER HISTORY
+# ============================================================
+ORDER_PAGE_SIZE = 20
+ORDER_PAGE_MAX = 100
+
+# orders looked at per request when filters skip most of them; the page
+# is then returned short, with a cursor to continue from
+ORDER_SCAN_LIMIT = int(os.environ.get("SNP_ORDER_SCAN_LIMIT", "1000"))
+
+# ============================================================
+# RESPONSE CACHE
+# ============================================================
+# rendered pages / JSON kept in memory per worker (dropped when the
+# controller changes the data they show, or after the TTL)
+RESPONSE_CACHE_SIZE = int(os.environ.get("SNP_RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = int(os.environ.get("SNP_RESPONSE_CACHE_TTL", "30"))
+
+# browser cache lifetime of /static and /frontend files (revalidated with ETags after that)
+STATIC_MAX_AGE = int(os.environ.get("SNP_STATIC_MAX_AGE", "3600"))
+
+# ============================================================
+# BULK IMPORT
+# ============================================================
+# records written per transaction by tools/bulk.py
+BULK_BATCH_SIZE = int(os.environ.get("SNP_BULK_BATCH_SIZE", "10000"))
+
+# ============================================================
+# REPORTS
+# ============================================================
+# the column arrays behind the admin reports follow the changes made here
+# as they are committed, and are rebuilt after this many seconds (changes
+# made by other workers)
+REPORT_MAX_AGE = int(os.environ.get("SNP_REPORT_MAX_AGE", "30"))
+
+# ============================================================
+# REVIEWS
+# ============================================================
+REVIEW_PAGE_SIZE = 20
+REVIEW_PAGE_MAX = 100
+
+# the review search index is rebuilt after this many seconds, which bounds
+# how long moderation done by other workers goes unseen (new reviews from
+# other workers are picked up within a second)
+REVIEW_INDEX_MAX_AGE = int(os.environ.get("SNP_REVIEW_INDEX_MAX_AGE", "300"))
+
+# ============================================================
+# METRICS
+# ============================================================
+# request, storage, auth and lock timings are exported at /metrics
+# (Prometheus text format); set to "0" to turn the endpoint off
+METRICS_ENABLED = os.environ.get("SNP_METRICS_ENABLED", "1") == "1"
+
+# opt-in sampling profiler: requests slower than this many seconds get their
+# stacks (sampled every PROFILE_INTERVAL_MS) written to PROFILE_DIR (0 = off)
+PROFILE_SLOW_REQUESTS = float(os.environ.get("SNP_PROFILE_SLOW_REQUESTS", "0"))
+PROFILE_INTERVAL_MS = float(os.environ.get("SNP_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get("SNP_PROFILE_DIR", "data/profiles")
+PROFILE_KEEP = int(os.environ.get("SNP_PROFILE_KEEP", "50"))
+
+# ============================================================
+# SESSIONS
+# ============================================================
+# the browser cookie only holds a random session ID, the values live here:
+# "memory" -> in this process (one worker; a restart logs everyone out)
+# "sqlite" -> shared by every worker through SESSION_FILE
+SESSION_BACKEND = os.environ.get("SNP_SESSION_BACKEND", "memory")
+SESSION_FILE = os.environ.get("SNP_SESSION_FILE", "data/sessions.db")
+
+# a login lasts this many seconds
+SESSION_TTL = int(os.environ.get("SNP_SESSION_TTL", str(8 * 3600)))
+
+# sessions kept in memory per worker (least recently used ones are dropped)
+SESSION_MAX_ENTRIES = int(os.environ.get("SNP_SESSION_MAX_ENTRIES", "10000"))
+
+# "sqlite": seconds a worker trusts its in-memory copy of a session before
+# checking it was not revoked by another worker
+SESSION_RECHECK = float(os.environ.get("SNP_SESSION_RECHECK", "2"))
+
+# ============================================================
+# RATE LIMITING AND ADMISSION CONTROL
+# ============================================================
+# per worker process; set to "0" to turn it off (e.g. for load tests)
+RATE_LIMIT_ENABLED = os.environ.get("SNP_RATE_LIMIT", "1") == "1"
+
+# per route group:
+# - "perIP" / "perUser": token buckets (requests per second, burst)
+# - "concurrency": requests of the group running at once, "queue": how many
+#   more may wait for a place, at most "queueTimeout" seconds
+# - "retryAfter": Retry-After seconds sent when the group is too busy
+# Requests over a limit get a 429 with Retry-After.
+RATE_LIMITS = {
+    # the user key is the username tried, so guessing one password is slow
+    "login": {"perIP": (1.0, 10), "perUser": (0.2, 5), "concurrency": 4, "queue": 16,
+              "queueTimeout": 2.0, "retryAfter": 1},
+    "purchase": {"perIP": (5.0, 20), "perUser": (2.0, 10), "concurrency": 8, "queue": 32,
+                 "queueTimeout": 2.0, "retryAfter": 1},
+}
+
+# ============================================================
+# PRODUCTION SERVER (serve.py / asgi.py)
+# ============================================================
+SERVER_HOST = os.environ.get("SNP_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("SNP_SERVER_PORT", "8000"))
+
+# worker processes; more than one needs SESSION_BACKEND = "sqlite" and no
+# WRITE_BEHIND (both keep state in one process)
+SERVER_WORKERS = int(os.environ.get("SNP_SERVER_WORKERS", "1"))
+
+# threads per worker running the app: browsing (GET) and writes (POST ...)
+# have pools of their own; keep the write pool at least as big as the
+# "concurrency" of the RATE_LIMITS groups, or their queues never fill
+SERVER_THREADS = int(os.environ.get("SNP_SERVER_THREADS", "32"))
+SERVER_WRITE_THREADS = int(os.environ.get("SNP_SERVER_WRITE_THREADS", "16"))
+
+# request bodies over this many bytes get a 413
+SERVER_MAX_BODY = int(os.environ.get("SNP_SERVER_MAX_BODY", str(16 * 1024 * 1024)))
+
+# seconds running requests get to finish on shutdown (SIGTERM / Ctrl+C)
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get("SNP_SERVER_GRACEFUL_TIMEOUT", "30"))
@@ -0,0 +1,153 @@
+import itertools
+import threading
+import time
+import config
+from storage.StripedLock import StripedLock
+
+class CapacityManager:
+    """
+    Ticket quota per (parkName, visitDate, ticketName) slot.
+    - the sold count of each slot is a row in the "capacity" collection, so it is
+      persisted with the purchase that changed it (one row, not a full rewrite)
+    - reserve() puts seats on hold for a short time, commit() turns a hold into
+      sold seats, release() gives held seats back, releaseSold() handles cancellations
+    - every check is a single key lookup plus the slot's holds
+    Seat changes must happen inside repo.transaction(); the caller puts the
+    returned row together with its own changes.
+    """
+
+    def __init__(self, repo, holdSeconds=None):
+        self.repo = repo
+        # own stripes: sharing the controller's could deadlock against its order locks
+        self.locks = StripedLock(config.LOCK_STRIPES, "capacity")
+        self.holdSeconds = holdSeconds or config.CAPACITY_HOLD_SECONDS
+
+        self.holds = {}             # holdID -> (slotID, qty)
+        self.heldBySlot = {}        # slotID -> {holdID: (qty, expires)}
+        self.holdCounter = itertools.count(1)
+        self.holdLock = threading.Lock()
+
+    # =========================================================
+    # SLOTS
+    # =========================================================
+    def slotID(self, parkName, visitDate, ticketName):
+        return f"{parkName}|{visitDate}|{ticketName}"
+
+    def getSlot(self, parkName, visitDate, ticketName):
+        """Returns the stored slot row, or a new one with the default capacity."""
+        slotID = self.slotID(parkName, visitDate, ticketName)
+        row = self.repo.get("capacity", slotID)
+        if row is not None:
+            return row
+
+        return {
+            "slotID": slotID,
+            "parkName": parkName,
+            "visitDate": visitDate,
+            "ticketName": ticketName,
+            "capacity": config.PARK_CAPACITY.get(parkName, config.DEFAULT_DAILY_CAPACITY),
+            "sold": 0
+        }
+
+    def setCapacity(self, parkName, visitDate, ticketName, capacity):
+        """Admin: changes a slot's capacity. Returns the row to put."""
+        row = dict(self.getSlot(parkName, visitDate, ticketName))
+        row["capacity"] = capacity
+        return row
+
+    # =========================================================
+    # AVAILABILITY
+    # =========================================================
+    def available(self, parkName, visitDate, ticketName):
+        """Seats that can still be sold (held seats count as taken)."""
+        row = self.getSlot(parkName, visitDate, ticketName)
+        return self._available(row)
+
+    def _available(self, row):
+        return max(0, row["capacity"] - row["sold"] - self._held(row["slotID"]))
+
+    def _held(self, slotID):
+        holds = self.heldBySlot.get(slotID)
+        if not holds:
+            return 0
+
+        # drop expired holds of this slot only
+        now = time.monotonic()
+        for holdID, (qty, expires) in list(holds.items()):
+            if expires <= now:
+                self._dropHold(holdID)
+        return sum(qty for qty, _ in holds.values())
+
+    # =========================================================
+    # RESERVE / COMMIT / RELEASE
+    # =========================================================
+    def reserve(self, parkName, visitDate, ticketName, qty):
+        """Holds `qty` seats. Returns a hold ID, or None if there are not enough seats."""
+        if qty <= 0:
+            return None
+
+        row = self.getSlot(parkName, visitDate, ticketName)
+        with self.locks.hold(row["slotID"]):
+            if self._available(row) < qty:
+                return None
+
+            with self.holdLock:
+                holdID = f"H{next(self.holdCounter)}"
+                self.holds[holdID] = (row["slotID"], qty)
+                self.heldBySlot.setdefault(row["slotID"], {})[holdID] = (
+                    qty, time.monotonic() + self.holdSeconds
+                )
+            return holdID
+
+    def commit(self, holdID, parkName, visitDate, ticketName):
+        """Turns a hold into sold seats. Returns the updated slot row, or None if the hold expired."""
+        with self.holdLock:
+            hold = self.holds.get(holdID)
+            if hold is None:
+                return None
+            slotID, qty = hold
+            self._dropHold(holdID)
+
+        row = dict(self.getSlot(parkName, visitDate, ticketName))
+        row["sold"] += qty
+        return row
+
+    def release(self, holdID):
+        """Gives held seats back without selling them."""
+        with self.holdLock:
+            self._dropHold(holdID)
+
+    def releaseSold(self, parkName, visitDate, ticketName, qty):
+        """Gives sold seats back (cancellation). Returns the updated slot row."""
+        row = dict(self.getSlot(parkName, visitDate, ticketName))
+        row["sold"] = max(0, row["sold"] - qty)
+        return row
+
+    def sellMany(self, seats, slotRows):
+        """
+        Bulk import: sells seats in several slots at once, without holds.
+        seats: {(parkName, visitDate, ticketName): qty}; slotRows: {slot: row}
+        holds the rows already changed by the batch and receives the new ones.
+        Returns False (nothing changed) if any slot has not enough seats.
+        """
+        rows = {}
+        for slot, qty in seats.items():
+            row = slotRows.get(slot) or dict(self.getSlot(*slot))
+            if self._available(row) < qty:
+                return False
+            rows[slot] = row
+
+        for slot, qty in seats.items():
+            rows[slot]["sold"] += qty
+            slotRows[slot] = rows[slot]
+        return True
+
+    def _dropHold(self, holdID):
+        hold = self.holds.pop(holdID, None)
+        if hold is None:
+            return
+        slotHolds = self.heldBySlot.get(hold[0])
+        if slotHolds is not None:
+            slotHolds.pop(holdID, None)
+            if not slotHolds:
+                del self.heldBySlot[hold[0]]
@@ -0,0 +1,82 @@
+from models.Merchandise import Merchandise
+
+class MerchCatalog:
+    """
+    Gift-shop catalog and stock ledger (the "catalog" collection).
+    - one row per item: catalogID, name, unitPrice, category, stock, image
+    - take() / restock() return the changed row so the caller can persist it
+      together with the sale, instead of rewriting the whole catalog
+    Stock changes must happen inside repo.transaction(), so two sales of
+    the last item cannot both succeed (across worker processes too).
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+
+    # =========================================================
+    # LOOKUPS
+    # =========================================================
+    def getItem(self, catalogID):
+        return self.repo.get("catalog", catalogID)
+
+    def findItem(self, catalogIDOrName):
+        """Finds an item by catalogID, or by its display name (what the forms post)."""
+        item = self.getItem(catalogIDOrName)
+        if item is None:
+            matches = self.repo.find("catalog", "name", catalogIDOrName)
+            item = matches[0] if matches else None
+        return item
+
+    def listItems(self, category=None):
+        if category:
+            return self.repo.find("catalog", "category", category)
+        return self.repo.all("catalog")
+
+    # =========================================================
+    # STOCK
+    # =========================================================
+    def take(self, catalogID, qty):
+        """
+        Takes `qty` items out of stock.
+        Returns the updated catalog row, or None if the item is unknown or
+        there is not enough stock (nothing is changed then).
+        """
+        row = self.getItem(catalogID)
+        if row is None or qty <= 0 or row["stock"] < qty:
+            return None
+
+        item = self._toMerchandise(row)
+        item.updateStock(-qty)
+        return dict(row, stock=item.stock)
+
+    def takeMany(self, stock, catalogRows):
+        """
+        Bulk import: takes several items out of stock at once.
+        stock: {catalogID: qty}; catalogRows: {catalogID: row} holds the rows
+        already changed by the batch and receives the new ones.
+        Returns False (nothing changed) if any item is unknown or short.
+        """
+        rows = {}
+        for catalogID, qty in stock.items():
+            row = catalogRows.get(catalogID) or self.getItem(catalogID)
+            if row is None or row["stock"] < qty:
+                return False
+            rows[catalogID] = row
+
+        for catalogID, qty in stock.items():
+            catalogRows[catalogID] = dict(rows[catalogID], stock=rows[catalogID]["stock"] - qty)
+        return True
+
+    def restock(self, catalogID, qty):
+        """Puts items back (cancellation or delivery). Returns the updated row, or None."""
+        row = self.getItem(catalogID)
+        if row is None:
+            return None
+
+        item = self._toMerchandise(row)
+        item.updateStock(qty)
+        return dict(row, stock=item.stock)
+
+    def _toMerchandise(self, row):
+        return Merchandise(row["catalogID"], row["name"], 0, row["unitPrice"],
+                           row["category"], row["stock"])
@@ -0,0 +1,343 @@
+import threading
+import time
+import numpy as np
+from models.Review import Review, reviewStatus
+
+class ReportBuilder:
+    """
+    Admin reports over the whole sales history:
+    - ticket revenue by park, sale date and ticket type
+    - merchandise sell-through by category (sold / (sold + in stock))
+    - average rating overall and per month (approved reviews only)
+    - cancellation rate overall and per month
+    The collections are loaded once into column arrays: numbers as NumPy
+    arrays, text fields (parks, dates, categories) as integer codes into a
+    short list of labels, and every ticket / merch row with the position of
+    its order. A report is then a few masks and bincounts over those arrays,
+    so it takes milliseconds however many orders are stored.
+    Changes written by the controller are handed to apply(): new orders,
+    items and reviews are appended to the columns and a cancelled order or
+    a moderated review is updated in place, at the next report, so a sale
+    never forces a rebuild. The columns are rebuilt from scratch after a
+    reload (invalidate) or after `maxAge` seconds, which bounds how long
+    changes made by other worker processes go unseen.
+    Revenue and quantities leave out cancelled orders.
+    """
+
+    SOURCES = {"orders", "tickets", "merch", "reviews", "catalog"}
+
+    def __init__(self, repo, maxAge=30):
+        self.repo = repo
+        self.maxAge = maxAge
+        self.columns = None
+        self.builtAt = 0.0
+        self.pending = {}       # collection -> rows changed since the columns were last brought up to date
+        self.lock = threading.Lock()
+
+    def invalidate(self, names=SOURCES):
+        """Drops the columns if one of their collections was reloaded."""
+        if self.SOURCES.intersection(names):
+            with self.lock:
+                self.columns = None
+                self.pending = {}
+
+    def apply(self, changes):
+        """Takes the rows of one committed change ({collection: [rows]}); merged at the next report."""
+        with self.lock:
+            if self.columns is None or time.monotonic() - self.builtAt > self.maxAge:
+                # rebuilt anyway at the next report: nothing to keep
+                self.columns = None
+                self.pending = {}
+                return
+            for name, rows in changes.items():
+                if name in self.SOURCES:
+                    self.pending.setdefault(name, []).extend(rows)
+
+    # =========================================================
+    # REPORT
+    # =========================================================
+    def generate(self, since=None, until=None):
+        """
+        All reports as one dict. `since` / `until` are ISO dates limiting
+        the sale date (order date) and review date, both inclusive.
+        """
+        start = time.perf_counter()
+        columns = self._getColumns()
+
+        orders = columns["orders"]
+        inPeriod = orders["date"].mask(lambda day: _between(day, since, until))
+        # an item counts if its order is in the period and was not cancelled
+        sold = np.append(inPeriod & ~orders["cancelled"], False)   # order -1 (unknown) -> False
+
+        report = {
+            "period": {"from": since, "to": until},
+            "orders": self._orderReport(orders, inPeriod),
+            "tickets": self._ticketReport(columns["tickets"], orders, sold),
+            "merch": self._merchReport(columns["merch"], columns["catalog"], sold),
+            "ratings": self._ratingReport(columns["reviews"], since, until),
+        }
+        report["millis"] = round((time.perf_counter() - start) * 1000, 3)
+        return report
+
+    def _orderReport(self, orders, inPeriod):
+        cancelled = orders["cancelled"][inPeriod]
+        byMonth = orders["date"].month().group(inPeriod, orders=np.ones(len(cancelled)),
+                                               cancelled=cancelled)
+        for row in byMonth.values():
+            row["rate"] = _rate(row["cancelled"], row["orders"])
+
+        return {
+            "total": int(inPeriod.sum()),
+            "cancelled": int(cancelled.sum()),
+            "cancellationRate": _rate(cancelled.sum(), len(cancelled)),
+            "byMonth": byMonth,
+        }
+
+    def _ticketReport(self, tickets, orders, soldOrders):
+        sold = soldOrders[tickets["order"]]
+        quantity = tickets["quantity"][sold]
+        revenue = tickets["revenue"][sold]
+        saleDate = orders["date"].take(tickets["order"])
+
+        return {
+            "quantity": int(quantity.sum()),
+            "revenue": _money(revenue.sum()),
+            "byPark": tickets["parkName"].group(sold, quantity=quantity, revenue=revenue),
+            "byDate": saleDate.group(sold, quantity=quantity, revenue=revenue),
+            "byTicketType": tickets["ticketName"].group(sold, quantity=quantity, revenue=revenue),
+        }
+
+    def _merchReport(self, merch, catalog, soldOrders):
+        sold = soldOrders[merch["order"]]
+        quantity = merch["quantity"][sold]
+        revenue = merch["revenue"][sold]
+
+        byCategory = merch["category"].group(sold, sold=quantity, revenue=revenue)
+        everything = np.ones(len(catalog["stock"]), dtype=bool)
+        for category, stock in catalog["category"].group(everything, stock=catalog["stock"]).items():
+            byCategory.setdefault(category, {"sold": 0, "revenue": 0.0}).update(stock)
+        for row in byCategory.values():
+            row.setdefault("stock", 0)
+            row["sellThrough"] = _rate(row["sold"], row["sold"] + row["stock"])
+
+        return {
+            "quantity": int(quantity.sum()),
+            "revenue": _money(revenue.sum()),
+            "byCategory": dict(sorted(byCategory.items())),
+        }
+
+    def _ratingReport(self, reviews, since, until):
+        # pending and hidden reviews are not rated (see Admin.moderateReview)
+        inPeriod = reviews["date"].mask(lambda day: _between(day, since, until)) & reviews["approved"]
+        ratings = reviews["rating"][inPeriod]
+
+        # older reviews have no date: they are left out of the months
+        dated = inPeriod & reviews["date"].mask(bool)
+        byMonth = reviews["date"].month().group(dated, count=np.ones(int(dated.sum())),
+                                                total=reviews["rating"][dated])
+        for row in byMonth.values():
+            row["average"] = round(row.pop("total") / row["count"], 2)
+
+        stars = np.clip(np.rint(ratings), 1, 5).astype(int)
+        return {
+            "count": len(ratings),
+            "average": round(float(ratings.mean()), 2) if len(ratings) else None,
+            "distribution": {str(n): int(c) for n, c in
+                             enumerate(np.bincount(stars, minlength=6)[1:], 1)},
+            "byMonth": byMonth,
+        }
+
+    # =========================================================
+    # COLUMNS
+    # =========================================================
+    def _getColumns(self):
+        with self.lock:
+            if self.columns is None or time.monotonic() - self.builtAt > self.maxAge:
+                self.builtAt = time.monotonic()
+                self.pending = {}
+                self.columns = self._build()
+            elif self.pending:
+                self._merge(self.pending)
+                self.pending = {}
+            return self.columns
+
+    def _build(self):
+        orderRows = self.repo.all("orders")
+        positions = {row["orderID"]: i for i, row in enumerate(orderRows)}
+        reviews = self.repo.all("reviews")
+
+        return {
+            "orders": _orderColumns(orderRows),
+            "tickets": _ticketColumns(self.repo.all("tickets"), positions),
+            "merch": _merchColumns(self.repo.all("merch"), positions),
+            "reviews": _reviewColumns(reviews),
+            "catalog": _catalogColumns(self.repo.all("catalog")),
+            "positions": positions,
+            "reviewPositions": {row["reviewID"]: i for i, row in enumerate(reviews)},
+        }
+
+    def _merge(self, pending):
+        """Brings the columns up to date with the changes handed to apply()."""
+        columns = self.columns
+        positions = columns["positions"]
+
+        # orders: a known one can only have changed status (cancelled), new ones are appended
+        # (in their latest version: one may have been added and cancelled since the last report)
+        newOrders = {}
+        for row in pending.get("orders", ()):
+            orderID = row["orderID"]
+            if orderID in newOrders or orderID not in positions:
+                positions.setdefault(orderID, len(positions))
+                newOrders[orderID] = row
+            else:
+                columns["orders"]["cancelled"][positions[orderID]] = row["status"] == "cancelled"
+        if newOrders:
+            columns["orders"] = _concat(columns["orders"], _orderColumns(list(newOrders.values())))
+
+        # tickets and merch rows are only ever added
+        if pending.get("tickets"):
+            columns["tickets"] = _concat(columns["tickets"], _ticketColumns(pending["tickets"], positions))
+        if pending.get("merch"):
+            columns["merch"] = _concat(columns["merch"], _merchColumns(pending["merch"], positions))
+
+        # reviews: moderation changes a known one, new ones are appended
+        reviewPositions = columns["reviewPositions"]
+        newReviews = {}
+        for row in pending.get("reviews", ()):
+            reviewID = row["reviewID"]
+            if reviewID in newReviews or reviewID not in reviewPositions:
+                reviewPositions.setdefault(reviewID, len(reviewPositions))
+                newReviews[reviewID] = row
+            else:
+                position = reviewPositions[reviewID]
+                columns["reviews"]["approved"][position] = reviewStatus(row) == Review.APPROVED
+                columns["reviews"]["rating"][position] = float(row.get("rating") or 0)
+        if newReviews:
+            columns["reviews"] = _concat(columns["reviews"], _reviewColumns(list(newReviews.values())))
+
+        # the catalog is small: read again
+        if pending.get("catalog"):
+            columns["catalog"] = _catalogColumns(self.repo.all("catalog"))
+
+class Labels:
+    """
+    A text column stored as codes: `labels` holds each distinct value once,
+    `codes[i]` is the position of row i's value in `labels`.
+    """
+
+    def __init__(self, labels, codes):
+        self.labels = labels
+        self.codes = codes
+
+    @classmethod
+    def of(cls, rows, field):
+        # missing values become "" (so there is one code per row)
+        index = {}
+        codes = np.fromiter((index.setdefault(str(row.get(field) or ""), len(index)) for row in rows),
+                            dtype=np.int64, count=len(rows))
+        return cls(list(index), codes)
+
+    def concat(self, other):
+        """This column followed by `other` (the labels are merged, codes renumbered)."""
+        index = {label: code for code, label in enumerate(self.labels)}
+        recode = np.fromiter((index.setdefault(label, len(index)) for label in other.labels),
+                             dtype=np.int64, count=len(other.labels))
+        return Labels(list(index), np.concatenate([self.codes, recode[other.codes]]))
+
+    def mask(self, test):
+        """Rows whose value passes test(label) (run once per distinct value)."""
+        passed = np.fromiter((bool(test(label)) for label in self.labels), dtype=bool,
+                             count=len(self.labels))
+        return passed[self.codes]
+
+    def take(self, positions):
+        """The value at each of `positions` (-1 gives "")."""
+        return Labels(self.labels + [""], np.append(self.codes, len(self.labels))[positions])
+
+    def month(self):
+        """The same dates cut to their month ("2026-10-18" -> "2026-10")."""
+        index = {}
+        toMonth = np.fromiter((index.setdefault(label[:7], len(index)) for label in self.labels),
+                              dtype=np.int64, count=len(self.labels))
+        return Labels(list(index), toMonth[self.codes])
+
+    def group(self, rows, **values):
+        """
+        {label: {name: total}} summing each of `values` (arrays over the
+        selected rows) per label, for the rows selected by the `rows` mask.
+        """
+        codes = self.codes[rows]
+        size = len(self.labels)
+        present = np.bincount(codes, minlength=size) > 0
+        sums = {name: np.bincount(codes, weights=value, minlength=size)
+                for name, value in values.items()}
+        return {self.labels[i]: {name: _value(name, total[i]) for name, total in sums.items()}
+                for i in sorted(np.flatnonzero(present), key=self.labels.__getitem__)}
+
+# -------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------
+def _orderColumns(rows):
+    return {
+        "date": Labels.of(rows, "date"),
+        "cancelled": np.fromiter((row["status"] == "cancelled" for row in rows),
+                                 dtype=bool, count=len(rows)),
+    }
+
+def _ticketColumns(rows, positions):
+    return dict(_itemColumns(rows, positions), parkName=Labels.of(rows, "parkName"),
+                ticketName=Labels.of(rows, "ticketName"))
+
+def _merchColumns(rows, positions):
+    return dict(_itemColumns(rows, positions), category=Labels.of(rows, "category"))
+
+def _reviewColumns(rows):
+    return {
+        "rating": _numbers(rows, "rating"),
+        "date": Labels.of(rows, "date"),
+        "approved": np.fromiter((reviewStatus(row) == Review.APPROVED for row in rows),
+                                dtype=bool, count=len(rows)),
+    }
+
+def _catalogColumns(rows):
+    return {
+        "category": Labels.of(rows, "category"),
+        "stock": _numbers(rows, "stock"),
+    }
+
+def _concat(columns, more):
+    # arrays are concatenated, Labels merged
+    return {name: value.concat(more[name]) if isinstance(value, Labels) else
+            np.concatenate([value, more[name]]) for name, value in columns.items()}
+
+def _itemColumns(rows, positions):
+    quantity = _numbers(rows, "quantity")
+    return {
+        # position of the item's order, -1 if it is not stored
+        "order": np.fromiter((positions.get(row.get("orderID"), -1) for row in rows),
+                             dtype=np.int64, count=len(rows)),
+        "quantity": quantity,
+        "revenue": quantity * _numbers(rows, "unitPrice"),
+    }
+
+def _numbers(rows, field):
+    return np.fromiter((float(row.get(field) or 0) for row in rows), dtype=float, count=len(rows))
+
+def _between(day, since, until):
+    if not (since or until):
+        return True
+    # undated rows only count when no period is asked for
+    return bool(day) and (not since or day >= since) and (not until or day <= until)
+
+def _value(name, total):
+    if name == "revenue":
+        return _money(total)
+    if name == "total":
+        return float(total)
+    return int(round(total))
+
+def _money(amount):
+    return round(float(amount), 2)
+
+def _rate(part, whole):
+    return round(float(part) / float(whole), 4) if whole else 0.0
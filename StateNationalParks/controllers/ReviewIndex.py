@@ -0,0 +1,213 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from contextlib import contextmanager
+from models.Review import Review, reviewStatus
+
+# words too common to narrow a search down
+STOP_WORDS = {"a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "had", "has",
+              "have", "i", "in", "is", "it", "its", "me", "my", "of", "on", "or", "so", "that",
+              "the", "this", "to", "was", "we", "were", "with", "you"}
+
+WORD = re.compile(r"[a-z0-9]+")
+
+def terms(text):
+    """The distinct search terms of a text (lower case, stop words left out)."""
+    return {word for word in WORD.findall(str(text or "").lower()) if word not in STOP_WORDS}
+
+class ReviewIndex:
+    """
+    Reviews kept ready for reading, so no request scans the review collection:
+    - an inverted index over the comment text: term -> review numbers
+    - rating histograms (1..5 stars) overall and per park, from which the
+      averages are computed; only approved reviews are counted, like in
+      ReportBuilder (pending and hidden ones are not public)
+    - the moderation queue: pending reviews, oldest first
+    Every review gets a number in storage order when it is first seen;
+    postings and the queue hold those numbers, not the review IDs.
+    Reviews written by this controller are added as they are committed
+    (add()); reviews added by other worker processes are picked up at most
+    `catchUpEvery` seconds later by reading the rows stored after the last
+    one seen, and a full rebuild after `maxAge` seconds picks up the
+    moderation done by other workers.
+    """
+
+    def __init__(self, repo, maxAge=300, catchUpEvery=1.0):
+        self.repo = repo
+        self.maxAge = maxAge
+        self.catchUpEvery = catchUpEvery
+        self.lock = threading.Lock()
+        self.builtAt = None
+        self._clear()
+
+    def _clear(self):
+        self.numbers = {}       # reviewID -> review number
+        self.docs = []          # review number -> (reviewID, parkName, stars, status, terms)
+        self.postings = {}      # term -> {review number}
+        self.histograms = {}    # parkName (None = every park) -> [count of 1..5 stars at 1..5, rating sum at 0]
+        self.pending = []       # numbers of pending reviews, ascending
+        self.lastKey = None     # reviewID of the last stored row read
+        self.caughtUpAt = 0.0
+
+    # =========================================================
+    # UPDATES
+    # =========================================================
+    def add(self, row):
+        """Indexes a new review row, or re-indexes one that changed."""
+        with self.lock:
+            if self.builtAt is not None:
+                self._index(row)
+
+    def _index(self, row):
+        reviewID = row["reviewID"]
+        number = self.numbers.get(reviewID)
+        if number is None:
+            number = self.numbers[reviewID] = len(self.docs)
+            self.docs.append(None)
+        else:
+            self._unindex(number)
+
+        doc = (reviewID, row.get("parkName"), _stars(row.get("rating")), reviewStatus(row),
+               frozenset(terms(row.get("comment"))))
+        self.docs[number] = doc
+        _, parkName, stars, status, words = doc
+
+        for word in words:
+            self.postings.setdefault(word, set()).add(number)
+        if status == Review.APPROVED:
+            self._count(parkName, stars, 1)
+        if status == Review.PENDING:
+            bisect.insort(self.pending, number)
+
+    def _unindex(self, number):
+        _, parkName, stars, status, words = self.docs[number]
+        for word in words:
+            postings = self.postings[word]
+            postings.discard(number)
+            if not postings:
+                del self.postings[word]
+        if status == Review.APPROVED:
+            self._count(parkName, stars, -1)
+        if status == Review.PENDING:
+            del self.pending[bisect.bisect_left(self.pending, number)]
+
+    def _count(self, parkName, stars, sign):
+        for key in {None, parkName}:
+            histogram = self.histograms.setdefault(key, [0.0, 0, 0, 0, 0, 0])
+            histogram[0] += sign * stars
+            histogram[stars] += sign
+
+    # =========================================================
+    # READING
+    # =========================================================
+    def search(self, query, parkName=None, minRating=None, limit=20):
+        """
+        Approved reviews whose comment contains every term of `query` (newest first),
+        optionally only for one park or with at least `minRating` stars.
+        Returns {"total": matches, "reviews": [stored rows]}.
+        """
+        wanted = terms(query)
+        with self._ready():
+            if not wanted:
+                return {"total": 0, "reviews": []}
+            sets = sorted((self.postings.get(word, set()) for word in wanted), key=len)
+            # intersect starting from the rarest term, so the work follows the smallest list
+            matches = sets[0].intersection(*sets[1:]) if sets[0] else set()
+
+            def keep(number):
+                _, park, stars, status, _ = self.docs[number]
+                return status == Review.APPROVED and (parkName is None or park == parkName) and \
+                    (minRating is None or stars >= minRating)
+
+            found = [number for number in matches if keep(number)]
+            newest = heapq.nlargest(limit, found)
+            reviewIDs = [self.docs[number][0] for number in newest]
+
+        rows = (self.repo.get("reviews", reviewID) for reviewID in reviewIDs)
+        return {"total": len(found), "reviews": [row for row in rows if row]}
+
+    def ratings(self, parkName=None):
+        """Count, average and star distribution of the approved reviews (of one park, or all)."""
+        with self._ready():
+            histogram = list(self.histograms.get(parkName) or [0.0, 0, 0, 0, 0, 0])
+        count = sum(histogram[1:])
+        return {
+            "parkName": parkName,
+            "count": count,
+            "average": round(histogram[0] / count, 2) if count else None,
+            "distribution": {str(stars): histogram[stars] for stars in range(1, 6)},
+        }
+
+    def ratingsByPark(self):
+        """ratings() of every park that has reviews."""
+        with self._ready():
+            parks = sorted(park for park in self.histograms if park is not None)
+        return {park: self.ratings(park) for park in parks}
+
+    def queue(self, after=None, limit=20):
+        """
+        Pending reviews, oldest first: {"reviews": [...], "total": pending,
+        "nextCursor": reviewID or None}. Pass nextCursor back as `after`.
+        """
+        with self._ready():
+            start = 0
+            if after is not None and after in self.numbers:
+                start = bisect.bisect_right(self.pending, self.numbers[after])
+            numbers = self.pending[start:start + limit]
+            reviewIDs = [self.docs[number][0] for number in numbers]
+            more = start + limit < len(self.pending)
+            total = len(self.pending)
+
+        rows = [row for row in (self.repo.get("reviews", reviewID) for reviewID in reviewIDs) if row]
+        return {"reviews": rows, "total": total,
+                "nextCursor": reviewIDs[-1] if more and reviewIDs else None}
+
+    # ---------------------------------------------
+    # Building and catching up
+    # ---------------------------------------------
+    @contextmanager
+    def _ready(self):
+        """Holds the lock, once the index has been (re)built or caught up."""
+        now = time.monotonic()
+        rebuild = self.builtAt is None or now - self.builtAt > self.maxAge
+        if rebuild or now - self.caughtUpAt > self.catchUpEvery:
+            # outside self.lock: the controller adds reviews after its write lock is released,
+            # and refresh() takes that lock
+            self.repo.refresh()
+
+        with self.lock:
+            # checked again: another thread may have done it while we waited
+            if self.builtAt is None or now - self.builtAt > self.maxAge:
+                self._build()
+            elif now - self.caughtUpAt > self.catchUpEvery:
+                self._catchUp()
+            yield
+
+    def _build(self):
+        self._clear()
+        rows = self.repo.all("reviews")
+        for row in rows:
+            self._index(row)
+        if rows:
+            self.lastKey = rows[-1]["reviewID"]
+        self.builtAt = self.caughtUpAt = time.monotonic()
+
+    def _catchUp(self, batch=1000):
+        while True:
+            rows = self.repo.page("reviews", self.lastKey, batch)
+            for row in rows:
+                self._index(row)
+            if rows:
+                self.lastKey = rows[-1]["reviewID"]
+            if len(rows) < batch:
+                break
+        self.caughtUpAt = time.monotonic()
+
+def _stars(rating):
+    # whole stars 1..5 (ratings are stored as given)
+    try:
+        return min(5, max(1, int(round(float(rating)))))
+    except (TypeError, ValueError):
+        return 1
@@ -1,5 +1,15 @@
-import json
-from datetime import date
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import config
+from storage.RepositoryFactory import createRepository
+from storage.IDAllocator import IDAllocator
+from storage.StripedLock import StripedLock
+from storage.Metrics import metrics
+from storage.IdempotencyCache import IdempotencyCache
+from controllers.CapacityManager import CapacityManager
+from controllers.MerchCatalog import MerchCatalog
+from controllers.ReportBuilder import ReportBuilder
+from controllers.ReviewIndex import ReviewIndex
 from models.Order import Order
 from models.Ticket import Ticket
 from models.Merchandise import Merchandise
@@ -8,6 +18,13 @@ from models.Receipt import Receipt
 from models.Review import Review
 from models.Statistic import Statistic
 
+CONTROLLER_SECONDS = metrics.histogram("snp_controller_seconds",
+                                       "Time spent loading, saving and committing changes",
+                                       ["operation"])
+
+class CheckoutError(Exception):
+    """A cart could not be bought (invalid line, sold out, out of stock, payment failed)."""
+
 class SystemController:
     """
     Central controller managing:
@@ -18,167 +35,710 @@ class SystemController:
     - Receipts
     - Reviews
     - Statistics
+
+    Mutations work on the model objects (Order, Ticket, Merchandise,
+    Payment, Receipt, Review); they become rows (toDict) only when written.
+    Lookups return the stored rows as they are.
+
+    Safe to share between threads and worker processes: every change runs
+    inside repo.transaction() (one writer at a time, after catching up with
+    the other workers), and changes to one order also hold that order's
+    stripe of self.locks.
     """
 
-    def __init__(self):
-        # Lists used by system
-        self.orderList = []
-        self.ticketList = []
-        self.merchList = []
-        self.reviewList = []
-        self.paymentList = []
-        self.receiptList = []
-        self.statistic = Statistic()
+    COLLECTIONS = ["orders", "tickets", "merch", "payments", "receipts", "reviews",
+                   "capacity", "catalog"]
+
+    # ID prefix -> collection it is used in
+    ID_PREFIXES = {
+        "ORD": "orders",
+        "T": "tickets",
+        "M": "merch",
+        "PAY": "payments",
+        "REC": "receipts",
+        "R": "reviews",
+    }
+
+    def __init__(self, storageMode=None, repo=None, ids=None):
+        self.locks = StripedLock(config.LOCK_STRIPES, "order")
+
+        # storage backend ("json", "journal" or "sqlite"), may be shared with AuthManager
+        if repo is None:
+            files = {name: config.DATA_FILES[name] for name in self.COLLECTIONS + ["statistics"]}
+            repo = createRepository(files, storageMode)
+        self.repo = repo
+
+        if not self.repo.loaded:
+            self.repo.load()
+
+        # counters live in the repository's statistics dict and are updated in place
+        self.statistic = Statistic(self.repo.getStatistics(), config.TOP_SELLERS)
+        self.statisticsVersion = self.repo.statisticsVersion
+
+        # called with the names of the collections changed by each write
+        # (e.g. to invalidate cached pages), see addListener
+        self.listeners = []
+
+        # results of purchases sent with an idempotency key, for their retries
+        self.completed = IdempotencyCache(config.IDEMPOTENCY_CACHE_SIZE, config.IDEMPOTENCY_TTL)
+
+        self.capacity = CapacityManager(self.repo)
+        self.catalog = MerchCatalog(self.repo)
+
+        # admin reports, kept up to date with every change this controller commits
+        self.reports = ReportBuilder(self.repo, config.REPORT_MAX_AGE)
 
-        # JSON file paths
-        self.orderFile = "data/orders.json"
-        self.ticketFile = "data/tickets.json"
-        self.merchFile = "data/merchandise.json"
-        self.paymentFile = "data/payments.json"
-        self.receiptFile = "data/receipts.json"
-        self.reviewFile = "data/reviews.json"
-        self.statFile = "data/statistics.json"
+        # review search, rating averages and the moderation queue
+        self.reviews = ReviewIndex(self.repo, config.REVIEW_INDEX_MAX_AGE)
 
-        self.loadData()
+        self.ids = ids or IDAllocator(config.COUNTER_FILE, config.ID_BLOCK_SIZE)
+        for prefix, name in self.ID_PREFIXES.items():
+            self.ids.register(prefix, lambda name=name, prefix=prefix: self.repo.maxKeyNumber(name, prefix))
+
+    # Lists used by system (live lists for the JSON backends, fresh copies for SQLite)
+    @property
+    def orderList(self):
+        return self.repo.all("orders")
+
+    @property
+    def ticketList(self):
+        return self.repo.all("tickets")
+
+    @property
+    def merchList(self):
+        return self.repo.all("merch")
+
+    @property
+    def paymentList(self):
+        return self.repo.all("payments")
+
+    @property
+    def receiptList(self):
+        return self.repo.all("receipts")
+
+    @property
+    def reviewList(self):
+        return self.repo.all("reviews")
 
     # =========================================================
     # LOADING AND SAVING
     # =========================================================
     def loadData(self):
-        """Loads lists from JSON files."""
-        self.orderList = self._load(self.orderFile)
-        self.ticketList = self._load(self.ticketFile)
-        self.merchList = self._load(self.merchFile)
-        self.paymentList = self._load(self.paymentFile)
-        self.receiptList = self._load(self.receiptFile)
-        self.reviewList = self._load(self.reviewFile)
-
-        statData = self._load(self.statFile)
-        if statData:
-            self.statistic.totalOrders = statData.get("totalOrders", 0)
-            self.statistic.totalRevenue = statData.get("totalRevenue", 0)
+        """Loads lists from storage."""
+        with CONTROLLER_SECONDS.time(operation="load"):
+            self.repo.load()
+            self._syncStatistics()
+        self.reports.invalidate()
+        self._notify(self.COLLECTIONS + ["statistics"])
 
     def saveData(self):
-        """Saves lists into JSON files."""
-        self._save(self.orderFile, self.orderList)
-        self._save(self.ticketFile, self.ticketList)
-        self._save(self.merchFile, self.merchList)
-        self._save(self.paymentFile, self.paymentList)
-        self._save(self.receiptFile, self.receiptList)
-        self._save(self.reviewFile, self.reviewList)
-
-        statObj = {
-            "totalOrders": self.statistic.totalOrders,
-            "totalRevenue": self.statistic.totalRevenue
-        }
-        self._save(self.statFile, statObj)
+        """Writes everything (including statistics) to storage."""
+        with CONTROLLER_SECONDS.time(operation="save"):
+            self.repo.snapshot(self.statistic.data)
 
-    def _load(self, path):
-        """Helper function to load JSON safely."""
-        try:
-            with open(path, "r") as file:
-                return json.load(file)
-        except:
-            return []
+    def _syncStatistics(self):
+        # the counters were changed by a reload or another process
+        if self.statisticsVersion != self.repo.statisticsVersion:
+            self.statistic.reload()
+            self.statisticsVersion = self.repo.statisticsVersion
+
+    @contextmanager
+    def _writing(self):
+        """
+        Runs a change with no other writer (thread or process) in between,
+        starting from the latest statistics.
+        """
+        with self.repo.transaction():
+            self._syncStatistics()
+            yield
+
+    def _commit(self, changes):
+        """
+        Persists one mutation together with the statistics it changed.
+        `changes` maps a collection name to the rows or model objects that were added or updated.
+        """
+        with CONTROLLER_SECONDS.time(operation="commit"):
+            changes = {name: [self._toRow(r) for r in rows] for name, rows in changes.items()}
+            statistics = self.statistic.takeChanges()
+            self.repo.put(changes, statistics)
+        self.statisticsVersion = self.repo.statisticsVersion
+        self.reports.apply(changes)
+        self._notify(list(changes) + (["statistics"] if statistics else []))
 
-    def _save(self, path, data):
-        """Helper function to save JSON safely."""
-        with open(path, "w") as file:
-            json.dump(data, file, indent=4)
+    def _toRow(self, item):
+        return item if isinstance(item, dict) else item.toDict()
+
+    def addListener(self, callback):
+        """Registers callback(collectionNames), called after every change this controller writes."""
+        self.listeners.append(callback)
+
+    def _notify(self, names):
+        for callback in self.listeners:
+            callback(names)
 
     # =========================================================
     # ORDER CREATION
     # =========================================================
     def createOrder(self, customer):
         """Creates a new order."""
+        order = self._newOrder(customer)
+        with self._writing():
+            self._commit({"orders": [order]})
+
+        return order.orderID
+
+    def _newOrder(self, customer, requestKey=None):
+        now = datetime.now()
+        return Order(self.ids.next("ORD"), customer.userID,
+                     now.isoformat(timespec="seconds"), status="active", requestKey=requestKey)
+
+    # =========================================================
+    # LOOKUPS (served from the repository indexes)
+    # =========================================================
+    def getOrder(self, orderID):
+        return self.repo.get("orders", orderID)
+
+    def getOrdersByCustomer(self, customerID):
+        return self.repo.find("orders", "customerID", customerID)
+
+    def getOrderItems(self, orderID):
+        """Returns the ticket and merchandise rows bought in an order."""
+        return (self.repo.find("tickets", "orderID", orderID) +
+                self.repo.find("merch", "orderID", orderID))
+
+    def getOrderHistory(self, customerID=None, status=None, parkName=None, when=None,
+                        sort="newest", cursor=None, limit=None):
+        """
+        One page of orders with their items, newest first (sort="oldest" reverses it).
+        Filters: customerID, status, parkName (any ticket for that park) and
+        when="upcoming" / "past" (by ticket visit dates).
+        Returns {"orders": [...], "nextCursor": orderID or None}; pass nextCursor
+        back as `cursor` for the next page. Work per call is bounded by the page
+        size and config.ORDER_SCAN_LIMIT, not by the number of orders stored.
+        """
+        limit = max(1, min(limit or config.ORDER_PAGE_SIZE, config.ORDER_PAGE_MAX))
+        descending = sort != "oldest"
+
+        # walk the most selective index available
+        if customerID is not None:
+            field, value = "customerID", customerID
+        elif status is not None:
+            field, value = "status", status
+        else:
+            field, value = None, None
+
         today = str(date.today())
-        orderID = f"ORD{len(self.orderList)+1}"
+        orders, scanned, after = [], 0, cursor
+        while len(orders) < limit and scanned < config.ORDER_SCAN_LIMIT:
+            rows = self.repo.page("orders", after, limit, descending, field, value)
+            for order in rows:
+                scanned += 1
+                after = order["orderID"]
 
-        order = {
-            "orderID": orderID,
-            "customerID": customer.userID,
-            "date": today,
-            "status": "active"
-        }
+                if status is not None and order["status"] != status:
+                    continue
+                items = self.getOrderItems(order["orderID"])
+                if self._matchesVisit(items, parkName, when, today):
+                    orders.append(dict(order, items=items))
+                    if len(orders) == limit:
+                        break
 
-        self.orderList.append(order)
-        self.saveData()
+            if len(rows) < limit and len(orders) < limit:
+                return {"orders": orders, "nextCursor": None}   # reached the end
 
-        return orderID
+        return {"orders": orders, "nextCursor": after}
+
+    def _matchesVisit(self, items, parkName, when, today):
+        tickets = [i for i in items if "visitDate" in i]
+        if parkName is not None and not any(t["parkName"] == parkName for t in tickets):
+            return False
+        if when == "upcoming":
+            return any(t["visitDate"] >= today for t in tickets)
+        if when == "past":
+            return bool(tickets) and all(t["visitDate"] < today for t in tickets)
+        return True
 
     # =========================================================
     # PURCHASE TICKET
     # =========================================================
-    def purchaseTicket(self, customer, ticketData):
-        """Customer buys a ticket."""
-
-        ticket = {
-            "itemID": f"T{len(self.ticketList)+1}",
-            "name": ticketData["ticketName"],
-            "quantity": ticketData["qty"],
-            "unitPrice": ticketData["price"],
-            "visitDate": ticketData["visitDate"],
-            "parkName": ticketData["parkName"],
-            "ticketName": ticketData["ticketName"],
-            "quotaAvailable": 100
-        }
+    def purchaseTicket(self, customer, ticketData, requestKey=None):
+        """
+        Customer buys a ticket. Sent again with the same `requestKey`
+        (idempotency key) it buys nothing and returns the first result.
+        """
+        done = self._previousResult(customer, requestKey)
+        if done is not None:
+            return done
 
-        self.ticketList.append(ticket)
+        order = self._newOrder(customer, requestKey)
+        ticket = Ticket(self.ids.next("T"), ticketData["ticketName"], ticketData["qty"],
+                        ticketData["price"], ticketData["visitDate"], ticketData["parkName"],
+                        ticketData["ticketName"], 0)
+        order.addItem(ticket)
+        slot = (ticket.parkName, ticket.visitDate, ticket.ticketName)
 
-        # Update statistics
-        self.statistic.totalOrders += 1
-        self.statistic.totalRevenue += ticketData["price"] * ticketData["qty"]
+        with self._writing():
+            done = self._previousResult(customer, requestKey, stored=True)
+            if done is not None:
+                return done
 
-        self.saveData()
-        return True
+            # seats are checked and sold in the same transaction
+            holdID = self.capacity.reserve(*slot, ticket.quantity)
+            if holdID is None:
+                return False  # Sold out
+            slotRow = self.capacity.commit(holdID, *slot)
+            ticket.quotaAvailable = slotRow["capacity"] - slotRow["sold"]
+
+            # Update statistics
+            self.statistic.updateStatistics(order)
+
+            self._commit({"orders": [order], "tickets": [ticket], "capacity": [slotRow]})
+        return self._rememberResult(customer, requestKey, True)
+
+    def getDashboard(self):
+        """Admin dashboard numbers, read from the running statistics."""
+        now = datetime.now()
+        self.repo.refresh()
+        self._syncStatistics()
+        return self.statistic.generateDashboard(str(now.date()), now.strftime("%Y-%m-%dT%H"))
+
+    def getReports(self, since=None, until=None):
+        """Admin reports (revenue, sell-through, ratings, cancellations), see ReportBuilder."""
+        return self.reports.generate(since, until)
+
+    def ticketAvailability(self, parkName, visitDate, ticketName):
+        """Seats left for a park, date and ticket type (cheap enough for every page view)."""
+        return self.capacity.available(parkName, visitDate, ticketName)
 
     # =========================================================
     # PURCHASE MERCHANDISE
     # =========================================================
-    def purchaseMerch(self, customer, merchData):
-        """Customer buys merchandise."""
+    def purchaseMerch(self, customer, merchData, requestKey=None):
+        """
+        Customer buys merchandise from the catalog.
+        merchData: {"name": catalogID or item name, "qty": n}
+        Returns False if the item is unknown or out of stock. Sent again with
+        the same `requestKey` it buys nothing and returns the first result.
+        """
+        done = self._previousResult(customer, requestKey)
+        if done is not None:
+            return done
+
+        item = self.catalog.findItem(merchData["name"])
+        if item is None:
+            return False
+        qty = merchData["qty"]
+
+        order = self._newOrder(customer, requestKey)
+        merchID = self.ids.next("M")
+
+        with self._writing():
+            done = self._previousResult(customer, requestKey, stored=True)
+            if done is not None:
+                return done
+
+            # stock is checked and taken in the same transaction
+            catalogRow = self.catalog.take(item["catalogID"], qty)
+            if catalogRow is None:
+                return False  # Out of stock
+
+            merch = Merchandise(merchID, catalogRow["name"], qty, catalogRow["unitPrice"],
+                                catalogRow["category"], catalogRow["stock"],
+                                catalogID=catalogRow["catalogID"])
+            order.addItem(merch)
+
+            self.statistic.updateStatistics(order)
 
-        merch = {
-            "itemID": f"M{len(self.merchList)+1}",
-            "name": merchData["name"],
-            "quantity": merchData["qty"],
-            "unitPrice": merchData["price"],
-            "category": merchData["category"],
-            "stock": merchData["stock"]
+            self._commit({"orders": [order], "merch": [merch], "catalog": [catalogRow]})
+        return self._rememberResult(customer, requestKey, True)
+
+    # =========================================================
+    # CHECKOUT (whole cart as one order)
+    # =========================================================
+    def checkout(self, customer, cart, requestKey=None):
+        """
+        Buys a whole cart as one order, in one transaction and one write.
+        cart: [{"type": "ticket", "ticketName", "price", "qty", "visitDate", "parkName"},
+               {"type": "merch", "name": catalogID or item name, "qty"}, ...]
+        Builds an Order with Ticket / Merchandise items, processes the Payment
+        and issues a Receipt. Returns a summary dict.
+        Raises CheckoutError if any line cannot be bought (nothing is saved then).
+        Sent again with the same `requestKey` (idempotency key) it buys
+        nothing and returns the summary of the first checkout.
+        """
+        done = self._previousResult(customer, requestKey)
+        if done is not None:
+            return done
+        tickets, merch = self._readCart(cart)
+
+        now = datetime.now()
+        order = Order(self.ids.next("ORD"), customer.userID, now.isoformat(timespec="seconds"),
+                      requestKey=requestKey)
+        ticketIDs = self.ids.nextBatch("T", len(tickets))
+        merchIDs = self.ids.nextBatch("M", len(merch))
+        paymentID = self.ids.next("PAY")
+        receiptID = self.ids.next("REC")
+
+        with self._writing():
+            done = self._previousResult(customer, requestKey, stored=True)
+            if done is not None:
+                return done
+
+            slotRows, catalogRows = self._takeCart(tickets, merch)
+
+            for itemID, line in zip(ticketIDs, tickets):
+                slotRow = slotRows[line["slot"]]
+                order.addItem(Ticket(itemID, line["ticketName"], line["qty"], line["price"],
+                                     line["visitDate"], line["parkName"], line["ticketName"],
+                                     slotRow["capacity"] - slotRow["sold"]))
+            for itemID, line in zip(merchIDs, merch):
+                catalogID = line["catalogID"]
+                catalogRow = catalogRows[catalogID]
+                order.addItem(Merchandise(itemID, catalogRow["name"], line["qty"],
+                                          catalogRow["unitPrice"], catalogRow["category"],
+                                          catalogRow["stock"], catalogID=catalogID))
+
+            payment = Payment(paymentID, order.orderID, order.calculateTotal())
+            if not payment.processPayment():
+                raise CheckoutError("Payment was declined.")
+            order.status = "active"
+            order.total, order.paymentID = payment.amount, payment.paymentID
+            receipt = Receipt(receiptID, order.orderID, paymentID)
+
+            self.statistic.updateStatistics(order)
+
+            self._commit({
+                "orders": [order],
+                "tickets": [i for i in order.items if isinstance(i, Ticket)],
+                "merch": [i for i in order.items if isinstance(i, Merchandise)],
+                "payments": [payment],
+                "receipts": [receipt],
+                "capacity": list(slotRows.values()),
+                "catalog": list(catalogRows.values()),
+            })
+
+        return self._rememberResult(customer, requestKey, self._checkoutSummary(order, receipt))
+
+    def _checkoutSummary(self, order, receipt):
+        return {
+            "orderID": order.orderID,
+            "paymentID": receipt.paymentID,
+            "receiptID": receipt.receiptID,
+            "total": order.total,
+            "items": len(order.items),
+            "receipt": receipt.generate(),
         }
 
-        self.merchList.append(merch)
+    def _readCart(self, cart):
+        # validated before any ID is allocated or lock is taken
+        if not isinstance(cart, list) or not cart:
+            raise CheckoutError("The cart is empty.")
 
-        self.statistic.totalOrders += 1
-        self.statistic.totalRevenue += merchData["price"] * merchData["qty"]
+        tickets, merch = [], []
+        for n, line in enumerate(cart, 1):
+            try:
+                qty = int(line["qty"])
+                if qty <= 0:
+                    raise ValueError
+                if line.get("type") == "ticket":
+                    price = float(line["price"])
+                    if price < 0:
+                        raise ValueError
+                    tickets.append({
+                        "ticketName": line["ticketName"], "price": price, "qty": qty,
+                        "visitDate": line["visitDate"], "parkName": line["parkName"],
+                        "slot": (line["parkName"], line["visitDate"], line["ticketName"]),
+                    })
+                elif line.get("type") == "merch":
+                    item = self.catalog.findItem(line["name"])
+                    if item is None:
+                        raise CheckoutError(f"Unknown item: {line['name']}")
+                    merch.append({"catalogID": item["catalogID"], "qty": qty})
+                else:
+                    raise ValueError
+            except (KeyError, TypeError, ValueError):
+                raise CheckoutError(f"Cart line {n} is not valid.")
+        return tickets, merch
 
-        self.saveData()
-        return True
+    def _takeCart(self, tickets, merch):
+        """
+        Sells the seats and stock of a cart (inside the transaction).
+        Lines for the same slot / item are added up first, so each row changes once.
+        Returns ({slot: slot row}, {catalogID: catalog row}).
+        """
+        seats, stock = {}, {}
+        for line in tickets:
+            seats[line["slot"]] = seats.get(line["slot"], 0) + line["qty"]
+        for line in merch:
+            stock[line["catalogID"]] = stock.get(line["catalogID"], 0) + line["qty"]
+
+        holds = {}
+        try:
+            for slot, qty in seats.items():
+                holdID = self.capacity.reserve(*slot, qty)
+                if holdID is None:
+                    raise CheckoutError(f"Not enough {slot[2]} tickets left for {slot[0]} on {slot[1]}.")
+                holds[slot] = holdID
+
+            catalogRows = {}
+            for catalogID, qty in stock.items():
+                row = self.catalog.take(catalogID, qty)
+                if row is None:
+                    raise CheckoutError(f"Sorry, {catalogID} is out of stock.")
+                catalogRows[catalogID] = row
+        except CheckoutError:
+            for holdID in holds.values():
+                self.capacity.release(holdID)
+            raise
+
+        slotRows = {slot: self.capacity.commit(holdID, *slot) for slot, holdID in holds.items()}
+        return slotRows, catalogRows
+
+    # =========================================================
+    # BULK IMPORT (see tools/bulk.py)
+    # =========================================================
+    def importOrders(self, records, batchSize=None):
+        """
+        Imports already-sold orders (e.g. partner ticket sales), streaming.
+        records: iterable of {"customerID", "date" (ISO date / datetime of the
+        sale, default now), "items": [cart lines as for checkout()]}.
+        Each batch gets its IDs in one go and is written in one transaction:
+        seats, stock, statistics and indexes are updated once per batch.
+        Records that are invalid or do not fit the remaining seats / stock are
+        skipped. Returns {"orders", "items", "rejected": [{"record", "error"}]}.
+        """
+        batchSize = batchSize or config.BULK_BATCH_SIZE
+        summary = {"orders": 0, "items": 0, "rejected": []}
+
+        batch = []
+        for n, record in enumerate(records, 1):
+            try:
+                batch.append(self._readImport(n, record))
+            except CheckoutError as e:
+                summary["rejected"].append({"record": n, "error": str(e)})
+            if len(batch) >= batchSize:
+                self._importBatch(batch, summary)
+                batch = []
+        if batch:
+            self._importBatch(batch, summary)
+        return summary
+
+    def _readImport(self, n, record):
+        try:
+            customerID = record["customerID"]
+            when = record.get("date") or datetime.now().isoformat(timespec="seconds")
+            datetime.fromisoformat(when)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise CheckoutError("A customerID and an ISO date are required.")
+        if not customerID:
+            raise CheckoutError("A customerID is required.")
+        if self.repo.get("users", customerID) is None:
+            raise CheckoutError(f"Unknown customer: {customerID}")
+
+        tickets, merch = self._readCart(record.get("items"))
+        for line in tickets:
+            if line["parkName"] not in config.PARKS and line["parkName"] not in config.PARK_CAPACITY:
+                raise CheckoutError(f"Unknown park: {line['parkName']}")
+        return n, customerID, when, tickets, merch
+
+    def _importBatch(self, batch, summary):
+        orderIDs = self.ids.nextBatch("ORD", len(batch))
+        ticketIDs = iter(self.ids.nextBatch("T", sum(len(r[3]) for r in batch)))
+        merchIDs = iter(self.ids.nextBatch("M", sum(len(r[4]) for r in batch)))
+
+        with self._writing():
+            slotRows, catalogRows = {}, {}
+            changes = {"orders": [], "tickets": [], "merch": []}
+            sales = {}      # statistics key -> [qty, amount], recorded once per key
+
+            for orderID, (n, customerID, when, tickets, merch) in zip(orderIDs, batch):
+                seats, stock = {}, {}
+                for line in tickets:
+                    seats[line["slot"]] = seats.get(line["slot"], 0) + line["qty"]
+                for line in merch:
+                    stock[line["catalogID"]] = stock.get(line["catalogID"], 0) + line["qty"]
+
+                # takeMany replaces rows (sellMany changes them), so stock is the one to undo
+                previous = {catalogID: catalogRows.get(catalogID) for catalogID in stock}
+                if not self.catalog.takeMany(stock, catalogRows):
+                    summary["rejected"].append({"record": n, "error": "Not enough stock left."})
+                    continue
+                if not self.capacity.sellMany(seats, slotRows):
+                    for catalogID, row in previous.items():
+                        if row is None:
+                            del catalogRows[catalogID]
+                        else:
+                            catalogRows[catalogID] = row
+                    summary["rejected"].append({"record": n, "error": "Not enough tickets left."})
+                    continue
+
+                order = Order(orderID, customerID, when, "active")
+                for line in tickets:
+                    slotRow = slotRows[line["slot"]]
+                    order.addItem(Ticket(next(ticketIDs), line["ticketName"], line["qty"], line["price"],
+                                         line["visitDate"], line["parkName"], line["ticketName"],
+                                         slotRow["capacity"] - slotRow["sold"]))
+                for line in merch:
+                    catalogRow = catalogRows[line["catalogID"]]
+                    order.addItem(Merchandise(next(merchIDs), catalogRow["name"], line["qty"],
+                                              catalogRow["unitPrice"], catalogRow["category"],
+                                              catalogRow["stock"], catalogID=line["catalogID"]))
+
+                for item in order.items:
+                    key = (item.name, when[:13], getattr(item, "parkName", None),
+                           getattr(item, "ticketName", None), getattr(item, "category", None))
+                    total = sales.setdefault(key, [0, 0])
+                    total[0] += item.quantity
+                    total[1] += item.calculateSubtotal()
+                    changes["tickets" if isinstance(item, Ticket) else "merch"].append(item)
+                changes["orders"].append(order)
+
+            if not changes["orders"]:
+                return
+            self.statistic.recordOrder(len(changes["orders"]))
+            for (name, timestamp, parkName, ticketName, category), (qty, amount) in sales.items():
+                self.statistic.recordSale(name, qty, amount, timestamp, parkName=parkName,
+                                          ticketName=ticketName, category=category)
+
+            changes["capacity"] = list(slotRows.values())
+            changes["catalog"] = list(catalogRows.values())
+            self._commit({name: rows for name, rows in changes.items() if rows})
+
+        summary["orders"] += len(changes["orders"])
+        summary["items"] += len(changes["tickets"]) + len(changes["merch"])
+
+    # =========================================================
+    # IDEMPOTENCY (retried purchase requests)
+    # =========================================================
+    def _previousResult(self, customer, requestKey, stored=False):
+        """
+        The result of the purchase this customer already made with `requestKey`, or None.
+        Looks in self.completed; with stored=True (inside the transaction)
+        also at the customer's recent orders, which catches a retry that
+        reached another worker, or came after a restart, or raced the first
+        request in another thread.
+        """
+        if not requestKey:
+            return None
+        result = self.completed.get((customer.userID, requestKey))
+        if result is not None or not stored:
+            return result
+
+        order = self._orderForKey(customer.userID, requestKey)
+        if order is None:
+            return None
+        placed = datetime.fromisoformat(order.get("createdAt", order["date"]))
+        return self._rememberResult(customer, requestKey, self._resultOf(order),
+                                    (datetime.now() - placed).total_seconds())
+
+    def _orderForKey(self, customerID, requestKey):
+        # newest first, only as far back as keys are honoured
+        oldest = (datetime.now() - timedelta(seconds=config.IDEMPOTENCY_TTL)).isoformat(timespec="seconds")
+        for order in self.repo.page("orders", None, config.IDEMPOTENCY_SCAN, True, "customerID", customerID):
+            if order.get("createdAt", order["date"]) < oldest:
+                break
+            if order.get("requestKey") == requestKey:
+                return order
+        return None
+
+    def _resultOf(self, order):
+        # what the purchase returned: checkout orders are the ones with a payment
+        if not order.get("paymentID"):
+            return True
+        receipts = self.repo.find("receipts", "orderID", order["orderID"])
+        receipt = Receipt.fromDict(receipts[0]) if receipts else \
+            Receipt(None, order["orderID"], order["paymentID"])
+        return self._checkoutSummary(Order.fromDict(order, self.getOrderItems(order["orderID"])), receipt)
+
+    def _rememberResult(self, customer, requestKey, result, age=0.0):
+        if requestKey:
+            self.completed.put((customer.userID, requestKey), result, age)
+        return result
 
     # =========================================================
     # CANCEL TICKET
     # =========================================================
     def cancelTicket(self, orderID, itemID):
-        """Cancels an order."""
-        for order in self.orderList:
-            if order["orderID"] == orderID:
-                order["status"] = "cancelled"
-                self.saveData()
-                return True
-        return False
+        """Cancels an order and puts its tickets and merchandise back on sale."""
+        with self.locks.hold(orderID), self._writing():
+            stored = self.repo.get("orders", orderID)
+            if stored is None:
+                return False
+            if stored["status"] == "cancelled":
+                return True   # seats were already released
+
+            items = ([Ticket.fromDict(t) for t in self.repo.find("tickets", "orderID", orderID)] +
+                     [Merchandise.fromDict(m) for m in self.repo.find("merch", "orderID", orderID)])
+            order = Order.fromDict(stored, items)
+
+            # statistics are taken back out of the buckets of the original sale
+            self.statistic.recordItems(order, sign=-1)
+            self.statistic.recordCancellation()
+
+            # seats and stock are added up per slot / item, so each row changes once
+            seats, stock = {}, {}
+            for item in order.items:
+                if isinstance(item, Ticket):
+                    slot = (item.parkName, item.visitDate, item.ticketName)
+                    seats[slot] = seats.get(slot, 0) + item.quantity
+                elif item.catalogID:
+                    stock[item.catalogID] = stock.get(item.catalogID, 0) + item.quantity
+
+            payments = [Payment.fromDict(p) for p in self.repo.find("payments", "orderID", orderID)]
+            for payment in payments:
+                payment.status = "refunded"
+            order.cancelOrder()
+
+            self._commit({
+                "orders": [order],
+                "capacity": [self.capacity.releaseSold(*slot, qty) for slot, qty in seats.items()],
+                "catalog": [row for row in (self.catalog.restock(catalogID, qty)
+                                            for catalogID, qty in stock.items()) if row],
+                "payments": payments,
+            })
+            return True
 
     # =========================================================
     # REVIEW
     # =========================================================
     def submitReview(self, reviewData):
-        """Stores a review."""
-        review = {
-            "reviewID": f"R{len(self.reviewList)+1}",
-            "customerID": reviewData["customerID"],
-            "rating": reviewData["rating"],
-            "comment": reviewData["comment"]
-        }
+        """Stores a review (optionally about one park); it waits in the moderation queue."""
+        review = Review(self.ids.next("R"), reviewData["customerID"],
+                        reviewData["rating"], reviewData["comment"], str(date.today()),
+                        reviewData.get("parkName"))
+        review.submit()
 
-        self.reviewList.append(review)
-        self.saveData()
+        with self._writing():
+            self._commit({"reviews": [review]})
+        # indexed after the write lock is released (see ReviewIndex._ready)
+        self.reviews.add(review.toDict())
         return True
+
+    def moderateReview(self, admin, reviewID, approve=True):
+        """Approves or hides a review. Returns the stored row, or None if there is no such review."""
+        with self._writing():
+            stored = self.repo.get("reviews", reviewID)
+            if stored is None:
+                return None
+            review = Review.fromDict(stored)
+            admin.moderateReview(review, approve)
+            row = review.toDict()
+            self._commit({"reviews": [row]})
+        self.reviews.add(row)
+        return row
+
+    def searchReviews(self, query, parkName=None, minRating=None, limit=None):
+        """Approved reviews containing every word of `query`, newest first (see ReviewIndex)."""
+        limit = max(1, min(limit or config.REVIEW_PAGE_SIZE, config.REVIEW_PAGE_MAX))
+        return self.reviews.search(query, parkName, minRating, limit)
+
+    def getRatingSummary(self, parkName=None):
+        """Review count, average and star distribution, overall (with every park) or for one park."""
+        if parkName is not None:
+            return self.reviews.ratings(parkName)
+        return dict(self.reviews.ratings(), byPark=self.reviews.ratingsByPark())
+
+    def getModerationQueue(self, after=None, limit=None):
+        """One page of reviews waiting for moderation, oldest first."""
+        limit = max(1, min(limit or config.REVIEW_PAGE_SIZE, config.REVIEW_PAGE_MAX))
+        return self.reviews.queue(after, limit)
@@ -1,15 +1,19 @@
 from models.User import User
+from models.Review import Review
 
 class Admin(User):
 
     # Admin responsible for moderating reviews and viewing all orders.
+
+    __slots__ = ()
  
     def __init__(self, userID, username, password, email, fullName):
         super().__init__(userID, username, password, email, fullName, isAdmin=True)
 
-    def moderateReview(self, review):
-        # Admin can apply moderation tags or content filtering.
-        review.comment = "[MODERATED] " + review.comment
+    def moderateReview(self, review, approve=True):
+        # Admin approves a review (it stays visible) or hides it from
+        # customers, search and the rating averages.
+        review.status = Review.APPROVED if approve else Review.HIDDEN
 
     def viewAllOrders(self, orderList):
         return orderList
\ No newline at end of file
@@ -1,96 +1,241 @@
-import json
-from models.Customer import Customer
-from models.Admin import Admin
+import threading
+import time
+import config
+from storage.RepositoryFactory import createRepository
+from storage.IDAllocator import IDAllocator
+from models.User import User
+from models.PasswordHasher import getDefaultHasher
+from storage.Metrics import metrics
+
+AUTH_SECONDS = metrics.histogram("snp_auth_seconds", "Time spent in AuthManager operations",
+                                 ["operation"])
 
 class AuthManager:
     """
     Handles:
     - user authentication
-    - user registration
-    - loading and saving users from JSON file
+    - user registration (passwords are stored as salted hashes)
+    - loading and saving users from storage (JSON file or SQLite)
+    User objects are only built for users who are looked up; the storage
+    indexes answer everything else.
     """
 
-    def __init__(self, userFilePath="data/users.json"):
+    def __init__(self, userFilePath="data/users.json", repo=None, ids=None, hasher=None):
         self.userFilePath = userFilePath
-        self.users = []   # List of User objects
-        self.loadUsers()
+        self.hasher = hasher or getDefaultHasher()
+        self.dummyHash = None   # compared against for unknown usernames
+        self.usersByName = {}   # username -> User (users looked up so far)
+        self.usersByID = {}     # userID -> User
+        self.lastRefresh = float("-inf")    # time.monotonic() of the last refresh after a miss
+        self.refreshLock = threading.Lock()
+
+        # storage backend, may be shared with SystemController
+        if repo is None:
+            journalFile = config.JOURNAL_FILE.replace(".log", ".users.log")
+            repo = createRepository({"users": userFilePath}, journalFile=journalFile)
+        self.repo = repo
+
+        if not self.repo.loaded:
+            self.loadUsers()
+
+        self.ids = ids or IDAllocator(config.COUNTER_FILE, config.ID_BLOCK_SIZE)
+        self.ids.register("U", lambda: self.repo.maxKeyNumber("users", "U"))
 
     # ---------------------------------------------
-    # Load users from JSON storage
+    # Load users from storage
     # ---------------------------------------------
     def loadUsers(self):
-        """Loads user data and recreates Admin / Customer objects."""
-        
-        # avoid duplicate loading
-        self.users = []   
-
-        try:
-            with open(self.userFilePath, "r") as file:
-                data = json.load(file)
-
-            for u in data:
-                if u.get("isAdmin") is True:
-                    obj = Admin(
-                        u["userID"], u["username"], u["password"],
-                        u["email"], u["fullName"]
-                    )
-                else:
-                    obj = Customer(
-                        u["userID"], u["username"], u["password"],
-                        u["email"], u["fullName"],
-                        u.get("customerType", "Adult")
-                    )
-
-                self.users.append(obj)
-
-        except FileNotFoundError:
-            self.users = []
+        """Loads user data; Admin / Customer objects are recreated when looked up."""
+        self.repo.load()
+        self.usersByName = {}
+        self.usersByID = {}
 
-    # ---------------------------------------------
-    # Save users back into JSON
-    # ---------------------------------------------
-    def saveUsers(self):
-        """Saves all user information into JSON."""
-        data = []
+    @property
+    def users(self):
+        """Every user as an object (builds them all, prefer the lookups)."""
+        return [self.usersByID.get(u["userID"]) or self._addUser(self._fromRow(u))
+                for u in self.repo.all("users")]
+
+    def _addUser(self, user):
+        self.usersByName[user.username] = user
+        self.usersByID[user.userID] = user
+        return user
 
-        for u in self.users:
-            obj = {
-                "userID": u.userID,
-                "username": u.username,
-                "password": u.password,
-                "email": u.email,
-                "fullName": u.fullName,
-                "isAdmin": u.isAdmin
-            }
+    def forgetUser(self, userID):
+        """Drops a user object from memory, so the next lookup reads the stored row again."""
+        user = self.usersByID.pop(userID, None)
+        if user is not None:
+            self.usersByName.pop(user.username, None)
 
-            # Customers only
-            if not u.isAdmin:
-                obj["customerType"] = u.customerType
+    def reloadUser(self, userID):
+        """Reads a user from storage again (other workers' changes included). None if it is gone."""
+        self.repo.refresh()
+        self.forgetUser(userID)
+        return self.getUserByID(userID)
 
-            data.append(obj)
+    def _fromRow(self, u):
+        return User.fromDict(u)
 
-        with open(self.userFilePath, "w") as file:
-            json.dump(data, file, indent=4)
+    def _toRow(self, u):
+        return u.toDict()
+
+    # ---------------------------------------------
+    # Save users back into storage
+    # ---------------------------------------------
+    def saveUsers(self):
+        """Saves the users held in memory (the others cannot have changed)."""
+        self.repo.put({"users": [self._toRow(u) for u in self.usersByID.values()]})
 
     # ---------------------------------------------
     # Authentication (Login)
     # ---------------------------------------------
     def authenticate(self, username, password):
         """Returns the user object if credentials are correct."""
-        for user in self.users:
-            if user.username == username and user.password == password:
-                return user
-        return None
+        with AUTH_SECONDS.time(operation="authenticate"):
+            user = self.getUserByUsername(username)
+            if user is None:
+                # same amount of work as a wrong password, so timing does not reveal usernames
+                self.hasher.verify(password, self._dummyHash())
+                return None
+
+            if not user.signIn(password, self.hasher):
+                return None
+
+            if self.hasher.needsRehash(user.password):
+                self._rehash(user, password)
+            return user
+
+    def _rehash(self, user, password):
+        # old plaintext record, or hashed with an outdated scheme / cost
+        stored = user.password
+        newHash = self.hasher.hash(password)
+        with self.repo.transaction():
+            row = self.repo.get("users", user.userID)
+            if row is not None and row["password"] != stored:
+                # changed meanwhile (e.g. rehashed by another worker), keep theirs
+                user.password = row["password"]
+                return
+            user.password = newHash
+            self.repo.put({"users": [self._toRow(user)]})
+
+    def _dummyHash(self):
+        if self.dummyHash is None:
+            self.dummyHash = self.hasher.hash("")
+        return self.dummyHash
+
+    def importUsers(self, records, batchSize=None):
+        """
+        Registers many users, streaming (see tools/bulk.py).
+        records: iterable of {"username", "password" (plaintext or already
+        hashed), "email", "fullName", "customerType", "isAdmin"}.
+        Each batch gets its IDs in one go, its passwords hashed on the whole
+        pool and is written with one put. Records without a username or
+        password, or with a username already taken, are skipped.
+        Returns {"users", "rejected": [{"record", "error"}]}.
+        """
+        batchSize = batchSize or config.BULK_BATCH_SIZE
+        summary = {"users": 0, "rejected": []}
+
+        batch = []
+        for n, record in enumerate(records, 1):
+            if not record.get("username") or not record.get("password"):
+                summary["rejected"].append({"record": n, "error": "A username and a password are required."})
+                continue
+            batch.append((n, record))
+            if len(batch) >= batchSize:
+                self._importBatch(batch, summary)
+                batch = []
+        if batch:
+            self._importBatch(batch, summary)
+        return summary
+
+    def _importBatch(self, batch, summary):
+        passwords = [record["password"] for _, record in batch]
+        plain = [i for i, password in enumerate(passwords) if not self.hasher.isHashed(password)]
+        for i, hashed in zip(plain, self.hasher.hashMany([passwords[i] for i in plain])):
+            passwords[i] = hashed
+
+        userIDs = self.ids.nextBatch("U", len(batch))
+        rows, taken = [], set()
+        with self.repo.transaction():
+            for userID, password, (n, record) in zip(userIDs, passwords, batch):
+                username = record["username"]
+                if username in taken or self.repo.find("users", "username", username):
+                    summary["rejected"].append({"record": n, "error": f"Username {username} is taken."})
+                    continue
+                taken.add(username)
+                rows.append(User.fromDict({
+                    "userID": userID,
+                    "username": username,
+                    "password": password,
+                    "email": record.get("email", ""),
+                    "fullName": record.get("fullName", ""),
+                    "isAdmin": record.get("isAdmin") in (True, "true", "True", "1", 1),
+                    "customerType": record.get("customerType") or "Adult"
+                }).toDict())
+            if rows:
+                self.repo.put({"users": rows})
+        summary["users"] += len(rows)
+
+    # ---------------------------------------------
+    # Lookups
+    # ---------------------------------------------
+    def getUserByID(self, userID):
+        user = self.usersByID.get(userID)
+        if user is None:
+            user = self._lookup(lambda: self.repo.find("users", "userID", userID))
+        return user
+
+    def getUserByUsername(self, username):
+        user = self.usersByName.get(username)
+        if user is None:
+            user = self._lookup(lambda: self.repo.find("users", "username", username))
+        return user
+
+    def _lookup(self, query):
+        with AUTH_SECONDS.time(operation="lookup"):
+            rows = query()
+            if not rows and self._mayRefresh():
+                # may have been registered by another worker process
+                self.repo.refresh()
+                rows = query()
+            if not rows:
+                return None
+
+            user = self._fromRow(rows[0])
+            self._addUser(user)
+            return user
+
+    def _mayRefresh(self):
+        # at most one refresh per USER_REFRESH_SECONDS: unknown usernames
+        # (typos, guessing) must not take the write lock on every attempt
+        with self.refreshLock:
+            now = time.monotonic()
+            if now - self.lastRefresh < config.USER_REFRESH_SECONDS:
+                return False
+            self.lastRefresh = now
+            return True
 
     # ---------------------------------------------
     # Registration
     # ---------------------------------------------
+    def nextUserID(self):
+        """Allocates a new, never reused user ID."""
+        return self.ids.next("U")
+
     def registerUser(self, customer):
-        """Registers customer if username is unique."""
-        for u in self.users:
-            if u.username == customer.username:
-                return False  # Duplicate username
-
-        self.users.append(customer)
-        self.saveUsers()
-        return True
+        """Registers customer if username is unique. A plaintext password is hashed first."""
+        with AUTH_SECONDS.time(operation="register"):
+            if not self.hasher.isHashed(customer.password):
+                # hashed before taking the write lock, it is the slow part
+                customer.password = self.hasher.hash(customer.password)
+
+            # checked inside the transaction, so two workers cannot both take the name
+            with self.repo.transaction():
+                if customer.username in self.usersByName or \
+                        self.repo.find("users", "username", customer.username):
+                    return False  # Duplicate username
+
+                self._addUser(customer)
+                self.repo.put({"users": [self._toRow(customer)]})
+            return True
@@ -4,6 +4,8 @@ class Customer(User):
 
     # Customer of the theme park system. Can purchase tickets, merchandise, submit reviews, etc.
 
+    __slots__ = ("customerType",)
+
     def __init__(self, userID, username, password, email, fullName, customerType):
         super().__init__(userID, username, password, email, fullName, isAdmin=False)
         self.customerType = customerType    # e.g. Adult, Child, Senior
@@ -11,3 +13,8 @@ class Customer(User):
     def viewOrders(self, orderList):
        # Returns all orders that belong to this customer.
         return [o for o in orderList if o.customerID == self.userID]
+
+    def toDict(self):
+        row = super().toDict()
+        row["customerType"] = self.customerType
+        return row
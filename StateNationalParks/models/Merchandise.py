@@ -1,14 +1,29 @@
 from models.OrderItem import OrderItem
+from models.RowFields import keepExtra
 
 class Merchandise(OrderItem):
    
     # Merchandise item (souvenir, shirt, drinks, etc).
 
-    def __init__(self, itemID, name, quantity, unitPrice, category, stock):
-        super().__init__(itemID, name, quantity, unitPrice)
+    __slots__ = ("category", "stock", "catalogID")
+
+    def __init__(self, itemID, name, quantity, unitPrice, category, stock, orderID=None, catalogID=None):
+        super().__init__(itemID, name, quantity, unitPrice, orderID)
         self.category = category
         self.stock = stock
+        self.catalogID = catalogID  # catalog entry it was sold from
 
     def updateStock(self, amount):
        # Increase or decrease available stock.
         self.stock += amount
+
+    def toDict(self):
+        row = super().toDict()
+        row.update(catalogID=self.catalogID, category=self.category, stock=self.stock)
+        return row
+
+    @classmethod
+    def fromDict(cls, row):
+        return keepExtra(cls(row["itemID"], row["name"], row["quantity"], row["unitPrice"],
+                             row.get("category"), row.get("stock", 0), row.get("orderID"),
+                             row.get("catalogID")), row)
@@ -1,16 +1,26 @@
+from models.RowFields import addExtra, keepExtra
+
 class Order:
     
     # Order contains a list of purchased items (tickets / merchandise).
+
+    __slots__ = ("orderID", "customerID", "orderDate", "status", "total", "paymentID", "requestKey", "items", "extra")
   
-    def __init__(self, orderID, customerID, orderDate, status="pending"):
+    def __init__(self, orderID, customerID, orderDate, status="pending", total=None, paymentID=None,
+                 requestKey=None):
         self.orderID = orderID
         self.customerID = customerID
-        self.orderDate = orderDate
+        self.orderDate = orderDate  # ISO date, or date and time ("2026-10-18T14:05:00")
         self.status = status
+        self.total = total          # set once paid
+        self.paymentID = paymentID
+        self.requestKey = requestKey  # idempotency key of the request that placed it, if it sent one
         self.items = []       # List of OrderItem objects
+        self.extra = None     # stored fields this class does not know (see RowFields)
 
     def addItem(self, item):
         # Add a purchased item to the order.
+        item.orderID = self.orderID
         self.items.append(item)
 
     def removeItem(self, itemID):
@@ -28,3 +38,28 @@ class Order:
     def requestRefund(self, itemID):
         # Refund logic handled in SystemController.
         return True
+
+    def toDict(self):
+        # Stored format (row of the orders collection, items are stored separately).
+        row = {
+            "orderID": self.orderID,
+            "customerID": self.customerID,
+            "date": self.orderDate[:10]
+        }
+        if len(self.orderDate) > 10:
+            row["createdAt"] = self.orderDate
+        row["status"] = self.status
+        if self.total is not None:
+            row["total"] = self.total
+        if self.paymentID is not None:
+            row["paymentID"] = self.paymentID
+        if self.requestKey is not None:
+            row["requestKey"] = self.requestKey
+        return addExtra(self, row)
+
+    @classmethod
+    def fromDict(cls, row, items=()):
+        order = cls(row["orderID"], row["customerID"], row.get("createdAt", row["date"]),
+                    row["status"], row.get("total"), row.get("paymentID"), row.get("requestKey"))
+        order.items = list(items)
+        return keepExtra(order, row)
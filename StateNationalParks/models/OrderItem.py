@@ -1,15 +1,32 @@
 from abc import ABC
+from models.RowFields import addExtra
 
 class OrderItem(ABC):
 
     #Abstract parent class for Ticket and Merchandise. Represents a single purchased item.
+    # __slots__: no per-object __dict__, orders can hold millions of items.
 
-    def __init__(self, itemID, name, quantity, unitPrice):
+    __slots__ = ("itemID", "orderID", "name", "quantity", "unitPrice", "extra")
+
+    def __init__(self, itemID, name, quantity, unitPrice, orderID=None):
         self.itemID = itemID
+        self.orderID = orderID      # order this item was bought in
         self.name = name
         self.quantity = quantity
         self.unitPrice = unitPrice
+        self.extra = None           # stored fields this class does not know (see RowFields)
 
     def calculateSubtotal(self):
         # Returns total price for this item.
         return self.quantity * self.unitPrice
+
+    def toDict(self):
+        # Stored format (a row of the tickets / merch collection).
+        row = {
+            "itemID": self.itemID,
+            "orderID": self.orderID,
+            "name": self.name,
+            "quantity": self.quantity,
+            "unitPrice": self.unitPrice
+        }
+        return addExtra(self, row)
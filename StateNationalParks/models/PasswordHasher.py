@@ -0,0 +1,120 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from storage.Metrics import metrics
+
+# work time on the pool; the wait for a free thread shows in snp_auth_seconds
+PASSWORD_SECONDS = metrics.histogram("snp_password_seconds", "Time spent hashing / verifying one password",
+                                     ["operation"])
+
+class PasswordHasher:
+    """
+    Salted password hashing for stored user records.
+    - stored format: "pbkdf2_sha256$<iterations>$<salt>$<hash>"
+      or "scrypt$<n>$<r>$<p>$<salt>$<hash>" (salt and hash base64)
+    - anything else is a legacy plaintext password: it is still accepted,
+      and needsRehash() tells the caller to replace it
+    - hashing runs on a small bounded thread pool (hashlib releases the GIL),
+      so at most `workers` hashes use the CPU at once and request threads
+      only wait for their own result
+    """
+
+    SCHEMES = ("pbkdf2_sha256", "scrypt")
+
+    def __init__(self, scheme="pbkdf2_sha256", iterations=120000,
+                 scryptN=2 ** 14, scryptR=8, scryptP=1, workers=None):
+        if scheme not in self.SCHEMES:
+            raise ValueError(f"Unknown password scheme: {scheme}")
+        self.scheme = scheme
+        self.iterations = iterations
+        self.scryptN = scryptN
+        self.scryptR = scryptR
+        self.scryptP = scryptP
+        self.workers = workers or os.cpu_count() or 2
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+
+    # ---------------------------------------------
+    # Hashing
+    # ---------------------------------------------
+    def hash(self, password):
+        """Returns the encoded hash of `password` with a new random salt (runs on the pool)."""
+        return self.pool.submit(self._hash, password).result()
+
+    def hashMany(self, passwords):
+        """Hashes a list of passwords, spread over the whole pool (bulk import)."""
+        return list(self.pool.map(self._hash, passwords))
+
+    def verify(self, password, stored):
+        """True if `password` matches the stored hash (or legacy plaintext)."""
+        return self.pool.submit(self._verify, password, stored).result()
+
+    def isHashed(self, stored):
+        return isinstance(stored, str) and stored.split("$", 1)[0] in self.SCHEMES
+
+    def needsRehash(self, stored):
+        """True for plaintext records and hashes made with another scheme or cost."""
+        if not self.isHashed(stored):
+            return True
+        return stored.split("$")[:-2] != self._params()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    # ---------------------------------------------
+    # Work done on the pool
+    # ---------------------------------------------
+    def _params(self):
+        if self.scheme == "pbkdf2_sha256":
+            return ["pbkdf2_sha256", str(self.iterations)]
+        return ["scrypt", str(self.scryptN), str(self.scryptR), str(self.scryptP)]
+
+    def _hash(self, password):
+        salt = os.urandom(16)
+        params = self._params()
+        with PASSWORD_SECONDS.time(operation="hash"):
+            digest = self._derive(params, password, salt)
+        return "$".join(params + [_b64(salt), _b64(digest)])
+
+    def _verify(self, password, stored):
+        if not self.isHashed(stored):
+            # legacy plaintext record
+            return hmac.compare_digest(str(stored).encode("utf-8"), password.encode("utf-8"))
+
+        # a malformed record (missing fields, bad base64 or numbers) never matches
+        try:
+            *params, salt, digest = stored.split("$")
+            expected = base64.b64decode(digest)
+            with PASSWORD_SECONDS.time(operation="verify"):
+                actual = self._derive(params, password, base64.b64decode(salt))
+        except (ValueError, IndexError):
+            return False
+        return hmac.compare_digest(actual, expected)
+
+    def _derive(self, params, password, salt):
+        password = password.encode("utf-8")
+        if params[0] == "pbkdf2_sha256":
+            return hashlib.pbkdf2_hmac("sha256", password, salt, int(params[1]))
+
+        n, r, p = (int(v) for v in params[1:4])
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * r * (n + p + 2), dklen=32)
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+_default = None
+_defaultLock = threading.Lock()
+
+def getDefaultHasher():
+    """The process-wide hasher configured in config.py (created on first use)."""
+    global _default
+    with _defaultLock:
+        if _default is None:
+            import config
+            _default = PasswordHasher(config.PASSWORD_SCHEME, config.PASSWORD_ITERATIONS,
+                                      scryptN=config.PASSWORD_SCRYPT_N,
+                                      workers=config.PASSWORD_WORKERS)
+        return _default
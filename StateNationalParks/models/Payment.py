@@ -1,13 +1,31 @@
+from models.RowFields import addExtra, keepExtra
+
 class Payment:
     
     # Represents a payment made for a specific order. A simple success/fail simulation.
+
+    __slots__ = ("paymentID", "orderID", "amount", "status", "extra")
     
     def __init__(self, paymentID, orderID, amount, status="success"):
         self.paymentID = paymentID      # Unique ID for payment
         self.orderID = orderID          # Links to Order
         self.amount = amount            # Total amount paid
-        self.status = status            # success / failed
+        self.status = status            # success / failed / refunded
+        self.extra = None               # stored fields this class does not know (see RowFields)
 
     def processPayment(self):
         # Simulates payment processing. For assignment: always returns True as we cannot connect to real banking.
         return True
+
+    def toDict(self):
+        return addExtra(self, {
+            "paymentID": self.paymentID,
+            "orderID": self.orderID,
+            "amount": self.amount,
+            "status": self.status
+        })
+
+    @classmethod
+    def fromDict(cls, row):
+        return keepExtra(cls(row["paymentID"], row["orderID"], row["amount"], row.get("status", "success")),
+                         row)
@@ -1,15 +1,33 @@
 from datetime import date
+from models.RowFields import addExtra, keepExtra
 
 class Receipt:
    
     # Receipt generated after a successful payment.
+
+    __slots__ = ("receiptID", "orderID", "paymentID", "dateIssued", "extra")
     
-    def __init__(self, receiptID, orderID, paymentID):
+    def __init__(self, receiptID, orderID, paymentID, dateIssued=None):
         self.receiptID = receiptID         
         self.orderID = orderID              
         self.paymentID = paymentID         
-        self.dateIssued = date.today()      
+        self.dateIssued = dateIssued or date.today()
+        self.extra = None   # stored fields this class does not know (see RowFields)
 
     def generate(self):
         # Returns a readable receipt summary.
         return f"Receipt {self.receiptID} for Order {self.orderID}, Payment {self.paymentID}"
+
+    def toDict(self):
+        return addExtra(self, {
+            "receiptID": self.receiptID,
+            "orderID": self.orderID,
+            "paymentID": self.paymentID,
+            "dateIssued": str(self.dateIssued)
+        })
+
+    @classmethod
+    def fromDict(cls, row):
+        issued = row.get("dateIssued")
+        return keepExtra(cls(row["receiptID"], row["orderID"], row["paymentID"],
+                             date.fromisoformat(issued) if issued else None), row)
@@ -1,17 +1,54 @@
+from models.RowFields import addExtra, keepExtra
+
 class Review:
   
     # Review provided by a customer about their experience.
+    # New reviews are "pending" until an admin approves or hides them;
+    # pending and approved reviews are shown, hidden ones are not.
+
+    PENDING, APPROVED, HIDDEN = "pending", "approved", "hidden"
+
+    __slots__ = ("reviewID", "customerID", "rating", "comment", "dateSubmitted", "parkName", "status", "extra")
   
-    def __init__(self, reviewID, customerID, rating, comment):
+    def __init__(self, reviewID, customerID, rating, comment, dateSubmitted=None, parkName=None,
+                 status=PENDING):
         self.reviewID = reviewID          
         self.customerID = customerID      
         self.rating = rating            
         self.comment = comment            
+        self.dateSubmitted = dateSubmitted  # ISO date (older reviews have none)
+        self.parkName = parkName            # park reviewed (older reviews have none)
+        self.status = status
+        self.extra = None                   # stored fields this class does not know (see RowFields)
 
     def submit(self):
-        # Marks the review as submitted.
+        # Marks the review as submitted (it waits for moderation).
+        self.status = Review.PENDING
         return True
 
     def edit(self, newComment):
         # Allows customer to update their published review.
         self.comment = newComment
+
+    def toDict(self):
+        row = {
+            "reviewID": self.reviewID,
+            "customerID": self.customerID,
+            "rating": self.rating,
+            "comment": self.comment,
+            "status": self.status
+        }
+        if self.dateSubmitted is not None:
+            row["date"] = self.dateSubmitted
+        if self.parkName is not None:
+            row["parkName"] = self.parkName
+        return addExtra(self, row)
+
+    @classmethod
+    def fromDict(cls, row):
+        return keepExtra(cls(row["reviewID"], row["customerID"], row["rating"], row["comment"],
+                             row.get("date"), row.get("parkName"), reviewStatus(row)), row)
+
+def reviewStatus(row):
+    # reviews stored before moderation existed were already published
+    return row.get("status") or Review.APPROVED
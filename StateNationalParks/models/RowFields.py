@@ -0,0 +1,17 @@
+# Fields of a stored row that a model object has no attribute for (added by
+# newer code or by tools) ride along in the object's `extra` slot, so a
+# row -> object -> row round trip never loses them.
+
+def keepExtra(entity, row):
+    """Called by fromDict: remembers the fields of `row` that toDict() does not write."""
+    known = entity.toDict()
+    extra = {key: value for key, value in row.items() if key not in known}
+    entity.extra = extra or None
+    return entity
+
+def addExtra(entity, row):
+    """Called by toDict: puts the remembered fields back (the object's own values win)."""
+    if entity.extra:
+        for key, value in entity.extra.items():
+            row.setdefault(key, value)
+    return row
@@ -1,20 +1,185 @@
+import heapq
+
 class Statistic:
-   
-    # Tracks overall system performance:
-    # - total revenue
-    # - total number of orders
-    # - top-selling item (optional)
-  
-    def __init__(self):
-        self.totalRevenue = 0
-        self.totalOrders = 0
-        self.topSellingItem = None
 
+    # Tracks overall system performance, updated as each sale / cancellation happens:
+    # - total revenue (cancellations subtracted), orders placed and cancelled
+    # - revenue and items sold per day, per hour, per park, per ticket type
+    #   and per merchandise category
+    # - best sellers (top-K by quantity)
+    # Every report is read straight from these counters, it never rescans orders.
+
+    BUCKETS = ["byDay", "byHour", "byPark", "byTicketType", "byCategory", "itemsSold"]
+
+    def __init__(self, data=None, topK=5):
+        # `data` is the stored statistics dict; it is updated in place so
+        # the repository always holds the current values
+        self.data = data if data is not None else {}
+        self._setDefaults()
+
+        self.topK = topK
+        self.topSellers = None   # [(qty, name)], rebuilt lazily
+        self.changes = {}        # patch of values changed since takeChanges()
+
+    # ---------------------------------------------
+    # Totals (kept as attributes for older code)
+    # ---------------------------------------------
+    @property
+    def totalRevenue(self):
+        return self.data["totalRevenue"]
+
+    @totalRevenue.setter
+    def totalRevenue(self, value):
+        self._setTotal("totalRevenue", value)
+
+    @property
+    def totalOrders(self):
+        return self.data["totalOrders"]
+
+    @totalOrders.setter
+    def totalOrders(self, value):
+        self._setTotal("totalOrders", value)
+
+    @property
+    def topSellingItem(self):
+        top = self.getTopSellers(1)
+        return top[0][0] if top else None
+
+    def _setTotal(self, name, value):
+        self.data[name] = value
+        self.changes[name] = value
+
+    # ---------------------------------------------
+    # Recording
+    # ---------------------------------------------
     def updateStatistics(self, order):
         # Updates system-wide statistics every time an order is completed.
-        self.totalOrders += 1
-        self.totalRevenue += order.calculateTotal()
+        self.recordOrder()
+        self.recordItems(order)
+
+    def recordItems(self, order, sign=1):
+        # Records every item of an order (sign=-1 takes a cancelled order back out).
+        for item in order.items:
+            self.recordSale(item.name, item.quantity, item.calculateSubtotal(),
+                            order.orderDate,
+                            parkName=getattr(item, "parkName", None),
+                            ticketName=getattr(item, "ticketName", None),
+                            category=getattr(item, "category", None), sign=sign)
+
+    def recordOrder(self, count=1):
+        self.totalOrders += count
+
+    def recordCancellation(self):
+        self._setTotal("cancelledOrders", self.data["cancelledOrders"] + 1)
+
+    def recordSale(self, itemName, qty, amount, timestamp,
+                   parkName=None, ticketName=None, category=None, sign=1):
+        """
+        Adds one sold line to every bucket it belongs to.
+        `timestamp` is an ISO date or datetime ("2026-10-18" or "2026-10-18T14:05:00").
+        Call with sign=-1 and the original sale's values to take a cancelled line back out.
+        """
+        amount = amount * sign
+        qty = qty * sign
+
+        self.totalRevenue += amount
+
+        day = timestamp[:10]
+        hour = timestamp[:13] if len(timestamp) >= 13 else day + "T00"
+        self._add("byDay", day, amount, qty)
+        self._add("byHour", hour, amount, qty)
+        if parkName:
+            self._add("byPark", parkName, amount, qty)
+        if ticketName:
+            self._add("byTicketType", ticketName, amount, qty)
+        if category:
+            self._add("byCategory", category, amount, qty)
+
+        sold = self.data["itemsSold"]
+        sold[itemName] = sold.get(itemName, 0) + qty
+        self._changed("itemsSold", itemName, sold[itemName])
+        self._updateTop(itemName, sold[itemName], qty)
+
+    def _add(self, bucketName, key, amount, qty):
+        bucket = self.data[bucketName]
+        entry = bucket.get(key)
+        if entry is None:
+            entry = bucket[key] = {"revenue": 0, "items": 0}
+        entry["revenue"] += amount
+        entry["items"] += qty
+        self._changed(bucketName, key, entry)
+
+    def _changed(self, bucketName, key, value):
+        self.changes.setdefault(bucketName, {})[key] = value
+
+    def takeChanges(self):
+        """Returns the values changed since the last call (absolute values, safe to replay)."""
+        changes, self.changes = self.changes, {}
+        return changes
+
+    # ---------------------------------------------
+    # Best sellers
+    # ---------------------------------------------
+    def _updateTop(self, itemName, qty, delta):
+        if self.topSellers is None:
+            return
+
+        entries = [e for e in self.topSellers if e[1] != itemName]
+        inTop = len(entries) != len(self.topSellers)
+
+        if delta < 0 and inTop:
+            # an item outside the list may now be ahead, rebuild on next read
+            self.topSellers = None
+            return
+
+        if inTop or len(entries) < self.topK or qty > entries[-1][0]:
+            entries.append((qty, itemName))
+            entries.sort(reverse=True)
+            self.topSellers = entries[:self.topK]
+
+    def getTopSellers(self, k=None):
+        """[(item name, quantity)] of the best sellers, largest first."""
+        if self.topSellers is None:
+            self.topSellers = heapq.nlargest(
+                self.topK, ((qty, name) for name, qty in self.data["itemsSold"].items() if qty > 0)
+            )
+        return [(name, qty) for qty, name in self.topSellers[:k or self.topK]]
+
+    def reload(self):
+        """Call after the underlying data was replaced or merged from another process."""
+        self._setDefaults()
+        self.topSellers = None
+
+    def _setDefaults(self):
+        for name in self.BUCKETS:
+            self.data.setdefault(name, {})
+        self.data.setdefault("totalRevenue", 0)
+        self.data.setdefault("totalOrders", 0)
+        self.data.setdefault("cancelledOrders", 0)
+
+    # ---------------------------------------------
+    # Reports
+    # ---------------------------------------------
+    def getBucket(self, bucketName, key):
+        return self.data[bucketName].get(key, {"revenue": 0, "items": 0})
 
     def generateReport(self):
         # Returns a formatted text summary for display in admin dashboard.
-        return f"Total Orders: {self.totalOrders}, Total Revenue: RM{self.totalRevenue}"
+        report = f"Total Orders: {self.totalOrders}, Total Revenue: RM{self.totalRevenue}"
+        if self.topSellingItem:
+            report += f", Top Seller: {self.topSellingItem}"
+        return report
+
+    def generateDashboard(self, day, hour=None):
+        """Numbers for the admin dashboard; cost depends on the number of parks/types, not orders."""
+        return {
+            "totalOrders": self.totalOrders,
+            "totalRevenue": self.totalRevenue,
+            "cancelledOrders": self.data["cancelledOrders"],
+            "today": self.getBucket("byDay", day),
+            "thisHour": self.getBucket("byHour", hour) if hour else None,
+            "byPark": self.data["byPark"],
+            "byTicketType": self.data["byTicketType"],
+            "byCategory": self.data["byCategory"],
+            "topSellers": self.getTopSellers(),
+        }
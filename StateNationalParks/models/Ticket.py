@@ -1,12 +1,16 @@
 from models.OrderItem import OrderItem
+from models.RowFields import keepExtra
 from datetime import date
 
 class Ticket(OrderItem):
 
     # Ticket purchased for park entry.
 
-    def __init__(self, itemID, name, quantity, unitPrice, visitDate, parkName, ticketName, quotaAvailable):
-        super().__init__(itemID, name, quantity, unitPrice)
+    __slots__ = ("visitDate", "parkName", "ticketName", "quotaAvailable")
+
+    def __init__(self, itemID, name, quantity, unitPrice, visitDate, parkName, ticketName, quotaAvailable,
+                 orderID=None):
+        super().__init__(itemID, name, quantity, unitPrice, orderID)
         self.visitDate = visitDate
         self.parkName = parkName
         self.ticketName = ticketName   # safer than ticketType
@@ -14,8 +18,23 @@ class Ticket(OrderItem):
 
     def isRefundable(self):
         # Refund allowed only if visit date is in the future.
-        return date.today() < self.visitDate
+        visitDate = self.visitDate
+        if isinstance(visitDate, str):
+            visitDate = date.fromisoformat(visitDate)
+        return date.today() < visitDate
 
     def reschedule(self, newDate):
         self.visitDate = newDate
         return True
+
+    def toDict(self):
+        row = super().toDict()
+        row.update(visitDate=self.visitDate, parkName=self.parkName,
+                   ticketName=self.ticketName, quotaAvailable=self.quotaAvailable)
+        return row
+
+    @classmethod
+    def fromDict(cls, row):
+        return keepExtra(cls(row["itemID"], row["name"], row["quantity"], row["unitPrice"],
+                             row["visitDate"], row["parkName"], row["ticketName"],
+                             row.get("quotaAvailable", 0), row.get("orderID")), row)
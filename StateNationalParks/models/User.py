@@ -1,22 +1,54 @@
 from abc import ABC, abstractmethod
+from models.PasswordHasher import getDefaultHasher
+from models.RowFields import addExtra, keepExtra
 
 class User(ABC):
     
     # Abstract base class for all system users. Parent of Customer and Admin.
+
+    __slots__ = ("userID", "username", "password", "email", "fullName", "isAdmin", "extra")
   
     def __init__(self, userID, username, password, email, fullName, isAdmin):
         # Basic identity info common to all users
         self.userID = userID
         self.username = username
-        self.password = password
+        self.password = password      # stored hash (see PasswordHasher)
         self.email = email
         self.fullName = fullName
         self.isAdmin = isAdmin
+        self.extra = None             # stored fields this class does not know (see RowFields)
 
-    def signIn(self, password):
-        # Validates login by checking the provided password. Returns True if correct.
-        return self.password == password
+    def signIn(self, password, hasher=None):
+        # Validates login by checking the provided password against the stored hash.
+        # Returns True if correct. (Plaintext passwords from older data still work.)
+        hasher = hasher or getDefaultHasher()
+        return hasher.verify(password, self.password)
 
     def signOut(self):
         # Logs user out (placeholder).
         return True
+
+    def toDict(self):
+        # Stored format (row of the users collection).
+        row = {
+            "userID": self.userID,
+            "username": self.username,
+            "password": self.password,
+            "email": self.email,
+            "fullName": self.fullName,
+            "isAdmin": self.isAdmin
+        }
+        return addExtra(self, row)
+
+    @staticmethod
+    def fromDict(row):
+        # Builds an Admin or a Customer from a stored row.
+        from models.Admin import Admin
+        from models.Customer import Customer
+        if row.get("isAdmin") is True:
+            user = Admin(row["userID"], row["username"], row["password"],
+                         row["email"], row["fullName"])
+        else:
+            user = Customer(row["userID"], row["username"], row["password"],
+                            row["email"], row["fullName"], row.get("customerType", "Adult"))
+        return keepExtra(user, row)
@@ -0,0 +1,61 @@
+"""
+Production server: asgi.py under uvicorn (pip install uvicorn).
+
+    python serve.py [--host 0.0.0.0] [--port 8000] [--workers 4]
+                    [--threads 32] [--write-threads 16] [--graceful-timeout 30]
+
+Defaults come from config.SERVER_* (SNP_SERVER_* environment variables).
+Several workers share the data through the storage backend ("journal" or
+"sqlite" mode for many writers) and need SNP_SESSION_BACKEND=sqlite so a
+login is known to every worker; write-behind only works with one worker.
+SIGTERM or Ctrl+C stops taking connections, gives the running requests
+--graceful-timeout seconds, then writes out pending changes and exits.
+`python app.py` still starts the Flask development server.
+"""
+import argparse
+import os
+import config
+
+SETTINGS = {
+    # argument -> (config name, environment variable), passed on to the workers
+    "threads": ("SERVER_THREADS", "SNP_SERVER_THREADS"),
+    "write_threads": ("SERVER_WRITE_THREADS", "SNP_SERVER_WRITE_THREADS"),
+    "workers": ("SERVER_WORKERS", "SNP_SERVER_WORKERS"),
+}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVER_WORKERS, help="processes")
+    parser.add_argument("--threads", type=int, default=config.SERVER_THREADS,
+                        help="threads per worker for GET requests")
+    parser.add_argument("--write-threads", type=int, default=config.SERVER_WRITE_THREADS,
+                        help="threads per worker for POST (and other writing) requests")
+    parser.add_argument("--graceful-timeout", type=int, default=config.SERVER_GRACEFUL_TIMEOUT,
+                        help="seconds running requests get to finish on shutdown")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if args.workers > 1 and config.WRITE_BEHIND:
+        parser.error("write-behind keeps changes in one process: use --workers 1 or SNP_WRITE_BEHIND=0")
+    if args.workers > 1 and config.SESSION_BACKEND != "sqlite":
+        parser.error("sessions must be shared between workers: set SNP_SESSION_BACKEND=sqlite")
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("serve.py needs uvicorn: pip install uvicorn")
+
+    # worker processes import config again, so they get the settings through the environment
+    for argument, (name, variable) in SETTINGS.items():
+        value = getattr(args, argument)
+        setattr(config, name, value)
+        os.environ[variable] = str(value)
+
+    uvicorn.run("asgi:application", host=args.host, port=args.port, workers=args.workers,
+                lifespan="on", timeout_graceful_shutdown=args.graceful_timeout,
+                log_level=args.log_level)
+
+if __name__ == "__main__":
+    main()
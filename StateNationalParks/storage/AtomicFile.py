@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+class CorruptFileError(Exception):
+    """A data file could not be parsed and no good snapshot was found."""
+
+# path -> time of its last snapshot (snapshots are throttled per file)
+lastSnapshot = {}
+
+# mode of data files that did not exist yet (an existing file keeps its own);
+# explicit, because os.umask() can only be read by setting it, which would
+# briefly make other threads' new files world-writable
+NEW_FILE_MODE = 0o644
+
+def writeJson(path, data, indent=4, snapshotDir=None, snapshotInterval=0):
+    """
+    Writes JSON so that a crash leaves either the old or the new file, never half of one:
+    temp file in the same folder -> fsync -> rename over the target -> fsync the folder.
+    With `snapshotDir`, a checksummed copy is also kept there
+    (at most once every `snapshotInterval` seconds per file).
+    `data` may also be an object with a dumpJson(indent) method (see LazyRows).
+    Returns the number of bytes written.
+    """
+    if hasattr(data, "dumpJson"):
+        body = data.dumpJson(indent).encode("utf-8")
+    else:
+        body = json.dumps(data, indent=indent).encode("utf-8")
+    _atomicWrite(path, body)
+
+    if snapshotDir:
+        now = time.monotonic()
+        if now - lastSnapshot.get(path, -snapshotInterval - 1) >= snapshotInterval:
+            checksum = hashlib.sha256(body).hexdigest()
+            _atomicWrite(snapshotPath(path, snapshotDir), f"sha256:{checksum}\n".encode("ascii") + body)
+            lastSnapshot[path] = now
+
+    return len(body)
+
+def readJson(path, default, snapshotDir=None):
+    """
+    Reads a JSON file. A missing or empty file gives `default`.
+    A corrupted file falls back to its snapshot; if there is no valid
+    snapshot either, CorruptFileError is raised instead of losing the data.
+    """
+    try:
+        with open(path, "rb") as file:
+            body = file.read()
+    except FileNotFoundError:
+        return default
+
+    if not body.strip():
+        return default
+
+    try:
+        return json.loads(body)
+    except ValueError as error:
+        logger.error("Corrupted data file %s: %s", path, error)
+
+    data = readSnapshot(path, snapshotDir) if snapshotDir else None
+    if data is None:
+        raise CorruptFileError(f"{path} is corrupted and has no valid snapshot")
+
+    logger.warning("Restored %s from its last good snapshot", path)
+    return data
+
+def readSnapshot(path, snapshotDir):
+    """Returns the snapshot's data, or None if it is missing or fails its checksum."""
+    try:
+        with open(snapshotPath(path, snapshotDir), "rb") as file:
+            header = file.readline()
+            body = file.read()
+    except FileNotFoundError:
+        return None
+
+    expected = header.decode("ascii", "replace").strip()
+    if expected != "sha256:" + hashlib.sha256(body).hexdigest():
+        logger.error("Snapshot of %s failed its checksum", path)
+        return None
+    return json.loads(body)
+
+def snapshotPath(path, snapshotDir):
+    return os.path.join(snapshotDir, os.path.basename(path) + ".snapshot")
+
+def _atomicWrite(path, body):
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+
+    fd, tempPath = tempfile.mkstemp(dir=folder, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            # mkstemp makes 0600 files: keep the mode readers of the old file had
+            _chmod(file, tempPath, _fileMode(path))
+            file.write(body)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tempPath, path)
+    except BaseException:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+
+    _fsyncFolder(folder)
+
+def _fileMode(path):
+    # the replaced file's permissions, NEW_FILE_MODE for a new file
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return NEW_FILE_MODE
+
+def _chmod(file, path, mode):
+    # on the open file where the platform can (no window with a half-set mode)
+    if hasattr(os, "fchmod"):
+        os.fchmod(file.fileno(), mode)
+    else:
+        os.chmod(path, mode)
+
+def _fsyncFolder(folder):
+    # makes the rename itself durable (not possible on Windows)
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from storage.Metrics import metrics
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_WAIT = metrics.histogram("snp_lock_wait_seconds", "Time spent waiting for a lock", ["lock"])
+
+class FileLock:
+    """
+    Exclusive lock shared by threads and by other processes (e.g. gunicorn workers).
+    Usage:
+        with FileLock("data/.lock"):
+            ...
+    Locks given a `name` record how long acquiring them waited
+    (snp_lock_wait_seconds), threads and other processes included.
+    """
+
+    def __init__(self, path, name=None):
+        self.path = path
+        self.name = name
+        self.threadLock = threading.RLock()
+        self.file = None
+        self.depth = 0      # re-entrant for the owning thread
+        self.owner = None   # thread ident of the holder
+
+    def acquire(self, blocking=True):
+        """Takes the lock. With blocking=False, returns False at once if someone else holds it."""
+        start = time.perf_counter()
+        if not self.threadLock.acquire(blocking):
+            return False
+        if self.depth == 0:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self.file = open(self.path, "a+")
+            try:
+                if fcntl:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    self.file.seek(0)
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            except OSError:
+                # only reached without blocking: another process holds it
+                self.file.close()
+                self.file = None
+                self.threadLock.release()
+                return False
+            self.owner = threading.get_ident()
+            if self.name:
+                LOCK_WAIT.observe(time.perf_counter() - start, lock=self.name)
+        self.depth += 1
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            self.owner = None
+            if fcntl:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            self.file.close()
+            self.file = None
+        self.threadLock.release()
+
+    def heldByCurrentThread(self):
+        return self.owner == threading.get_ident()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,71 @@
+import threading
+from storage.AtomicFile import readJson, writeJson, CorruptFileError
+from storage.FileLock import FileLock
+
+class IDAllocator:
+    """
+    Hands out IDs like "T15" or "ORD42" that are never reused.
+    - one monotonic counter per prefix, stored in a small JSON file
+    - a process reserves a block of numbers at a time under a file lock,
+      so most IDs come from memory and other workers never get the same number
+    - numbers left in a block when the process stops are simply skipped
+    """
+
+    def __init__(self, path, blockSize=50):
+        self.path = path
+        self.blockSize = blockSize
+        self.fileLock = FileLock(path + ".lock", "ids")
+        self.lock = threading.Lock()
+
+        self.blocks = {}    # prefix -> [next number, last number reserved]
+        self.seeds = {}     # prefix -> function returning the highest number already used
+
+    def register(self, prefix, seed):
+        """
+        `seed` is only called if the counter file has no entry for the prefix yet,
+        so IDs continue after the ones already stored (e.g. data from before the allocator).
+        """
+        self.seeds[prefix] = seed
+
+    def next(self, prefix):
+        return self.nextBatch(prefix, 1)[0]
+
+    def nextBatch(self, prefix, count):
+        """Returns `count` new IDs for the prefix, in increasing order."""
+        ids = []
+        with self.lock:
+            while len(ids) < count:
+                block = self.blocks.get(prefix)
+                if block is None or block[0] > block[1]:
+                    block = self._reserve(prefix, max(self.blockSize, count - len(ids)))
+                    self.blocks[prefix] = block
+
+                take = min(count - len(ids), block[1] - block[0] + 1)
+                ids.extend(f"{prefix}{n}" for n in range(block[0], block[0] + take))
+                block[0] += take
+        return ids
+
+    def _reserve(self, prefix, size):
+        # the only place that touches the file
+        with self.fileLock:
+            counters = self._read()
+
+            last = counters.get(prefix)
+            if last is None:
+                seed = self.seeds.get(prefix)
+                last = seed() if seed else 0
+
+            counters[prefix] = last + size
+            self._write(counters)
+
+        return [last + 1, last + size]
+
+    def _read(self):
+        try:
+            return readJson(self.path, {})
+        except CorruptFileError:
+            # safe to rebuild: every counter is re-seeded from the stored IDs
+            return {}
+
+    def _write(self, counters):
+        writeJson(self.path, counters)
@@ -0,0 +1,50 @@
+import threading
+import time
+from collections import OrderedDict
+
+class IdempotencyCache:
+    """
+    Results of completed purchases, by (customerID, idempotency key), so a
+    retried request (double-click, client timeout) gets the first answer
+    back instead of buying again.
+    - entries expire `ttl` seconds after the purchase; past `maxEntries`
+      the oldest one is dropped
+    This is only the fast path of one worker: the key is also stored on
+    the order row itself (SystemController), which is what catches a retry
+    that reaches another worker or comes after a restart.
+    """
+
+    def __init__(self, maxEntries=10000, ttl=86400):
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self.entries = OrderedDict()    # key -> (result, time.monotonic() it expires), oldest first
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the stored result for `key`, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result, age=0.0):
+        """Stores the result of a completed purchase made `age` seconds ago."""
+        now = time.monotonic()
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (result, now + self.ttl - age)
+
+            # every entry lives as long, so the expired ones are at the front
+            while self.entries and (len(self.entries) > self.maxEntries or
+                                    next(iter(self.entries.values()))[1] <= now):
+                self.entries.popitem(last=False)
@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+from storage.Repository import BYTES_WRITTEN
+
+class Journal:
+    """
+    Append-only log of data changes.
+    - one compact JSON record per line
+    - replayed on top of the snapshot files when data is loaded
+    - rotated out and folded back into the snapshots by compaction
+    - several processes can share it: each one remembers how far it has read
+      and picks up the others' records with readNew()
+    """
+
+    def __init__(self, path, compactEvery=1000, fsync=False):
+        self.path = path
+        self.rotatedPath = path + ".1"
+        self.compactEvery = compactEvery
+        self.fsync = fsync
+
+        self.file = None
+        self.fileID = None      # (device, inode) of the log we are following
+        self.offset = 0         # bytes of that log already applied in memory
+        self.recordCount = 0
+        self.compacting = False
+        self.lock = threading.Lock()
+
+    # ---------------------------------------------
+    # Writing
+    # ---------------------------------------------
+    def open(self, recordCount=0):
+        """Opens the live log for appending, positioned at its end."""
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        if self.file:
+            self.file.close()
+        self.file = open(self.path, "ab")
+        self.file.seek(0, os.SEEK_END)
+        self._follow()
+        self.recordCount = recordCount
+
+    def _follow(self):
+        stat = os.fstat(self.file.fileno())
+        self.fileID = (stat.st_dev, stat.st_ino)
+        self.offset = self.file.tell()
+
+    def append(self, record):
+        """
+        Writes one record. Returns True when the log has grown enough
+        that a compaction should be started.
+        """
+        return self.appendMany([record])
+
+    def appendMany(self, records):
+        """Writes several records with one write (and one fsync)."""
+        data = b"".join((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+                        for record in records)
+
+        with self.lock:
+            self.file.write(data)
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+
+            self.offset = self.file.tell()
+            self.recordCount += len(records)
+            BYTES_WRITTEN.inc(len(data), target="journal")
+            return self.recordCount >= self.compactEvery and not self.compacting
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    # ---------------------------------------------
+    # Reading
+    # ---------------------------------------------
+    def replay(self):
+        """Yields every record, oldest first (rotated log, then live log)."""
+        for path in (self.rotatedPath, self.path):
+            if not os.path.exists(path):
+                continue
+
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # torn write from a crash, nothing after it is complete
+                        break
+
+    def readNew(self):
+        """
+        Returns the records other processes appended since our last read or append.
+        Returns None if the log was rotated or reset in a way that cannot be
+        followed (or could not be read as records); the caller then has to
+        reload everything.
+        Call it while holding the repository write lock.
+        """
+        with self.lock:
+            try:
+                return self._readNew()
+            except FileNotFoundError:
+                return None     # the rotated log was dropped by a compaction finishing meanwhile
+            except ValueError:
+                return None     # not at a record boundary: the log was replaced under us
+
+    def _readNew(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+        records = []
+        if (stat.st_dev, stat.st_ino) != self.fileID:
+            # another process rotated the log: finish the old one first
+            try:
+                old = os.stat(self.rotatedPath)
+            except FileNotFoundError:
+                return None
+            if (old.st_dev, old.st_ino) != self.fileID:
+                return None
+
+            records, _ = self._readFrom(self.rotatedPath, self.offset)
+            self.file.close()
+            self.file = open(self.path, "ab")
+            self.fileID = (stat.st_dev, stat.st_ino)
+            self.offset = 0
+            self.recordCount = 0
+
+        elif stat.st_size < self.offset:
+            return None   # truncated by a full snapshot
+
+        newRecords, self.offset = self._readFrom(self.path, self.offset)
+        self.recordCount += len(newRecords)
+        return records + newRecords
+
+    def _readFrom(self, path, offset):
+        with open(path, "rb") as file:
+            file.seek(offset)
+            data = file.read()
+
+        # only whole lines, a writer may be halfway through the last one
+        end = data.rfind(b"\n") + 1
+        records = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+        return records, offset + end
+
+    # ---------------------------------------------
+    # Compaction
+    # ---------------------------------------------
+    def rotate(self, capture):
+        """
+        Moves the live log aside and starts a new one.
+        `capture` runs while appends are blocked, so whatever it copies
+        contains every change written to the rotated log.
+        Returns the captured value, or None if a compaction is already running.
+        """
+        with self.lock:
+            if self.compacting or self.file is None:
+                return None
+            self.compacting = True
+
+            self.file.close()
+            if os.path.exists(self.rotatedPath):
+                # an earlier compaction failed, keep its records in front
+                with open(self.path, "rb") as live, open(self.rotatedPath, "ab") as rotated:
+                    rotated.write(live.read())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.rotatedPath)
+            self.file = open(self.path, "ab")
+            self._follow()
+            self.recordCount = 0
+
+            return capture()
+
+    def finishCompaction(self, success=True):
+        """Drops the rotated log once its changes are in the snapshots."""
+        if success and os.path.exists(self.rotatedPath):
+            os.remove(self.rotatedPath)
+        self.compacting = False
+
+    def hasRotated(self):
+        """True if a compaction did not finish (its log is still on disk)."""
+        return os.path.exists(self.rotatedPath)
+
+    def truncate(self):
+        """
+        Empties both logs (used after a full snapshot was written). The live
+        log is replaced by a new empty file rather than emptied in place:
+        other processes then see another file and reload, where an emptied
+        log that grew again past their offset would be read from mid-record.
+        """
+        with self.lock:
+            if self.file:
+                self.file.close()
+            if os.path.exists(self.rotatedPath):
+                os.remove(self.rotatedPath)
+            open(self.path + ".new", "wb").close()
+            os.replace(self.path + ".new", self.path)
+            # reopen in append mode, other processes may write to it too
+            self.file = open(self.path, "ab")
+            self._follow()
+            self.recordCount = 0
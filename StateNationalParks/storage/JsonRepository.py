@@ -0,0 +1,464 @@
+import bisect
+import json
+import logging
+import os
+import threading
+from array import array
+from contextlib import contextmanager
+import config
+from storage.AtomicFile import readJson, writeJson
+from storage.FileLock import FileLock
+from storage.LazyRows import LazyRows
+from storage.Repository import BYTES_WRITTEN, STORAGE_SECONDS, Repository
+from storage.WriteBehind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+class JsonRepository(Repository):
+    """
+    Keeps every collection in memory and persists it to data/*.json.
+    - without a journal, each put rewrites the files it touched
+    - with a journal, each put is one appended line and the files are
+      rewritten by a background compaction
+    - other worker processes' changes are picked up by refresh(): new journal
+      lines are applied, or everything is reloaded if the files changed
+    - with writeBehind, puts are acknowledged from memory and a background
+      thread writes them (see WriteBehindQueue); collections marked "sync" in
+      `durability` are still on disk before the transaction returns.
+      Only for a single writer process: other workers would not see the
+      queued changes
+    - files of at least `lazyMinBytes` are loaded lazily (see LazyRows): only
+      the keys and indexes are built at startup, rows are parsed when read
+    """
+
+    def __init__(self, files, journal=None, lockPath=None,
+                 writeBehind=False, durability=None, maxDelay=1.0, lazyMinBytes=None):
+        folder = os.path.dirname(next(iter(files.values())))
+        super().__init__(lockPath or os.path.join(folder, ".write.lock"))
+
+        self.files = files            # collection name -> path ("statistics" included)
+        self.journal = journal
+        self.data = {name: [] for name in files if name != "statistics"}
+        self.signatures = {}          # path -> (mtime, size) when we last read/wrote it
+        self.lazyMinBytes = lazyMinBytes
+
+        # only one compaction at a time, across processes too
+        self.compactLock = FileLock(journal.path + ".compact.lock", "compact") if journal else None
+        self.compactionThread = None
+
+        self.durability = durability or {}    # collection name -> "sync" / "lazy"
+        self.writeBehind = WriteBehindQueue(self._flush, maxDelay) if writeBehind else None
+        self.local = threading.local()        # flush ticket to wait for after the transaction
+
+        # hash indexes, kept in step with self.data
+        self.positions = {}     # name -> {key: position in self.data[name]}
+        self.indexes = {}       # name -> {field: {value: array of row positions, ascending}}
+        self.indexedValues = {} # name -> {key: (value per field)}, to unindex on update
+        self.sharedValues = {}  # one copy of each indexed string (dates, statuses, parks)
+        for name in self.data:
+            self._reindex(name)
+
+    # ---------------------------------------------
+    # Loading
+    # ---------------------------------------------
+    def load(self):
+        """Reads every file, then replays the journal on top."""
+        with self.writeLock, STORAGE_SECONDS.time(operation="load"):
+            self._loadAll()
+        self.loaded = True
+
+    def _loadAll(self):
+        for name in self.data:
+            self._loadCollection(name)
+
+        statData = self._load(self.files.get("statistics"))
+        self._setStatistics(statData if isinstance(statData, dict) else {})
+        self.signatures = self._signatures()
+
+        if self.journal:
+            self._replayJournal()
+
+    def refresh(self):
+        """Catches up with changes written by other processes."""
+        if self.writeBehind is not None:
+            # we are the only writer, and memory is ahead of the files
+            return
+
+        with self.writeLock, STORAGE_SECONDS.time(operation="refresh"):
+            if self.journal is None:
+                if self._signatures() != self.signatures:
+                    self._loadAll()
+                return
+
+            records = self.journal.readNew()
+            if records is None:
+                self._loadAll()
+                return
+            for record in records:
+                self._applyRecord(record)
+
+    def _signatures(self):
+        signatures = {}
+        for path in self.files.values():
+            try:
+                stat = os.stat(path)
+                signatures[path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                signatures[path] = None
+        return signatures
+
+    def _loadCollection(self, name):
+        path = self.files[name]
+        if self.lazyMinBytes is not None and _fileSize(path) >= max(self.lazyMinBytes, 1):
+            self._clearIndex(name)
+            try:
+                self.data[name] = LazyRows.scan(path, self._bulkIndexer(name))
+                return
+            except ValueError as error:
+                logger.warning("Loading %s eagerly: %s", path, error)
+
+        self.data[name] = self._load(path)
+        self._reindex(name)
+
+    def _load(self, path):
+        """Helper function to load JSON safely (falls back to the last good snapshot)."""
+        if path is None:
+            return []
+        return readJson(path, [], config.SNAPSHOT_DIR)
+
+    def _save(self, path, data):
+        """Helper function to save JSON safely (atomic, never half a file)."""
+        with STORAGE_SECONDS.time(operation="write_file"):
+            size = writeJson(path, data, snapshotDir=config.SNAPSHOT_DIR,
+                             snapshotInterval=config.SNAPSHOT_INTERVAL)
+        BYTES_WRITTEN.inc(size, target=os.path.basename(path))
+
+    # ---------------------------------------------
+    # Reading
+    # ---------------------------------------------
+    def all(self, name):
+        rows = self.data[name]
+        # a lazy collection is only parsed in full when someone asks for all of it
+        return list(rows) if isinstance(rows, LazyRows) else rows
+
+    def get(self, name, key):
+        position = self.positions[name].get(key)
+        return None if position is None else self.data[name][position]
+
+    def find(self, name, field, value):
+        if field == self.KEYS[name]:
+            row = self.get(name, value)
+            return [row] if row else []
+
+        buckets = self.indexes[name].get(field)
+        if buckets is None:
+            return [row for row in self.data[name] if row.get(field) == value]
+
+        # buckets hold positions in storage order
+        rows = self.data[name]
+        return [rows[i] for i in buckets.get(value, ())]
+
+    def count(self, name):
+        return len(self.data[name])
+
+    def page(self, name, after=None, limit=50, descending=False, field=None, value=None):
+        positions = self.positions[name]
+        if after is not None and after not in positions:
+            return []
+
+        if field is None:
+            # straight slice of the storage list, no matter how long it is
+            rows = self.data[name]
+            if descending:
+                end = positions[after] if after is not None else len(rows)
+                return rows[max(0, end - limit):end][::-1]
+            start = positions[after] + 1 if after is not None else 0
+            return rows[start:start + limit]
+
+        buckets = self.indexes[name].get(field)
+        if buckets is None:
+            # not indexed (or the key itself): filter, then cut
+            rows = self.find(name, field, value)
+            keyField = self.KEYS[name]
+            if descending:
+                rows = rows[::-1]
+            if after is not None:
+                keys = [row[keyField] for row in rows]
+                if after not in keys:
+                    return []
+                rows = rows[keys.index(after) + 1:]
+            return rows[:limit]
+
+        # the bucket's positions are sorted: bisect to the cut point and only
+        # read (for lazy collections: parse) the rows of the page
+        bucket = buckets.get(value, ())
+        rows = self.data[name]
+        if descending:
+            end = bisect.bisect_left(bucket, positions[after]) if after is not None else len(bucket)
+            return [rows[i] for i in reversed(bucket[max(0, end - limit):end])]
+        start = bisect.bisect_right(bucket, positions[after]) if after is not None else 0
+        return [rows[i] for i in bucket[start:start + limit]]
+
+    def maxKeyNumber(self, name, prefix):
+        numbers = [int(key[len(prefix):]) for key in self.positions[name]
+                   if key.startswith(prefix) and key[len(prefix):].isdigit()]
+        return max(numbers, default=0)
+
+    # ---------------------------------------------
+    # Writing
+    # ---------------------------------------------
+    @contextmanager
+    def transaction(self):
+        with super().transaction():
+            yield self
+
+        # write-behind: "sync" changes are waited for once the outermost
+        # transaction has released the lock (the writer thread may need it)
+        ticket = getattr(self.local, "ticket", None)
+        if ticket is not None and not self.writeLock.heldByCurrentThread():
+            self.local.ticket = None
+            self.writeBehind.wait(ticket)
+
+    def put(self, changes, statistics=None):
+        """Upserts rows in memory, then persists them."""
+        # re-entrant: a no-op refresh when the caller already holds a transaction
+        with self.transaction():
+            self._apply(changes)
+            if statistics is not None:
+                self.mergeStatistics(statistics)
+
+            record = {"put": changes}
+            if statistics is not None:
+                record["stats"] = statistics
+            self._persist(list(changes), record, statistics is not None)
+
+    def replaceAll(self, name, rows):
+        with self.transaction():
+            self.data[name] = list(rows)
+            self._reindex(name)
+            self._persist([name], {"replace": {name: self.data[name]}}, False)
+
+    def _persist(self, names, record, withStatistics):
+        """Writes a change now, or queues it in write-behind mode."""
+        if self.writeBehind is not None:
+            urgent = any(self.durability.get(name) == "sync" for name in names)
+            ticket = self.writeBehind.submit(record if self.journal else (names, withStatistics), urgent)
+            if urgent:
+                self.local.ticket = ticket
+            return
+
+        if self.journal is None:
+            self._writeFiles({name: self.data[name] for name in names},
+                             self.statistics if withStatistics else None)
+        else:
+            self._append(record)
+
+    def _flush(self, items):
+        # runs on the write-behind thread, with everything queued since the last flush
+        if self.journal is not None:
+            with STORAGE_SECONDS.time(operation="journal_append"):
+                compact = self.journal.appendMany(items)
+            if compact:
+                self._startCompaction()
+            return
+
+        names, withStatistics = set(), False
+        for itemNames, itemStatistics in items:
+            names.update(itemNames)
+            withStatistics = withStatistics or itemStatistics
+
+        # each collection is written once, from copies taken under the lock
+        with self.writeLock:
+            collections = {name: self.data[name].copy() for name in names}
+            statistics = json.loads(json.dumps(self.statistics)) if withStatistics else None
+        self._writeFiles(collections, statistics)
+
+    def snapshot(self, statistics=None):
+        """Rewrites every file from memory and, in journal mode, empties the log."""
+        with self.transaction():
+            if statistics is not None and statistics is not self.statistics:
+                self._setStatistics(statistics)
+            self._snapshot()
+
+    def _snapshot(self):
+        self._writeFiles(self.data, self.statistics)
+        if self.journal:
+            self.journal.truncate()
+
+    def close(self):
+        if self.writeBehind:
+            self.writeBehind.close()
+        if self.compactionThread:
+            self.compactionThread.join()
+        if self.journal:
+            self.journal.close()
+
+    def _apply(self, changes):
+        for name, rows in changes.items():
+            target = self.data[name]
+            positions = self.positions[name]
+            keyField = self.KEYS[name]
+            index = self._bulkIndexer(name)
+
+            for row in rows:
+                key = row[keyField]
+                position = positions.get(key)
+                if position is None:
+                    position = len(target)
+                    target.append(row)
+                else:
+                    self._unindexRow(name, key)
+                    target[position] = row
+                index(position, row)
+
+    # ---------------------------------------------
+    # Indexes
+    # ---------------------------------------------
+    def _reindex(self, name):
+        self._clearIndex(name)
+        index = self._bulkIndexer(name)
+        for position, row in enumerate(self.data[name]):
+            index(position, row)
+
+    def _clearIndex(self, name):
+        self.positions[name] = {}
+        self.indexes[name] = {field: {} for field in self.INDEXES.get(name, [])}
+        self.indexedValues[name] = {}
+
+    def _bulkIndexer(self, name):
+        """
+        Returns index(position, row), which records the row's position and adds
+        it to the buckets of its indexed values (strings are shared, and only
+        positions are kept, so indexing does not hold on to lazily loaded rows).
+        Buckets stay sorted: rows are mostly indexed in storage order (an
+        append), an updated row goes back to its place (an insort).
+        Everything is looked up once: it runs for every row loaded or put.
+        """
+        keyField = self.KEYS[name]
+        positions = self.positions[name]
+        indexedValues = self.indexedValues[name]
+        indexes = tuple(self.indexes[name].items())
+        share = self.sharedValues.setdefault
+        insort = bisect.insort
+
+        def index(position, row):
+            key = row[keyField]
+            positions[key] = position
+            values = []
+            for field, buckets in indexes:
+                value = row.get(field)
+                if value.__class__ is str:
+                    value = share(value, value)
+                bucket = buckets.get(value)
+                if bucket is None:
+                    buckets[value] = array("q", (position,))
+                elif bucket[-1] < position:
+                    bucket.append(position)
+                else:
+                    insort(bucket, position)
+                values.append(value)
+            indexedValues[key] = tuple(values)
+        return index
+
+    def _unindexRow(self, name, key):
+        # uses the values remembered at index time, the row itself
+        # may already have been changed in place by the caller
+        values = self.indexedValues[name].pop(key, ())
+        position = self.positions[name][key]
+        for (field, buckets), value in zip(self.indexes[name].items(), values):
+            bucket = buckets.get(value)
+            if bucket is not None:
+                i = bisect.bisect_left(bucket, position)
+                if i < len(bucket) and bucket[i] == position:
+                    del bucket[i]
+                if not bucket:
+                    del buckets[value]
+
+    def _writeFiles(self, collections, statistics=None):
+        written = [self.files[name] for name in collections]
+        for name, rows in collections.items():
+            self._save(self.files[name], rows)
+
+        if statistics is not None and "statistics" in self.files:
+            self._save(self.files["statistics"], statistics)
+            written.append(self.files["statistics"])
+
+        current = self._signatures()
+        for path in written:
+            self.signatures[path] = current[path]
+
+    # ---------------------------------------------
+    # Journal
+    # ---------------------------------------------
+    def _append(self, record):
+        with STORAGE_SECONDS.time(operation="journal_append"):
+            compact = self.journal.append(record)
+        if compact:
+            self._startCompaction()
+
+    def _startCompaction(self):
+        self.compactionThread = threading.Thread(target=self.compact, daemon=True)
+        self.compactionThread.start()
+
+    def getMetrics(self):
+        return {"writeBehind": self.writeBehind.metrics()} if self.writeBehind else {}
+
+    def _replayJournal(self):
+        """Applies logged changes on top of the loaded files."""
+        replayed = 0
+        for record in self.journal.replay():
+            self._applyRecord(record)
+            replayed += 1
+
+        # a rotated log is either a compaction that died halfway (finish its job now)
+        # or one still running in another process or thread (leave it alone: its
+        # files would land after our snapshot and hide what was written since)
+        if self.journal.hasRotated() and self.compactLock.acquire(blocking=False):
+            try:
+                if self.journal.hasRotated():
+                    self._snapshot()
+                    return
+            finally:
+                self.compactLock.release()
+        self.journal.open(recordCount=replayed)
+
+    def _applyRecord(self, record):
+        for name, rows in record.get("replace", {}).items():
+            self.data[name] = rows
+            self._reindex(name)
+
+        # rows are full copies, so replaying twice is harmless
+        self._apply(record.get("put", {}))
+
+        if "stats" in record:
+            self.mergeStatistics(record["stats"])
+            self.statisticsVersion += 1
+
+    def compact(self):
+        """Rewrites the files from memory and drops the old log."""
+        with self.compactLock:
+            # shallow copies are enough: rows are only ever replaced or given a
+            # new status, and any newer state is also in the live log
+            with self.writeLock:
+                self.refresh()
+                captured = self.journal.rotate(lambda: (
+                    {name: rows.copy() for name, rows in self.data.items()},
+                    # statistics are updated in place, so they need a real copy
+                    json.loads(json.dumps(self.statistics))
+                ))
+            if captured is None:
+                return
+
+            # writers are not blocked while the files are written
+            success = False
+            try:
+                self._writeFiles(*captured)
+                success = True
+            finally:
+                self.journal.finishCompaction(success)
+
+def _fileSize(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
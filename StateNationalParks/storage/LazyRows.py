@@ -0,0 +1,183 @@
+import gc
+import json
+import mmap
+import re
+import threading
+from array import array
+
+# whitespace with at most one comma, between two records
+SEPARATOR = re.compile(r"\s*(?:,\s*)?")
+
+class LazyRows:
+    """
+    List-like collection backed by a JSON array file (as written by writeJson).
+    - scan() reads the file once, record by record, and keeps only each
+      record's byte range; the caller gets the record to index it and then
+      drops it
+    - a row is parsed from the file the first time it is read, then kept,
+      so callers always get the same dict for the same position
+    - rows that are set or appended live in memory like in a plain list
+    The file is kept open (mmap) so a later rename over it does not change
+    what we read.
+    """
+
+    CHUNK = 1 << 20
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.starts = array("q")
+        self.ends = array("q")
+        self.rows = {}          # position -> row parsed or replaced
+        self.extra = []         # rows appended after the file was scanned
+        self.lock = threading.Lock()
+
+    @classmethod
+    def scan(cls, path, visit):
+        """
+        Builds the collection, calling visit(position, row) for every stored row.
+        Raises ValueError if the file is not a plain ASCII JSON array
+        (the caller then loads it the normal way).
+        """
+        rows = cls(path)
+        try:
+            rows._scan(visit)
+        except Exception:
+            rows.close()
+            raise
+        return rows
+
+    def _scan(self, visit):
+        decoder = json.JSONDecoder()
+        size = len(self.map)
+
+        # records are decoded from ASCII chunks, so string and byte offsets match
+        chunkStart, text, i = self._read(0, self.CHUNK)
+        i = SEPARATOR.match(text).end()
+        if text[i:i + 1] != "[":
+            raise ValueError(f"{self.path}: not a JSON array")
+        i += 1
+
+        # locals: this loop runs once per stored row
+        skip = SEPARATOR.match
+        decode = decoder.scan_once     # raw_decode without the Python wrapper
+        addStart = self.starts.append
+        addEnd = self.ends.append
+        position = 0
+
+        gcWasEnabled = gc.isenabled()
+        gc.disable()    # millions of short-lived dicts would trigger many useless collections
+        try:
+            while True:
+                i = skip(text, i).end()
+                if i >= len(text) - 1 and chunkStart + len(text) < size:
+                    # a separator may continue in the next chunk
+                    chunkStart, text, i = self._read(chunkStart + i, self.CHUNK)
+                    continue
+                if text[i:i + 1] == "]":
+                    return
+
+                try:
+                    row, end = decode(text, i)
+                except (ValueError, StopIteration):
+                    # the record runs past this chunk: read a bigger window from its start
+                    if chunkStart + len(text) >= size:
+                        raise
+                    chunkStart, text, i = self._read(chunkStart + i, max(self.CHUNK, 2 * len(text)))
+                    continue
+
+                if row.__class__ is not dict:
+                    raise ValueError(f"{self.path}: records must be JSON objects")
+                addStart(chunkStart + i)
+                addEnd(chunkStart + end)
+                visit(position, row)
+                position += 1
+                i = end
+        finally:
+            if gcWasEnabled:
+                gc.enable()
+
+    def _read(self, start, length):
+        chunk = self.map[start:start + length]
+        if not chunk.isascii():
+            raise ValueError(f"{self.path}: not ASCII, cannot be loaded lazily")
+        return start, chunk.decode("ascii"), 0
+
+    # ---------------------------------------------
+    # List interface
+    # ---------------------------------------------
+    def __len__(self):
+        return len(self.starts) + len(self.extra)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+
+        stored = len(self.starts)
+        if index >= stored:
+            return self.extra[index - stored]
+
+        row = self.rows.get(index)
+        if row is None:
+            with self.lock:
+                row = self.rows.get(index)
+                if row is None:
+                    row = self.rows[index] = self._parse(index)
+        return row
+
+    def __setitem__(self, index, row):
+        stored = len(self.starts)
+        if index >= stored:
+            self.extra[index - stored] = row
+        else:
+            self.rows[index] = row
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, row):
+        self.extra.append(row)
+
+    def copy(self):
+        """A snapshot that shares the file, for writing out while we keep changing."""
+        other = LazyRows.__new__(LazyRows)
+        other.path = self.path
+        other.file = self.file
+        other.map = self.map
+        other.starts = self.starts[:]
+        other.ends = self.ends[:]
+        other.rows = dict(self.rows)
+        other.extra = list(self.extra)
+        other.lock = threading.Lock()
+        return other
+
+    def _parse(self, index):
+        return json.loads(self.map[self.starts[index]:self.ends[index]])
+
+    # ---------------------------------------------
+    # Writing
+    # ---------------------------------------------
+    def dumpJson(self, indent=4):
+        """
+        Same text as json.dumps(list(self), indent=indent), without parsing
+        the rows nobody touched: their bytes are copied from the file.
+        """
+        pad = "\n" + " " * indent
+        pieces = []
+        for i in range(len(self)):
+            row = self.rows.get(i) if i < len(self.starts) else self.extra[i - len(self.starts)]
+            if row is None:
+                pieces.append(self.map[self.starts[i]:self.ends[i]].decode("ascii"))
+            else:
+                pieces.append(json.dumps(row, indent=indent).replace("\n", pad))
+        if not pieces:
+            return "[]"
+        return "[" + pad + ("," + pad).join(pieces) + "\n]"
+
+    def close(self):
+        self.map.close()
+        self.file.close()
@@ -0,0 +1,152 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds, from a fast cache hit to a slow full-file rewrite
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Counts observations per bucket, for every combination of label values."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}        # label values -> [count per bucket (+Inf last), sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the time spent in the `with` block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self.series.items()]
+
+        for key, counts, total in sorted(series):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield self.name + "_bucket", dict(labels, le=_bound(bound)), cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+class Counter:
+    """A total that only goes up, for every combination of label values."""
+
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labels, key)), value
+
+class MetricsRegistry:
+    """
+    In-process metrics, rendered in the Prometheus text format (see /metrics).
+    - histogram() / counter() return the metric with that name, creating it
+      the first time, so every module can declare what it records at import
+    - addCollector(fn) adds values read at render time (cache sizes, queue
+      depths): fn() returns [(name, help, type, labels, value), ...]
+    Each worker process has its own registry; scrape every worker (or run
+    one) to see everything.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def _get(self, kind, name, help, labels, **options):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = kind(name, help, labels, **options)
+            elif not isinstance(metric, kind) or metric.labels != tuple(labels):
+                raise ValueError(f"Metric {name} is already declared differently")
+            return metric
+
+    def addCollector(self, collect):
+        self.collectors.append(collect)
+
+    def render(self):
+        """All metrics as Prometheus text exposition (format 0.0.4)."""
+        lines = []
+        with self.lock:
+            metrics = sorted(self.metrics.items())
+        for name, metric in metrics:
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for sampleName, labels, value in metric.samples():
+                lines.append(_sample(sampleName, labels, value))
+
+        declared = set()
+        for collect in self.collectors:
+            for name, help, kind, labels, value in collect():
+                if name not in declared:
+                    declared.add(name)
+                    lines.append(f"# HELP {name} {help}")
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(_sample(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+def _sample(name, labels, value):
+    if labels:
+        pairs = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        name = f"{name}{{{pairs}}}"
+    return f"{name} {_number(value)}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+def _number(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+# the process-wide registry every module records into
+metrics = MetricsRegistry()
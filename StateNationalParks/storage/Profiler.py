@@ -0,0 +1,119 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class SlowRequestProfiler:
+    """
+    Opt-in sampling profiler for slow requests (config.PROFILE_SLOW_REQUESTS).
+    - start() registers the calling thread; one sampler thread reads the
+      stacks of all registered threads every `interval` seconds
+      (sys._current_frames), so requests run at full speed in between
+    - stop() returns nothing for fast requests; for one slower than
+      `threshold` it writes the samples in folded-stack format
+      ("outer;inner;leaf count", for flamegraph.pl / speedscope) to `folder`,
+      logs the hottest functions and returns the file path
+    - at most `keep` profiles are kept, the oldest are deleted
+    """
+
+    MAX_DEPTH = 64
+
+    def __init__(self, threshold, interval=0.005, folder="data/profiles", keep=50):
+        self.threshold = threshold
+        self.interval = interval
+        self.folder = folder
+        self.keep = keep
+
+        self.active = {}        # token -> [thread ident, start time, {stack: samples}]
+        self.tokens = iter(range(1, sys.maxsize))
+        self.lock = threading.Lock()
+        self.wakeUp = threading.Condition(self.lock)
+        self.thread = None
+
+    def start(self):
+        """Starts sampling the calling thread. Returns a token for stop()."""
+        with self.lock:
+            token = next(self.tokens)
+            self.active[token] = [threading.get_ident(), time.perf_counter(), {}]
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="slow-request-profiler",
+                                               daemon=True)
+                self.thread.start()
+            self.wakeUp.notify()
+        return token
+
+    def stop(self, token, label):
+        """Stops sampling. Returns the profile's path if the request was slow, else None."""
+        with self.lock:
+            entry = self.active.pop(token, None)
+        if entry is None:
+            return None
+
+        _, started, stacks = entry
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold or not stacks:
+            return None
+        return self._write(label, elapsed, stacks)
+
+    # ---------------------------------------------
+    # Sampler thread
+    # ---------------------------------------------
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.active:
+                    self.wakeUp.wait()
+            time.sleep(self.interval)
+
+            frames = sys._current_frames()
+            with self.lock:
+                for threadID, _, stacks in self.active.values():
+                    frame = frames.get(threadID)
+                    if frame is not None:
+                        stack = self._fold(frame)
+                        stacks[stack] = stacks.get(stack, 0) + 1
+
+    def _fold(self, frame):
+        names = []
+        while frame is not None and len(names) < self.MAX_DEPTH:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    # ---------------------------------------------
+    # Output
+    # ---------------------------------------------
+    def _write(self, label, elapsed, stacks):
+        os.makedirs(self.folder, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "request"
+        path = os.path.join(self.folder, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}.folded")
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+                file.write(f"{stack} {count}\n")
+
+        leaves = {}
+        for stack, count in stacks.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            leaves[leaf] = leaves.get(leaf, 0) + count
+        total = sum(leaves.values())
+        hottest = ", ".join(f"{leaf} {count * 100 // total}%" for leaf, count in
+                            sorted(leaves.items(), key=lambda item: -item[1])[:5])
+        logger.warning("Slow request %s took %.0f ms (%d samples, profile %s): %s",
+                       label, elapsed * 1000, total, path, hottest)
+
+        self._prune()
+        return path
+
+    def _prune(self):
+        profiles = sorted(f for f in os.listdir(self.folder) if f.endswith(".folded"))
+        for old in profiles[:-self.keep]:
+            try:
+                os.remove(os.path.join(self.folder, old))
+            except OSError:
+                pass
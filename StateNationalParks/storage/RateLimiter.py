@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key (client IP, username, user ID).
+    - a bucket holds up to `burst` tokens and refills at `rate` tokens per second
+    - take(key) spends one token; without one the call is refused and the
+      seconds until the next token are returned (for Retry-After)
+    - at most `maxKeys` buckets are kept, the least recently used go first
+      (a dropped bucket starts full again, which only ever errs on the side
+      of letting a request in)
+    """
+
+    def __init__(self, rate, burst, maxKeys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.maxKeys = maxKeys
+        self.buckets = OrderedDict()    # key -> [tokens, time.monotonic() of the last update]
+        self.lock = threading.Lock()
+
+    def take(self, key):
+        """Returns 0.0 if the request may go ahead, else the seconds to wait."""
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [float(self.burst), now]
+                while len(self.buckets) > self.maxKeys:
+                    self.buckets.popitem(last=False)
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self.buckets.move_to_end(key)
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+class ConcurrencyLimiter:
+    """
+    Lets at most `limit` requests run at once. Up to `queueSize` more wait
+    (at most `timeout` seconds each) for a free place; anything beyond that
+    is refused at once, so an overload costs a quick 429 instead of a slow
+    answer for everybody.
+    """
+
+    def __init__(self, limit, queueSize=0, timeout=1.0):
+        self.limit = limit
+        self.queueSize = queueSize
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """True once the request may run, False if it was refused."""
+        with self.condition:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            if self.waiting >= self.queueSize:
+                return False
+
+            self.waiting += 1
+            try:
+                admitted = self.condition.wait_for(lambda: self.active < self.limit, self.timeout)
+            finally:
+                self.waiting -= 1
+            if admitted:
+                self.active += 1
+            return admitted
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
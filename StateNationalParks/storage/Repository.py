@@ -0,0 +1,165 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from storage.FileLock import FileLock
+from storage.Metrics import metrics
+
+# recorded by every backend
+STORAGE_SECONDS = metrics.histogram("snp_storage_seconds", "Time spent in storage operations",
+                                    ["operation"])
+BYTES_WRITTEN = metrics.counter("snp_storage_bytes_written_total", "Bytes written to disk",
+                                ["target"])
+
+class Repository(ABC):
+    """
+    Storage backend shared by SystemController and AuthManager.
+    Rows are plain dicts, grouped into named collections:
+    orders, tickets, merch, payments, receipts, reviews, users.
+    Statistics are stored next to them as one dict, changed through patches
+    (see mergeStatistics) so a write only carries the counters it touched.
+    """
+
+    # collection name -> key field
+    KEYS = {
+        "orders": "orderID",
+        "tickets": "itemID",
+        "merch": "itemID",
+        "payments": "paymentID",
+        "receipts": "receiptID",
+        "reviews": "reviewID",
+        "users": "userID",
+        "capacity": "slotID",
+        "catalog": "catalogID",
+    }
+
+    # collection name -> secondary fields every backend can look up without a scan
+    INDEXES = {
+        "orders": ["customerID", "status", "date"],
+        "tickets": ["orderID", "visitDate", "parkName"],
+        "merch": ["orderID", "category", "catalogID"],
+        "payments": ["orderID"],
+        "receipts": ["orderID"],
+        "reviews": ["customerID"],
+        "users": ["username"],
+        "capacity": ["parkName", "visitDate"],
+        "catalog": ["name", "category"],
+    }
+
+    def __init__(self, lockPath):
+        self.loaded = False
+        self.statistics = {}
+
+        # bumped whenever statistics change other than through our own put()
+        # (load, or another process's changes), so cached views can be rebuilt
+        self.statisticsVersion = 0
+
+        # single-writer lock, shared by every thread and worker process
+        # that uses the same data folder
+        self.writeLock = FileLock(lockPath, "write")
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs a read-modify-write with no other writer in between:
+        takes the write lock, catches up with other processes' changes,
+        then lets the caller read and put.
+        """
+        with self.writeLock:
+            self.refresh()
+            yield self
+
+    def refresh(self):
+        # Picks up changes other processes made since we last looked.
+        pass
+
+    @abstractmethod
+    def load(self):
+        # (Re)reads the backend. Called once before first use.
+        pass
+
+    @abstractmethod
+    def all(self, name):
+        # Returns every row of a collection, oldest first.
+        pass
+
+    @abstractmethod
+    def get(self, name, key):
+        # Returns the row with the given key, or None.
+        pass
+
+    @abstractmethod
+    def find(self, name, field, value):
+        # Returns all rows where row[field] == value.
+        pass
+
+    @abstractmethod
+    def count(self, name):
+        pass
+
+    def page(self, name, after=None, limit=50, descending=False, field=None, value=None):
+        """
+        Up to `limit` rows in storage order (oldest first, or newest first if
+        `descending`), optionally only those where row[field] == value.
+        `after` is the key of the last row of the previous page; an unknown
+        key gives an empty page. Backends override this with indexed versions.
+        """
+        rows = self.all(name) if field is None else self.find(name, field, value)
+        if descending:
+            rows = rows[::-1]
+        if after is not None:
+            keys = [row[self.KEYS[name]] for row in rows]
+            if after not in keys:
+                return []
+            rows = rows[keys.index(after) + 1:]
+        return rows[:limit]
+
+    @abstractmethod
+    def put(self, changes, statistics=None):
+        # Inserts or updates rows as one unit.
+        # changes: {collection name: [row, ...]}
+        # statistics: patch merged into the statistics (see mergeStatistics)
+        pass
+
+    @abstractmethod
+    def replaceAll(self, name, rows):
+        # Replaces a whole collection.
+        pass
+
+    @abstractmethod
+    def maxKeyNumber(self, name, prefix):
+        # Highest N among keys shaped like prefix + N (0 if none), used to seed IDAllocator.
+        pass
+
+    def getStatistics(self):
+        # The live statistics dict (kept current by load / refresh / put).
+        return self.statistics
+
+    def mergeStatistics(self, patch):
+        """
+        Applies a statistics patch: top-level values are replaced, nested dicts
+        (buckets such as byDay) are updated key by key. Patches hold absolute
+        values, so applying one twice is harmless.
+        """
+        for key, value in patch.items():
+            if isinstance(value, dict) and isinstance(self.statistics.get(key), dict):
+                self.statistics[key].update(value)
+            else:
+                self.statistics[key] = value
+
+    def _setStatistics(self, data):
+        # replaced in place: Statistic objects hold a reference to this dict
+        self.statistics.clear()
+        self.statistics.update(data)
+        self.statisticsVersion += 1
+
+    @abstractmethod
+    def snapshot(self, statistics=None):
+        # Makes everything written so far durable in the backend's main files.
+        # statistics: the full statistics dict
+        pass
+
+    def getMetrics(self):
+        # Backend specific numbers for the admin pages (e.g. write-behind queue).
+        return {}
+
+    def close(self):
+        pass
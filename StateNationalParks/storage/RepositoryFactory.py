@@ -0,0 +1,37 @@
+import os
+import config
+from storage.Journal import Journal
+from storage.JsonRepository import JsonRepository
+from storage.SqliteRepository import SqliteRepository
+
+def createRepository(files=None, mode=None, journalFile=None):
+    """
+    Builds the storage backend selected in config.STORAGE_MODE.
+    `files` limits the JSON backends to some collections (name -> path).
+    """
+    files = files or config.DATA_FILES
+    mode = mode or config.STORAGE_MODE
+
+    if mode == "sqlite":
+        names = [name for name in files if name != "statistics"]
+        return SqliteRepository(config.SQLITE_FILE, names, config.WRITE_LOCK_FILE)
+
+    if mode == "journal":
+        journal = Journal(journalFile or config.JOURNAL_FILE,
+                          config.JOURNAL_COMPACT_EVERY,
+                          config.JOURNAL_FSYNC)
+        return JsonRepository(files, journal, config.WRITE_LOCK_FILE, **jsonOptions())
+
+    if mode == "json":
+        return JsonRepository(files, lockPath=config.WRITE_LOCK_FILE, **jsonOptions())
+
+    raise ValueError(f"Unknown storage mode: {mode}")
+
+def jsonOptions():
+    return {
+        "writeBehind": config.WRITE_BEHIND,
+        "durability": config.WRITE_DURABILITY,
+        "maxDelay": config.WRITE_BEHIND_MAX_DELAY,
+        # memory-mapped files cannot be replaced on Windows
+        "lazyMinBytes": config.LAZY_LOAD_MIN_BYTES if config.LAZY_LOAD and os.name != "nt" else None,
+    }
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+class CachedResponse:
+    """One stored response body with its validators."""
+
+    def __init__(self, body, mimetype, tags, expires):
+        self.body = body
+        self.mimetype = mimetype
+        self.tags = tags
+        self.expires = expires
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        # HTTP dates have whole seconds
+        self.lastModified = datetime.now(timezone.utc).replace(microsecond=0)
+
+class ResponseCache:
+    """
+    In-memory cache of rendered pages and JSON responses.
+    - entries expire after `ttl` seconds; past `maxEntries` the least
+      recently used one is dropped
+    - every entry is tagged with the collections it was built from;
+      invalidate() drops the entries whose data changed (see
+      SystemController.addListener)
+    - entries carry an ETag and Last-Modified, so browsers can revalidate
+      and get a 304 without a body
+    The TTL also bounds how long changes made by other worker processes
+    (which do not reach our listeners) can go unseen.
+    A response is only stored if none of its tags was invalidated while it
+    was being built (see generation()), so a page rendered from data that
+    changed meanwhile is not kept.
+    """
+
+    def __init__(self, maxEntries=512, ttl=30):
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self.entries = OrderedDict()    # key -> CachedResponse, least recently used first
+        self.keysByTag = {}             # tag -> {key}
+        self.generations = {}           # tag -> number of times it was invalidated
+        self.cleared = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the live entry for `key`, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._drop(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def generation(self, tags=()):
+        """Taken before building a response, and handed back to put()."""
+        with self.lock:
+            return self._generation(tags)
+
+    def _generation(self, tags):
+        return (self.cleared,) + tuple(self.generations.get(tag, 0) for tag in tags)
+
+    def put(self, key, body, mimetype, tags=(), generation=None):
+        """
+        Stores a response body (bytes). Returns the new entry, which is not
+        stored if one of `tags` changed since `generation` was taken.
+        """
+        entry = CachedResponse(body, mimetype, tuple(tags), time.monotonic() + self.ttl)
+        with self.lock:
+            if generation is not None and generation != self._generation(entry.tags):
+                return entry
+            self._drop(key)
+            self.entries[key] = entry
+            for tag in entry.tags:
+                self.keysByTag.setdefault(tag, set()).add(key)
+
+            while len(self.entries) > self.maxEntries:
+                self._drop(next(iter(self.entries)))
+        return entry
+
+    def invalidate(self, tags):
+        """Drops every entry built from any of the given collections."""
+        with self.lock:
+            for tag in tags:
+                self.generations[tag] = self.generations.get(tag, 0) + 1
+                for key in list(self.keysByTag.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keysByTag.clear()
+            self.cleared += 1
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self.keysByTag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keysByTag[tag]
@@ -0,0 +1,198 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class StoredSession:
+    """One login: the session values, the resolved user object and when it ends."""
+
+    __slots__ = ("sid", "data", "userID", "user", "expires", "checkedAt")
+
+    def __init__(self, sid, data, expires):
+        self.sid = sid
+        self.data = data
+        self.userID = data.get("userID")
+        self.user = None            # set by the app the first time it needs the user object
+        self.expires = expires      # time.time() seconds (shared with other processes)
+        self.checkedAt = time.monotonic()
+
+class SessionStore:
+    """
+    Server-side sessions: the browser only gets a random session ID.
+    - sessions end `ttl` seconds after they were created; past
+      `maxEntries` the least recently used one is dropped from memory
+    - each session keeps a reference to its user object, so requests do
+      not look the user up again
+    - revoke() / revokeUser() end sessions centrally (logout everywhere,
+      a changed admin flag, a blocked account)
+    Without a `backend` sessions live in this process only, which suits one
+    worker (threads are fine); an evicted session is logged out. With a
+    SqliteSessionBackend every worker sees every session: memory is a cache
+    in front of it, re-checked at most every `recheck` seconds, which
+    bounds how long a session revoked by another worker stays usable here.
+    """
+
+    # expired sessions are swept out every this many new sessions
+    PURGE_EVERY = 1000
+
+    def __init__(self, maxEntries=10000, ttl=3600, backend=None, recheck=2.0):
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self.backend = backend
+        self.recheck = recheck
+        self.entries = OrderedDict()    # sid -> StoredSession, least recently used first
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+
+    def create(self, data):
+        """Starts a session with the given values. Returns it (with its new sid)."""
+        entry = StoredSession(secrets.token_urlsafe(32), dict(data), time.time() + self.ttl)
+        if self.backend is not None:
+            self.backend.save(entry)
+        with self.lock:
+            self._remember(entry)
+            self.created += 1
+            purge = self.created % self.PURGE_EVERY == 0
+        if purge:
+            self.purge()
+        return entry
+
+    def get(self, sid):
+        """Returns the live session for `sid`, or None."""
+        if not sid:
+            return None
+        with self.lock:
+            entry = self.entries.get(sid)
+            if entry is not None:
+                self.entries.move_to_end(sid)
+
+        if entry is not None and self.backend is not None and \
+                time.monotonic() - entry.checkedAt > self.recheck:
+            entry = self._recheck(entry)
+        elif entry is None and self.backend is not None:
+            entry = self.backend.load(sid)
+            if entry is not None:
+                with self.lock:
+                    self._remember(entry)
+
+        if entry is not None and entry.expires <= time.time():
+            self.revoke(sid)
+            entry = None
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def _recheck(self, entry):
+        # revoked or changed by another worker since we last looked?
+        stored = self.backend.load(entry.sid)
+        with self.lock:
+            if stored is None:
+                self.entries.pop(entry.sid, None)
+                return None
+            if stored.data != entry.data:
+                entry.data = stored.data
+                entry.userID = stored.userID
+                entry.user = None
+            entry.checkedAt = time.monotonic()
+            return entry
+
+    def save(self, entry, data):
+        """Replaces the values of a session (it keeps its sid and end time)."""
+        data = dict(data)
+        with self.lock:
+            if data.get("userID") != entry.userID:
+                entry.user = None
+            entry.data = data
+            entry.userID = data.get("userID")
+        if self.backend is not None:
+            self.backend.save(entry)
+
+    def revoke(self, sid):
+        """Ends one session (logout)."""
+        with self.lock:
+            self.entries.pop(sid, None)
+        if self.backend is not None:
+            self.backend.delete(sid)
+
+    def revokeUser(self, userID):
+        """Ends every session of a user. Returns how many were ended here (or in the backend)."""
+        with self.lock:
+            sids = [sid for sid, entry in self.entries.items() if entry.userID == userID]
+            for sid in sids:
+                del self.entries[sid]
+        if self.backend is not None:
+            return max(len(sids), self.backend.deleteUser(userID))
+        return len(sids)
+
+    def purge(self):
+        """Drops expired sessions (memory and backend)."""
+        now = time.time()
+        with self.lock:
+            for sid in [sid for sid, entry in self.entries.items() if entry.expires <= now]:
+                del self.entries[sid]
+        if self.backend is not None:
+            self.backend.deleteExpired(now)
+
+    def _remember(self, entry):
+        self.entries[entry.sid] = entry
+        self.entries.move_to_end(entry.sid)
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+
+class SqliteSessionBackend:
+    """
+    Sessions shared by every worker process, in one SQLite file
+    (one row per session, one connection per thread).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                     "(sid TEXT PRIMARY KEY, userID TEXT, data TEXT NOT NULL, expires REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_userID ON sessions (userID)")
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def load(self, sid):
+        row = self._connection().execute(
+            "SELECT data, expires FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None:
+            return None
+        return StoredSession(sid, json.loads(row[0]), row[1])
+
+    def save(self, entry):
+        self._connection().execute(
+            "INSERT INTO sessions (sid, userID, data, expires) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(sid) DO UPDATE SET userID = excluded.userID, data = excluded.data",
+            (entry.sid, entry.userID, json.dumps(entry.data), entry.expires))
+
+    def delete(self, sid):
+        self._connection().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def deleteUser(self, userID):
+        return self._connection().execute("DELETE FROM sessions WHERE userID = ?", (userID,)).rowcount
+
+    def deleteExpired(self, now):
+        self._connection().execute("DELETE FROM sessions WHERE expires <= ?", (now,))
@@ -0,0 +1,231 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from storage.Repository import BYTES_WRITTEN, STORAGE_SECONDS, Repository
+
+# one encoder for every row (json.dumps with options builds a new one per call)
+_compact = json.JSONEncoder(separators=(",", ":")).encode
+
+class SqliteRepository(Repository):
+    """
+    SQLite backend.
+    - one table per collection: key column, INDEXES columns, full row as JSON
+    - WAL mode, so readers never wait for the writer
+    - rows are not cached in memory, lookups are indexed point queries
+    - statistics are one row per counter / bucket entry (table "stats"), cached
+      in memory and reloaded only when another process changed them
+    """
+
+    def __init__(self, path, collections=None, lockPath=None):
+        super().__init__(lockPath or path + ".lock")
+        self.path = path
+        self.collections = list(collections or self.KEYS)
+        self.local = threading.local()   # sqlite connections are per thread
+
+    # ---------------------------------------------
+    # Connection / schema
+    # ---------------------------------------------
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def load(self):
+        """Creates the tables and indexes if they do not exist yet."""
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        conn = self._connection()
+        for name in self.collections:
+            keyField = self.KEYS[name]
+            columns = "".join(f", {col} TEXT" for col in self.INDEXES[name])
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} "
+                f"({keyField} TEXT PRIMARY KEY{columns}, data TEXT NOT NULL)"
+            )
+            for col in self.INDEXES[name]:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_{col} ON {name} ({col})")
+
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._loadStatistics()
+        self.loaded = True
+
+    def _loadStatistics(self):
+        statData = {}
+        for key, data in self._connection().execute("SELECT key, data FROM stats"):
+            bucket, _, entry = key.partition("|")
+            if entry:
+                statData.setdefault(bucket, {})[entry] = json.loads(data)
+            else:
+                statData[key] = json.loads(data)
+        self._setStatistics(statData)
+        self.knownStatsVersion = statData.get("version", 0)
+
+    def refresh(self):
+        """Reloads the cached statistics if another process wrote since we last looked."""
+        row = self._connection().execute("SELECT data FROM stats WHERE key = 'version'").fetchone()
+        version = json.loads(row[0]) if row else 0
+        if version != self.knownStatsVersion:
+            self._loadStatistics()
+
+    # ---------------------------------------------
+    # Reading
+    # ---------------------------------------------
+    def all(self, name):
+        cursor = self._connection().execute(f"SELECT data FROM {name} ORDER BY rowid")
+        return [json.loads(data) for (data,) in cursor]
+
+    def get(self, name, key):
+        row = self._connection().execute(
+            f"SELECT data FROM {name} WHERE {self.KEYS[name]} = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, name, field, value):
+        if field == self.KEYS[name]:
+            row = self.get(name, value)
+            return [row] if row else []
+
+        if field in self.INDEXES[name]:
+            cursor = self._connection().execute(
+                f"SELECT data FROM {name} WHERE {field} = ? ORDER BY rowid", (value,)
+            )
+        else:
+            # not indexed, fall back to a scan inside SQLite
+            cursor = self._connection().execute(
+                f"SELECT data FROM {name} WHERE json_extract(data, ?) = ? ORDER BY rowid",
+                ("$." + field, value)
+            )
+        return [json.loads(data) for (data,) in cursor]
+
+    def count(self, name):
+        return self._connection().execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+
+    def page(self, name, after=None, limit=50, descending=False, field=None, value=None):
+        # keyset pagination on rowid (insertion order): the index on `field`
+        # already ends in rowid, so each page is one short index range scan
+        where, params = [], []
+        if field is not None:
+            if field in self.INDEXES[name] or field == self.KEYS[name]:
+                where.append(f"{field} = ?")
+                params.append(value)
+            else:
+                where.append("json_extract(data, ?) = ?")
+                params.extend(("$." + field, value))
+        if after is not None:
+            where.append(f"rowid {'<' if descending else '>'} "
+                         f"(SELECT rowid FROM {name} WHERE {self.KEYS[name]} = ?)")
+            params.append(after)
+
+        sql = f"SELECT data FROM {name}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY rowid {'DESC' if descending else 'ASC'} LIMIT ?"
+        params.append(limit)
+        return [json.loads(data) for (data,) in self._connection().execute(sql, params)]
+
+    def maxKeyNumber(self, name, prefix):
+        keyField = self.KEYS[name]
+        row = self._connection().execute(
+            f"SELECT MAX(CAST(SUBSTR({keyField}, ?) AS INTEGER)) FROM {name} "
+            f"WHERE {keyField} LIKE ?",
+            (len(prefix) + 1, prefix + "%")
+        ).fetchone()
+        return row[0] or 0
+
+    # ---------------------------------------------
+    # Writing
+    # ---------------------------------------------
+    def put(self, changes, statistics=None):
+        """Upserts all rows (and statistics) in one transaction."""
+        conn = self._connection()
+        with self.transaction(), STORAGE_SECONDS.time(operation="sqlite_put"):
+            with self._atomic(conn):
+                for name, rows in changes.items():
+                    self._upsert(conn, name, rows)
+                if statistics is not None:
+                    self._putStatistics(conn, statistics)
+
+            if statistics is not None:
+                self.mergeStatistics(statistics)
+
+    def replaceAll(self, name, rows):
+        """Replaces a whole collection in one SQLite transaction (under the write lock, like put)."""
+        conn = self._connection()
+        with self.transaction(), self._atomic(conn):
+            conn.execute(f"DELETE FROM {name}")
+            self._upsert(conn, name, rows)
+
+    def snapshot(self, statistics=None):
+        conn = self._connection()
+        if statistics is not None:
+            with self.writeLock, self._atomic(conn):
+                conn.execute("DELETE FROM stats")
+                self._putStatistics(conn, statistics)
+            if statistics is not self.statistics:
+                self._setStatistics(statistics)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    @contextmanager
+    def _atomic(self, conn):
+        # BEGIN IMMEDIATE takes SQLite's write lock at once; anything raised
+        # inside (KeyboardInterrupt included) rolls the whole change back
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _upsert(self, conn, name, rows):
+        keyField = self.KEYS[name]
+        columns = [keyField] + self.INDEXES[name]
+        placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+        updates = ", ".join(f"{col} = excluded.{col}" for col in columns[1:] + ["data"])
+
+        params = [[row.get(col) for col in columns] + [_compact(row)] for row in rows]
+        conn.executemany(
+            f"INSERT INTO {name} ({', '.join(columns)}, data) VALUES ({placeholders}) "
+            f"ON CONFLICT({keyField}) DO UPDATE SET {updates}",
+            params
+        )
+        # row payloads only: SQLite's pages and WAL add their own overhead
+        BYTES_WRITTEN.inc(sum(len(values[-1]) for values in params), target="sqlite")
+
+    def _putStatistics(self, conn, patch):
+        # one row per top-level value and per bucket entry ("byDay|2026-10-18")
+        rows = []
+        for key, value in patch.items():
+            if key == "version":
+                continue
+            if isinstance(value, dict):
+                rows.extend((f"{key}|{entry}", json.dumps(data)) for entry, data in value.items())
+            else:
+                rows.append((key, json.dumps(value)))
+
+        # lets other processes notice the change with a single lookup
+        self.knownStatsVersion += 1
+        self.statistics["version"] = self.knownStatsVersion
+        rows.append(("version", json.dumps(self.knownStatsVersion)))
+
+        conn.executemany(
+            "INSERT INTO stats (key, data) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET data = excluded.data",
+            rows
+        )
@@ -0,0 +1,28 @@
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from storage.FileLock import LOCK_WAIT
+
+class StripedLock:
+    """
+    A fixed set of locks shared by many keys (e.g. order IDs).
+    Two keys only wait for each other if they hash to the same stripe,
+    and memory does not grow with the number of keys.
+    hold(key) takes the key's lock and records the wait under `name`.
+    """
+
+    def __init__(self, stripes=64, name="striped"):
+        self.locks = [threading.RLock() for _ in range(stripes)]
+        self.name = name
+
+    def get(self, key):
+        return self.locks[zlib.crc32(str(key).encode("utf-8")) % len(self.locks)]
+
+    @contextmanager
+    def hold(self, key):
+        lock = self.get(key)
+        start = time.perf_counter()
+        with lock:
+            LOCK_WAIT.observe(time.perf_counter() - start, lock=self.name)
+            yield
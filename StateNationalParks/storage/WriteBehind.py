@@ -0,0 +1,171 @@
+import atexit
+import threading
+import time
+
+class WriteBehindQueue:
+    """
+    Background writer used by JsonRepository's write-behind mode.
+    - submit() only records what has to be written and returns at once;
+      the writer thread persists everything pending in one go, at most
+      `maxDelay` seconds later (a collection changed by a hundred requests
+      is written once)
+    - changes that must be on disk before the request is answered are
+      submitted as urgent: the writer starts straight away and wait(ticket)
+      blocks until the flush containing them has finished
+    - if a flush fails, its items stay queued and are retried; the waiters
+      for items of that flush get the error instead of an acknowledgement
+      (waiters for later items keep waiting for the retry)
+    - close() drains the queue; it is also registered with atexit so a normal
+      shutdown never drops acknowledged changes
+    """
+
+    def __init__(self, flush, maxDelay=1.0, name="write-behind"):
+        self.flush = flush          # flush(items) persists a list of submitted items
+        self.maxDelay = maxDelay
+
+        self.condition = threading.Condition()
+        self.pending = []
+        self.submitted = 0          # ticket of the last submitted item
+        self.flushed = 0            # every ticket up to this one is on disk
+        self.urgent = False
+        self.closed = False
+        self.failure = None         # (failure number, last ticket in the flush, error) of the last failed flush
+
+        # time.monotonic() the oldest change not on disk yet was submitted (None: all written)
+        self.pendingSince = None
+        self.flushingSince = None
+
+        # metrics
+        self.maxDepth = 0
+        self.flushes = 0
+        self.itemsFlushed = 0
+        self.failures = 0
+        self.lastFlushSeconds = 0.0
+        self.maxFlushSeconds = 0.0
+        self.totalFlushSeconds = 0.0
+
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    # ---------------------------------------------
+    # Producers
+    # ---------------------------------------------
+    def submit(self, item, urgent=False):
+        """Queues an item. Returns its ticket, to pass to wait()."""
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("write-behind queue is closed")
+
+            self.pending.append(item)
+            self.submitted += 1
+            if self.pendingSince is None:
+                self.pendingSince = time.monotonic()
+            self.maxDepth = max(self.maxDepth, len(self.pending))
+            if urgent:
+                self.urgent = True
+            self.condition.notify_all()
+            return self.submitted
+
+    def wait(self, ticket):
+        """
+        Blocks until the item with this ticket has been written. Raises the
+        error of a flush that contained the item and failed while waiting.
+        """
+        with self.condition:
+            failuresBefore = self.failures
+            while self.flushed < ticket:
+                if self.failure is not None:
+                    number, lastTicket, error = self.failure
+                    # tickets up to flushed were written, so the failed flush held flushed+1..lastTicket
+                    if number > failuresBefore and ticket <= lastTicket:
+                        raise error
+                self.condition.wait()
+
+    def drain(self):
+        """Writes everything queued so far and waits for it."""
+        with self.condition:
+            ticket = self.submitted
+            self.urgent = True
+            self.condition.notify_all()
+        self.wait(ticket)
+
+    def close(self):
+        """Drains the queue and stops the writer thread."""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def lag(self):
+        """Seconds the oldest change not written yet has been waiting (0 if there is none)."""
+        with self.condition:
+            since = [t for t in (self.flushingSince, self.pendingSince) if t is not None]
+            return time.monotonic() - min(since) if since else 0.0
+
+    def metrics(self):
+        lag = self.lag()
+        with self.condition:
+            return {
+                "queueDepth": len(self.pending),
+                "lagSeconds": round(lag, 3),
+                "maxQueueDepth": self.maxDepth,
+                "flushes": self.flushes,
+                "itemsFlushed": self.itemsFlushed,
+                "failures": self.failures,
+                "lastFlushMs": round(self.lastFlushSeconds * 1000, 3),
+                "maxFlushMs": round(self.maxFlushSeconds * 1000, 3),
+                "avgFlushMs": round(self.totalFlushSeconds * 1000 / self.flushes, 3) if self.flushes else 0.0,
+            }
+
+    # ---------------------------------------------
+    # Writer thread
+    # ---------------------------------------------
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return   # closed and drained
+
+                # lazy changes are gathered for up to maxDelay, urgent ones go now
+                deadline = time.monotonic() + self.maxDelay
+                while not self.urgent and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                items, self.pending = self.pending, []
+                ticket = self.submitted
+                self.urgent = False
+                self.flushingSince, self.pendingSince = self.pendingSince, None
+
+            start = time.perf_counter()
+            try:
+                self.flush(items)
+            except Exception as e:
+                with self.condition:
+                    self.pending = items + self.pending
+                    self.pendingSince, self.flushingSince = self.flushingSince, None
+                    self.failures += 1
+                    self.failure = (self.failures, ticket, e)
+                    self.condition.notify_all()
+                    if self.closed:
+                        return   # nothing more can be done at shutdown
+                time.sleep(min(self.maxDelay, 1.0))
+                continue
+
+            elapsed = time.perf_counter() - start
+            with self.condition:
+                self.flushed = ticket
+                self.flushingSince = None
+                self.flushes += 1
+                self.itemsFlushed += len(items)
+                self.lastFlushSeconds = elapsed
+                self.maxFlushSeconds = max(self.maxFlushSeconds, elapsed)
+                self.totalFlushSeconds += elapsed
+                self.condition.notify_all()
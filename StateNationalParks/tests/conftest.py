@@ -0,0 +1,134 @@
+"""
+Shared fixtures. Every test runs in a scratch copy of data/ (the storage,
+counter and lock paths in config.py are relative), so the real data files
+are never touched.
+
+    python -m pytest -q        (from the StateNationalParks folder)
+"""
+import glob
+import itertools
+import os
+import shutil
+import sys
+import threading
+import uuid
+
+import pytest
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT)
+
+# cheap password hashing, set before config is imported
+os.environ.setdefault("SNP_PASSWORD_ITERATIONS", "1000")
+
+def copyData(folder):
+    """A fresh copy of the shipped data files in folder/data."""
+    os.makedirs(os.path.join(folder, "data"))
+    for path in glob.glob(os.path.join(PROJECT, "data", "*.json")):
+        shutil.copy(path, os.path.join(folder, "data"))
+
+@pytest.fixture(scope="session", autouse=True)
+def sessionFolder(tmp_path_factory):
+    """The working folder of the whole run; app.py opens its storage here once."""
+    folder = tmp_path_factory.mktemp("snp")
+    copyData(folder)
+    previous = os.getcwd()
+    os.chdir(folder)
+    yield folder
+    os.chdir(previous)
+
+@pytest.fixture
+def dataFolder(tmp_path, monkeypatch):
+    """A working folder with its own copy of data/, for one test."""
+    copyData(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def openSystem(dataFolder):
+    """Opens SystemControllers on the test's data ("journal" mode unless told); closed at the end."""
+    from controllers.SystemController import SystemController
+
+    opened = []
+
+    def open(storageMode="journal"):
+        system = SystemController(storageMode=storageMode)
+        opened.append(system)
+        return system
+
+    yield open
+    for system in opened:
+        system.repo.close()
+
+@pytest.fixture
+def system(openSystem):
+    return openSystem()
+
+@pytest.fixture(scope="session")
+def flaskApp(sessionFolder):
+    """app.py, imported once (its storage, sessions and rate limits are module globals)."""
+    import app
+    yield app
+    app.repo.close()
+
+class Customer:
+    """Just the userID, which is all the controller reads from a customer."""
+
+    def __init__(self, userID):
+        self.userID = userID
+
+def ticket(qty=1, visitDate="2027-01-01", parkName="Meadow Basin", ticketName="Adult", price=5.0):
+    return {"ticketName": ticketName, "price": price, "qty": qty, "visitDate": visitDate,
+            "parkName": parkName}
+
+def inParallel(work, count):
+    """Runs work(n) for n in range(count) in threads released together; returns the results."""
+    results = [None] * count
+    start = threading.Barrier(count)
+
+    def run(n):
+        start.wait()
+        results[n] = work(n)
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+# ---------------------------------------------
+# Through the Flask app
+# ---------------------------------------------
+# every client gets an address of its own, so the per-IP buckets of one test do not spill into the next
+addresses = (f"10.0.{n // 250}.{n % 250 + 1}" for n in itertools.count())
+
+def newClient(flaskApp):
+    client = flaskApp.app.test_client()
+    client.environ_base["REMOTE_ADDR"] = next(addresses)
+    return client
+
+def logIn(flaskApp, username, password="pw"):
+    client = newClient(flaskApp)
+    response = client.post("/login", data={"username": username, "password": password})
+    assert response.status_code == 302
+    return client
+
+def registerCustomer(flaskApp):
+    """A newly registered customer (password "pw")."""
+    from models.Customer import Customer as StoredCustomer
+    user = StoredCustomer(flaskApp.auth.nextUserID(), "c-" + uuid.uuid4().hex[:8], "pw", "e", "f", "Adult")
+    assert flaskApp.auth.registerUser(user)
+    return user
+
+@pytest.fixture
+def customer(flaskApp):
+    return registerCustomer(flaskApp)
+
+@pytest.fixture
+def admin(flaskApp):
+    """A newly registered admin (password "pw")."""
+    from models.Admin import Admin
+    user = Admin(flaskApp.auth.nextUserID(), "a-" + uuid.uuid4().hex[:8], "pw", "e", "f")
+    assert flaskApp.auth.registerUser(user)
+    return user
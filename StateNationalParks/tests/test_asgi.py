@@ -0,0 +1,55 @@
+"""The ASGI entry point: importable with the pinned asgiref, and each request runs in its pool."""
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("asgiref")
+
+def call(application, method, path, body=b""):
+    """Sends one request through an ASGI app; returns (status, body)."""
+    scope = {"type": "http", "method": method, "path": path, "root_path": "", "query_string": b"",
+             "http_version": "1.1", "headers": [(b"content-length", str(len(body)).encode())],
+             "server": ("testserver", 80), "client": ("10.9.0.1", 5000)}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start = next(message for message in sent if message["type"] == "http.response.start")
+    return start["status"], b"".join(message.get("body", b"") for message in sent
+                                     if message["type"] == "http.response.body")
+
+@pytest.fixture
+def asgi(flaskApp):
+    import asgi
+    return asgi
+
+def test_flask_app_answers_through_asgi(asgi):
+    status, body = call(asgi.application, "GET", "/metrics")
+
+    assert status == 200 and b"snp_asgi_requests_in_flight" in body
+    assert asgi.application.inFlight == {"read": 0, "write": 0}
+
+def test_reads_and_writes_run_in_their_own_pools(asgi):
+    threads = []
+
+    def wsgiApp(environ, startResponse):
+        threads.append(threading.current_thread().name)
+        startResponse("200 OK", [("Content-Type", "text/plain")])
+        return [b"ok"]
+
+    application = asgi.AsgiApp(wsgiApp, 1, 1)
+    try:
+        assert call(application, "GET", "/") == (200, b"ok")
+        assert call(application, "POST", "/", b"x=1") == (200, b"ok")
+    finally:
+        for pool in application.pools.values():
+            pool.shutdown()
+
+    assert threads[0].startswith("snp-read") and threads[1].startswith("snp-write")
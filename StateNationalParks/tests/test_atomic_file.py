@@ -0,0 +1,94 @@
+"""Atomic JSON writes and the fallback to snapshots when a data file is corrupted."""
+import os
+import stat
+
+import pytest
+
+from conftest import Customer, ticket
+from storage import AtomicFile
+from storage.AtomicFile import CorruptFileError, readJson, snapshotPath, writeJson
+
+def leftovers(folder):
+    return [name for name in os.listdir(folder) if name.endswith(".tmp")]
+
+def test_written_data_reads_back(tmp_path):
+    path = str(tmp_path / "orders.json")
+    writeJson(path, [{"orderID": "ORD1"}])
+    writeJson(path, [{"orderID": "ORD2"}])
+
+    assert readJson(path, []) == [{"orderID": "ORD2"}]
+    assert leftovers(tmp_path) == []
+
+def test_failed_write_leaves_the_old_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "orders.json")
+    writeJson(path, [{"orderID": "ORD1"}])
+
+    def crash(source, target):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        writeJson(path, [{"orderID": "ORD2"}])
+
+    assert readJson(path, []) == [{"orderID": "ORD1"}]
+    assert leftovers(tmp_path) == []
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX file modes")
+def test_file_modes_are_kept_and_the_umask_is_left_alone(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        fresh, shared = str(tmp_path / "new.json"), str(tmp_path / "shared.json")
+        writeJson(shared, [])
+        os.chmod(shared, 0o640)
+
+        writeJson(fresh, [])
+        writeJson(shared, [1])
+
+        assert stat.S_IMODE(os.stat(fresh).st_mode) == AtomicFile.NEW_FILE_MODE
+        assert stat.S_IMODE(os.stat(shared).st_mode) == 0o640
+        assert os.umask(0o022) == 0o022
+    finally:
+        os.umask(umask)
+
+def test_missing_or_empty_file_gives_the_default(tmp_path):
+    (tmp_path / "empty.json").write_bytes(b"  \n")
+
+    assert readJson(str(tmp_path / "missing.json"), []) == []
+    assert readJson(str(tmp_path / "empty.json"), {}) == {}
+
+def test_corrupted_file_falls_back_to_its_snapshot(tmp_path):
+    path, snapshots = str(tmp_path / "orders.json"), str(tmp_path / "snapshots")
+    writeJson(path, [{"orderID": "ORD1"}], snapshotDir=snapshots)
+    (tmp_path / "orders.json").write_bytes(b'[{"orderID": "OR')
+
+    assert readJson(path, [], snapshots) == [{"orderID": "ORD1"}]
+
+def test_corrupted_file_without_a_good_snapshot_is_an_error(tmp_path):
+    path, snapshots = str(tmp_path / "orders.json"), str(tmp_path / "snapshots")
+    writeJson(path, [{"orderID": "ORD1"}], snapshotDir=snapshots)
+    (tmp_path / "orders.json").write_bytes(b"{oops")
+
+    with open(snapshotPath(path, snapshots), "ab") as file:
+        file.write(b" ")     # no longer matches its checksum
+    with pytest.raises(CorruptFileError):
+        readJson(path, [], snapshots)
+    with pytest.raises(CorruptFileError):
+        readJson(path, [])
+
+def test_snapshots_are_taken_at_most_once_per_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(AtomicFile, "lastSnapshot", {})
+    path, snapshots = str(tmp_path / "orders.json"), str(tmp_path / "snapshots")
+
+    writeJson(path, [1], snapshotDir=snapshots, snapshotInterval=3600)
+    writeJson(path, [2], snapshotDir=snapshots, snapshotInterval=3600)
+    (tmp_path / "orders.json").write_bytes(b"[")
+
+    assert readJson(path, [], snapshots) == [1]
+
+def test_repository_loads_from_the_snapshot(openSystem):
+    system = openSystem("json")
+    orderID = system.checkout(Customer("U1"), [dict(ticket(), type="ticket")])["orderID"]
+    system.repo.close()
+    with open("data/orders.json", "wb") as file:
+        file.write(b"[{")
+
+    assert openSystem("json").getOrder(orderID)["customerID"] == "U1"
@@ -0,0 +1,62 @@
+"""Logins: password hashes, their upgrade on login, and user lookups."""
+import pytest
+
+import config
+from models.AuthManager import AuthManager
+from models.Customer import Customer
+from models.PasswordHasher import PasswordHasher
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(iterations=1000, workers=2)
+    yield hasher
+    hasher.close()
+
+@pytest.fixture
+def auth(dataFolder, hasher):
+    auth = AuthManager("data/users.json", hasher=hasher)
+    yield auth
+    auth.repo.close()
+
+def storeUser(auth, password, username="walker"):
+    """Puts a user row as older data has it, without going through registerUser."""
+    user = Customer(auth.nextUserID(), username, password, "e", "f", "Adult")
+    with auth.repo.transaction():
+        auth.repo.put({"users": [user.toDict()]})
+    return user
+
+def test_plaintext_password_is_hashed_on_login(auth, hasher):
+    user = storeUser(auth, "secret")
+
+    assert auth.authenticate("walker", "secret") is not None
+
+    stored = auth.repo.get("users", user.userID)["password"]
+    assert hasher.isHashed(stored) and not hasher.needsRehash(stored)
+    assert auth.authenticate("walker", "secret") is not None
+    assert auth.authenticate("walker", "wrong") is None
+
+def test_outdated_hash_is_upgraded_on_login(auth, hasher):
+    user = storeUser(auth, PasswordHasher(iterations=500, workers=1).hash("secret"))
+
+    assert auth.authenticate("walker", "secret") is not None
+
+    stored = auth.repo.get("users", user.userID)["password"]
+    assert stored.startswith("pbkdf2_sha256$1000$")
+
+@pytest.mark.parametrize("stored", ["pbkdf2_sha256$abc", "pbkdf2_sha256$", "pbkdf2_sha256$x$c2FsdA==$aGFzaA==",
+                                    "pbkdf2_sha256$1000$not base64!$aGFzaA==", "scrypt$1$2"])
+def test_malformed_hash_rejects_the_login(auth, hasher, stored):
+    assert not hasher.verify("secret", stored)
+
+    storeUser(auth, stored)
+    assert auth.authenticate("walker", "secret") is None
+
+def test_unknown_names_refresh_the_storage_at_most_once_per_interval(auth, monkeypatch):
+    refreshes = []
+    monkeypatch.setattr(auth.repo, "refresh", lambda: refreshes.append(1))
+    monkeypatch.setattr(config, "USER_REFRESH_SECONDS", 60)
+
+    for _ in range(5):
+        assert auth.authenticate("nobody", "secret") is None
+
+    assert len(refreshes) == 1
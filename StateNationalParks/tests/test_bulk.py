@@ -0,0 +1,126 @@
+"""Bulk import and export (tools/bulk.py)."""
+import csv
+import json
+import os
+
+import pytest
+
+import config
+from tools import bulk
+
+@pytest.fixture
+def connected(dataFolder):
+    system, auth = bulk.connect()
+    yield system, auth
+    system.repo.close()
+
+def writeCsv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+def writeJsonLines(path, records):
+    with open(path, "w", encoding="utf-8") as file:
+        file.writelines(json.dumps(record) + "\n" for record in records)
+    return path
+
+def importUser(connected, username="bob"):
+    system, auth = connected
+    bulk.importFile("users", writeCsv("users.csv", [{"username": username, "password": "pw", "email": "e",
+                                                     "fullName": "f", "customerType": "Adult", "isAdmin": ""}]),
+                    system=system, auth=auth)
+    return auth.repo.find("users", "username", username)[0]["userID"]
+
+def line(parkName="Meadow Basin", qty=2, ticketName="Adult"):
+    return {"type": "ticket", "ticketName": ticketName, "price": 5, "qty": qty, "visitDate": "2027-01-01",
+            "parkName": parkName}
+
+def test_users_are_hashed_and_duplicates_rejected(connected):
+    system, auth = connected
+    rows = [{"username": "ann", "password": "secret", "email": "a@x", "fullName": "Ann", "customerType": "Adult",
+             "isAdmin": "true"},
+            {"username": "ann", "password": "other", "email": "", "fullName": "", "customerType": "", "isAdmin": ""},
+            {"username": "cid", "password": "", "email": "", "fullName": "", "customerType": "", "isAdmin": ""}]
+
+    summary = bulk.importFile("users", writeCsv("users.csv", rows), system=system, auth=auth, batchSize=2)
+
+    assert summary["users"] == 1
+    assert [rejected["record"] for rejected in summary["rejected"]] == [2, 3]
+    assert auth.hasher.isHashed(auth.repo.find("users", "username", "ann")[0]["password"])
+    assert auth.authenticate("ann", "secret").isAdmin
+
+def test_orders_are_imported_in_batches(connected):
+    system, auth = connected
+    userID = importUser(connected)
+    records = [{"customerID": userID, "date": "2026-05-01", "items": [line()]},
+               {"customerID": "NOPE", "date": "2026-05-01", "items": [line()]},
+               {"customerID": userID, "date": "2026-07-01", "items": [line("Atlantis")]},
+               {"customerID": userID, "date": "2026-07-02",
+                "items": [line("Sunset Ridge"), {"type": "merch", "name": "Tote Bag", "qty": 1}]}]
+
+    summary = bulk.importFile("orders", writeJsonLines("orders.jsonl", records), system=system, auth=auth,
+                              batchSize=2)
+
+    assert (summary["orders"], summary["items"]) == (2, 3)
+    assert [rejected["record"] for rejected in summary["rejected"]] == [2, 3]
+    assert [order["date"][:10] for order in system.getOrdersByCustomer(userID)] == ["2026-05-01", "2026-07-02"]
+    assert system.ticketAvailability("Meadow Basin", "2027-01-01", "Adult") == \
+        config.PARK_CAPACITY.get("Meadow Basin", config.DEFAULT_DAILY_CAPACITY) - 2
+    assert system.repo.get("catalog", "totebag")["stock"] == 49
+    assert system.getDashboard()["totalOrders"] == 2
+
+def test_ticket_rows_with_one_order_ref_are_one_order(connected):
+    system, auth = connected
+    userID = importUser(connected)
+    def row(orderRef, ticketName="Adult"):
+        flat = dict(line(ticketName=ticketName), customerID=userID, orderRef=orderRef)
+        del flat["type"]
+        return flat
+    rows = [row("A"), row("A", "Child"), row("")]
+
+    summary = bulk.importFile("tickets", writeCsv("tickets.csv", rows), system=system, auth=auth)
+
+    assert (summary["orders"], summary["items"]) == (2, 3)
+
+def test_import_over_the_capacity_is_rejected(connected):
+    system, auth = connected
+    userID = importUser(connected)
+    capacity = system.ticketAvailability("Meadow Basin", "2027-01-01", "Adult")
+    records = [{"customerID": userID, "items": [line(qty=capacity)]},
+               {"customerID": userID, "items": [line(qty=1)]}]
+
+    summary = bulk.importFile("orders", writeJsonLines("orders.jsonl", records), system=system, auth=auth)
+
+    assert summary["orders"] == 1 and [rejected["record"] for rejected in summary["rejected"]] == [2]
+    assert system.ticketAvailability("Meadow Basin", "2027-01-01", "Adult") == 0
+
+def test_import_leaves_no_journal_to_replay(connected):
+    system, auth = connected
+    userID = importUser(connected)
+    bulk.importFile("orders", writeJsonLines("orders.jsonl", [{"customerID": userID, "items": [line()]}]),
+                    system=system, auth=auth)
+
+    assert os.path.getsize(system.repo.journal.path) == 0
+    with open(config.DATA_FILES["orders"], encoding="utf-8") as file:
+        assert len(json.load(file)) == 1
+
+def test_export_filters_the_period_and_leaves_out_passwords(connected):
+    system, auth = connected
+    userID = importUser(connected)
+    records = [{"customerID": userID, "date": "2026-05-01", "items": [line()]},
+               {"customerID": userID, "date": "2026-07-01", "items": [line(), line(ticketName="Child")]}]
+    bulk.importFile("orders", writeJsonLines("orders.jsonl", records), system=system, auth=auth)
+
+    assert bulk.exportFile("orders", "orders.csv", system=system, auth=auth) == 2
+    assert bulk.exportFile("tickets", "tickets.jsonl", since="2026-06-01", system=system, auth=auth) == 2
+    with open("orders.csv", newline="", encoding="utf-8") as file:
+        assert [row["items"] for row in csv.DictReader(file)] == ["1", "2"]
+
+    bulk.exportFile("users", "users.jsonl", system=system, auth=auth)
+    bulk.exportFile("users", "secrets.csv", system=system, auth=auth, withPasswords=True)
+    with open("users.jsonl", encoding="utf-8") as file:
+        assert "password" not in file.read()
+    with open("secrets.csv", encoding="utf-8") as file:
+        assert "password" in file.readline()
@@ -0,0 +1,50 @@
+"""Ticket capacity: seats per (park, visit date, ticket type)."""
+import config
+from conftest import Customer, inParallel, ticket
+
+def available(system, visitDate="2027-01-01"):
+    return system.ticketAvailability("Meadow Basin", visitDate, "Adult")
+
+def test_concurrent_ticket_sales_never_overbook(system, monkeypatch):
+    monkeypatch.setattr(config, "DEFAULT_DAILY_CAPACITY", 10)
+
+    results = inParallel(lambda n: system.purchaseTicket(Customer(f"U{n}"), ticket(qty=1)), 25)
+
+    assert results.count(True) == 10
+    assert available(system) == 0
+    assert sum(t["quantity"] for t in system.repo.find("tickets", "parkName", "Meadow Basin")) == 10
+
+def test_ticket_order_larger_than_what_is_left_is_rejected(system, monkeypatch):
+    monkeypatch.setattr(config, "DEFAULT_DAILY_CAPACITY", 3)
+
+    assert system.purchaseTicket(Customer("U1"), ticket(qty=2))
+    assert not system.purchaseTicket(Customer("U2"), ticket(qty=2))
+    assert available(system) == 1
+
+def test_each_date_and_park_has_its_own_seats(system, monkeypatch):
+    monkeypatch.setattr(config, "DEFAULT_DAILY_CAPACITY", 2)
+    monkeypatch.setattr(config, "PARK_CAPACITY", {"Sunset Ridge": 5})
+
+    system.purchaseTicket(Customer("U1"), ticket(qty=2))
+
+    assert available(system) == 0
+    assert available(system, "2027-01-02") == 2
+    assert system.ticketAvailability("Sunset Ridge", "2027-01-01", "Adult") == 5
+
+def test_held_seats_are_not_sold_twice_and_can_be_released(system, monkeypatch):
+    monkeypatch.setattr(config, "DEFAULT_DAILY_CAPACITY", 4)
+    hold = system.capacity.reserve("Meadow Basin", "2027-01-01", "Adult", 3)
+
+    assert hold and available(system) == 1
+    assert system.capacity.reserve("Meadow Basin", "2027-01-01", "Adult", 2) is None
+    system.capacity.release(hold)
+    assert available(system) == 4
+
+def test_cancel_puts_seats_back_on_sale(system, monkeypatch):
+    monkeypatch.setattr(config, "DEFAULT_DAILY_CAPACITY", 2)
+    system.purchaseTicket(Customer("U1"), ticket(qty=2))
+    order = system.getOrdersByCustomer("U1")[0]
+
+    system.cancelTicket(order["orderID"], None)
+
+    assert available(system) == 2
@@ -0,0 +1,65 @@
+"""Checkout of a whole cart, and cancelling the order again."""
+import pytest
+
+from conftest import Customer, logIn, registerCustomer, ticket
+from controllers.SystemController import CheckoutError
+
+cart = [dict(ticket(qty=2), type="ticket"), {"type": "merch", "name": "totebag", "qty": 3}]
+
+def test_checkout_saves_the_whole_order(system):
+    result = system.checkout(Customer("U1"), cart)
+
+    assert result["items"] == 2 and result["total"] == 2 * 5.0 + 3 * 32.0
+    order = system.getOrder(result["orderID"])
+    assert order["customerID"] == "U1" and order["status"] == "active"
+    assert len(system.getOrderItems(result["orderID"])) == 2
+    assert system.repo.get("payments", result["paymentID"])["orderID"] == result["orderID"]
+    assert system.repo.get("receipts", result["receiptID"]) is not None
+    assert system.ticketAvailability("Meadow Basin", "2027-01-01", "Adult") == 98
+    assert system.repo.get("catalog", "totebag")["stock"] == 47
+
+def test_order_survives_a_restart(openSystem):
+    result = openSystem().checkout(Customer("U1"), cart)
+
+    restarted = openSystem()
+    assert restarted.getOrder(result["orderID"])["total"] == result["total"]
+    assert restarted.repo.get("catalog", "totebag")["stock"] == 47
+
+def test_failed_line_saves_nothing(system):
+    orders = system.repo.count("orders")
+    with pytest.raises(CheckoutError):
+        system.checkout(Customer("U1"), cart + [{"type": "merch", "name": "totebag", "qty": 1000}])
+
+    assert system.repo.count("orders") == orders
+    assert system.repo.get("catalog", "totebag")["stock"] == 50
+    assert system.ticketAvailability("Meadow Basin", "2027-01-01", "Adult") == 100
+
+# ---------------------------------------------
+# Through the app
+# ---------------------------------------------
+def test_checkout_through_the_api(flaskApp, customer):
+    client = logIn(flaskApp, customer.username)
+    response = client.post("/api/checkout", json={"items": cart})
+
+    assert response.status_code == 201
+    orders = client.get("/api/orders").get_json()["orders"]
+    assert [order["orderID"] for order in orders] == [response.get_json()["orderID"]]
+
+def test_customers_cancel_only_their_own_orders(flaskApp, customer):
+    stranger = registerCustomer(flaskApp)
+    orderID = flaskApp.system.checkout(customer, cart)["orderID"]
+    form = {"orderID": orderID, "itemID": ""}
+
+    assert logIn(flaskApp, stranger.username).post("/cancel_ticket", data=form).status_code == 403
+    assert flaskApp.system.getOrder(orderID)["status"] == "active"
+
+    # (no templates ship with the app, so the answer itself is not checked)
+    logIn(flaskApp, customer.username).post("/cancel_ticket", data=form)
+    assert flaskApp.system.getOrder(orderID)["status"] == "cancelled"
+
+def test_admins_cancel_any_order(flaskApp, customer, admin):
+    orderID = flaskApp.system.checkout(customer, cart)["orderID"]
+
+    logIn(flaskApp, admin.username).post("/cancel_ticket", data={"orderID": orderID, "itemID": ""})
+
+    assert flaskApp.system.getOrder(orderID)["status"] == "cancelled"
@@ -0,0 +1,50 @@
+import config
+from conftest import Customer, logIn, ticket
+
+def test_retried_purchase_returns_first_result(system):
+    customer = Customer("U1")
+    first = system.purchaseTicket(customer, ticket(qty=2), "key-1")
+    again = system.purchaseTicket(customer, ticket(qty=2), "key-1")
+
+    assert first and again == first
+    assert len(system.getOrdersByCustomer("U1")) == 1
+    assert system.ticketAvailability("Meadow Basin", "2027-01-01", "Adult") == 98
+
+def test_same_key_of_another_customer_is_a_new_purchase(system):
+    system.purchaseTicket(Customer("U1"), ticket(), "key-1")
+    system.purchaseTicket(Customer("U2"), ticket(), "key-1")
+
+    assert len(system.getOrdersByCustomer("U1")) == 1
+    assert len(system.getOrdersByCustomer("U2")) == 1
+
+def test_retry_after_restart_is_found_in_storage(openSystem):
+    cart = [{"type": "merch", "name": "totebag", "qty": 1}, dict(ticket(), type="ticket")]
+    first = openSystem().checkout(Customer("U1"), cart, "key-2")
+
+    # a new process: the in-memory cache is empty, the order row still has the key
+    restarted = openSystem()
+    assert restarted.checkout(Customer("U1"), cart, "key-2") == first
+    assert len(restarted.getOrdersByCustomer("U1")) == 1
+
+# ---------------------------------------------
+# Through the app (the JSON API; the static frontend does not post purchases)
+# ---------------------------------------------
+def test_checkout_sent_twice_with_a_key_buys_once(flaskApp, customer):
+    client = logIn(flaskApp, customer.username)
+    cart = {"items": [dict(ticket(), type="ticket")]}
+
+    first = client.post("/api/checkout", json=cart, headers={"Idempotency-Key": "k-1"})
+    again = client.post("/api/checkout", json=cart, headers={"Idempotency-Key": "k-1"})
+    other = client.post("/api/checkout", json=cart, headers={"Idempotency-Key": "k-2"})
+
+    assert first.status_code == again.status_code == other.status_code == 201
+    assert again.get_json()["orderID"] == first.get_json()["orderID"] != other.get_json()["orderID"]
+    assert len(flaskApp.system.getOrdersByCustomer(customer.userID)) == 2
+
+def test_overlong_key_is_refused(flaskApp, customer):
+    client = logIn(flaskApp, customer.username)
+    response = client.post("/api/checkout", json={"items": [dict(ticket(), type="ticket")]},
+                           headers={"Idempotency-Key": "k" * (config.IDEMPOTENCY_KEY_MAX + 1)})
+
+    assert response.status_code == 400
+    assert flaskApp.system.getOrdersByCustomer(customer.userID) == []
@@ -0,0 +1,36 @@
+"""IDAllocator: IDs are never handed out twice, across threads, processes and restarts."""
+from conftest import Customer, inParallel, ticket
+from storage.IDAllocator import IDAllocator
+
+def test_threads_never_get_the_same_id(dataFolder):
+    ids = IDAllocator("data/counters.json", blockSize=7)
+
+    batches = inParallel(lambda n: [ids.next("T") for _ in range(50)], 8)
+
+    every = [ID for batch in batches for ID in batch]
+    assert len(set(every)) == len(every) == 400
+
+def test_allocators_sharing_the_counter_file_never_collide(dataFolder):
+    # two processes: each reserves blocks of its own under the file lock
+    first, second = IDAllocator("data/counters.json", 5), IDAllocator("data/counters.json", 5)
+
+    taken = [allocator.next("ORD") for _ in range(12) for allocator in (first, second)]
+
+    assert len(set(taken)) == len(taken)
+
+def test_ids_continue_after_the_stored_ones(dataFolder):
+    ids = IDAllocator("data/counters.json")
+    ids.register("R", lambda: 41)
+
+    assert ids.nextBatch("R", 3) == ["R42", "R43", "R44"]
+
+def test_ids_are_not_reused_after_a_crash(openSystem):
+    crashed = openSystem()
+    crashed.purchaseTicket(Customer("U1"), ticket())
+    before = {order["orderID"] for order in crashed.getOrdersByCustomer("U1")}
+
+    restarted = openSystem()
+    restarted.purchaseTicket(Customer("U1"), ticket())
+    after = {order["orderID"] for order in restarted.getOrdersByCustomer("U1")}
+
+    assert len(after) == 2 and before < after
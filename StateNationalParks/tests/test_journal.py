@@ -0,0 +1,48 @@
+"""The journal storage mode: every change is one appended line, replayed at load."""
+from conftest import Customer, ticket
+
+def test_changes_survive_a_crash(openSystem):
+    crashed = openSystem()
+    for n in range(5):
+        assert crashed.purchaseTicket(Customer("U1"), ticket(qty=1, price=4.0))
+    orderIDs = {order["orderID"] for order in crashed.getOrdersByCustomer("U1")}
+    # no close(): the data files were never rewritten, only the journal holds the sales
+
+    restarted = openSystem()
+
+    assert {order["orderID"] for order in restarted.getOrdersByCustomer("U1")} == orderIDs
+    assert restarted.ticketAvailability("Meadow Basin", "2027-01-01", "Adult") == 95
+    assert restarted.statistic.totalRevenue == crashed.statistic.totalRevenue
+
+def test_replaying_a_record_twice_is_harmless(openSystem, dataFolder):
+    system = openSystem()
+    system.purchaseTicket(Customer("U1"), ticket(qty=3))
+
+    # a crash between writing the files and truncating the journal replays it again
+    journal = dataFolder / "data" / "journal.log"
+    journal.write_text(journal.read_text() * 2)
+
+    restarted = openSystem()
+    assert len(restarted.getOrdersByCustomer("U1")) == 1
+    assert restarted.ticketAvailability("Meadow Basin", "2027-01-01", "Adult") == 97
+
+def test_a_torn_last_line_is_ignored(openSystem, dataFolder):
+    system = openSystem()
+    system.purchaseTicket(Customer("U1"), ticket(qty=2))
+
+    # the process died in the middle of writing the next record
+    with open(dataFolder / "data" / "journal.log", "a") as journal:
+        journal.write('{"put": {"orders": [{"orderID": "ORD')
+
+    restarted = openSystem()
+    assert len(restarted.getOrdersByCustomer("U1")) == 1
+    assert restarted.ticketAvailability("Meadow Basin", "2027-01-01", "Adult") == 98
+
+def test_a_put_is_one_appended_line(system, dataFolder):
+    orders = dataFolder / "data" / "orders.json"
+    before = orders.read_bytes()
+
+    system.purchaseTicket(Customer("U1"), ticket())
+
+    assert orders.read_bytes() == before
+    assert len((dataFolder / "data" / "journal.log").read_text().splitlines()) == 1
@@ -0,0 +1,104 @@
+"""LazyRows: rows of a JSON array file parsed only when they are read."""
+import json
+import os
+
+import pytest
+
+from storage.AtomicFile import writeJson
+from storage.JsonRepository import JsonRepository
+from storage.LazyRows import LazyRows
+
+rows = [{"orderID": f"ORD{n}", "customerID": f"U{n % 3}", "note": "x" * (n * 7)} for n in range(40)]
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "orders.json")
+    writeJson(path, rows)
+    return path
+
+def scan(path):
+    seen = []
+    lazy = LazyRows.scan(path, lambda position, row: seen.append((position, row["orderID"])))
+    return lazy, seen
+
+def test_scan_visits_every_row_and_parses_none(path):
+    lazy, seen = scan(path)
+
+    assert seen == [(n, row["orderID"]) for n, row in enumerate(rows)]
+    assert len(lazy) == len(rows) and lazy.rows == {}
+    lazy.close()
+
+def test_rows_are_parsed_once_when_read(path):
+    lazy, _ = scan(path)
+
+    assert lazy[5] == rows[5] and lazy[-1] == rows[-1]
+    assert lazy[5] is lazy[5]
+    assert sorted(lazy.rows) == [5, len(rows) - 1]
+    assert list(lazy) == rows
+    lazy.close()
+
+def test_records_across_chunk_borders(path, monkeypatch):
+    monkeypatch.setattr(LazyRows, "CHUNK", 64)
+    lazy, seen = scan(path)
+
+    assert len(seen) == len(rows) and list(lazy) == rows
+    lazy.close()
+
+def test_dump_matches_json_dumps_and_copies_untouched_rows(path):
+    lazy, _ = scan(path)
+    lazy[3] = dict(rows[3], status="cancelled")
+    lazy.append({"orderID": "ORD99"})
+    expected = list(rows)
+    expected[3] = lazy[3]
+    expected.append({"orderID": "ORD99"})
+
+    assert lazy.dumpJson() == json.dumps(expected, indent=4)
+    assert sorted(lazy.rows) == [3]
+    lazy.close()
+
+def test_copy_is_not_changed_by_later_writes(path):
+    lazy, _ = scan(path)
+    copy = lazy.copy()
+
+    lazy[0] = {"orderID": "changed"}
+    lazy.append({"orderID": "new"})
+
+    assert copy[0] == rows[0] and len(copy) == len(rows)
+    lazy.close()
+
+@pytest.mark.skipif(os.name == "nt", reason="an open file cannot be replaced on Windows")
+def test_rows_keep_reading_the_file_that_was_scanned(path):
+    lazy, _ = scan(path)
+    writeJson(path, [{"orderID": "other"}])
+
+    assert lazy[1] == rows[1]
+    lazy.close()
+
+@pytest.mark.parametrize("body", ['{"orderID": "ORD1"}', '[{"orderID": "café"}]', "[1, 2]"])
+def test_files_that_cannot_be_scanned_are_refused(tmp_path, body):
+    path = tmp_path / "orders.json"
+    path.write_text(body, encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        LazyRows.scan(str(path), lambda position, row: None)
+
+def test_repository_indexes_a_lazily_loaded_file(path):
+    repo = JsonRepository({"orders": path}, lockPath=path + ".lock", lazyMinBytes=1)
+    repo.load()
+
+    assert isinstance(repo.data["orders"], LazyRows)
+    assert [row["orderID"] for row in repo.find("orders", "customerID", "U1")] == \
+        [row["orderID"] for row in rows if row["customerID"] == "U1"]
+    assert repo.get("orders", "ORD7") == rows[7]
+    repo.close()
+
+def test_repository_loads_other_files_eagerly(tmp_path):
+    path = tmp_path / "orders.json"
+    path.write_text(json.dumps(rows + [{"orderID": "ORD99", "customerID": "U1"}], ensure_ascii=False)
+                    .replace('"ORD99"', '"ORD99", "note": "café"'), encoding="utf-8")
+    repo = JsonRepository({"orders": str(path)}, lockPath=str(path) + ".lock", lazyMinBytes=1)
+    repo.load()
+
+    assert isinstance(repo.data["orders"], list)
+    assert repo.get("orders", "ORD99")["note"] == "café"
+    repo.close()
@@ -0,0 +1,47 @@
+"""Merchandise catalog and stock ledger."""
+from conftest import Customer, inParallel
+
+def stock(system, catalogID="totebag"):
+    return system.catalog.findItem(catalogID)["stock"]
+
+def test_concurrent_merch_sales_never_oversell(system):
+    start = stock(system)
+
+    results = inParallel(lambda n: system.purchaseMerch(Customer(f"U{n}"), {"name": "totebag", "qty": 1}),
+                         start + 10)
+
+    assert results.count(True) == start
+    assert stock(system) == 0
+
+def test_price_and_category_come_from_the_catalog(system):
+    item = system.catalog.findItem("totebag")
+
+    assert system.purchaseMerch(Customer("U1"), {"name": "Tote Bag", "qty": 2, "unitPrice": 0.01})
+
+    row = system.repo.all("merch")[-1]
+    assert (row["catalogID"], row["quantity"], row["unitPrice"], row["category"]) == \
+        ("totebag", 2, item["unitPrice"], item["category"])
+    assert stock(system) == item["stock"] - 2
+
+def test_unknown_item_or_short_stock_changes_nothing(system):
+    start, sold = stock(system), len(system.repo.all("merch"))
+
+    assert not system.purchaseMerch(Customer("U1"), {"name": "nothing", "qty": 1})
+    assert not system.purchaseMerch(Customer("U1"), {"name": "totebag", "qty": start + 1})
+    assert stock(system) == start and len(system.repo.all("merch")) == sold
+
+def test_cancel_restocks(system):
+    start = stock(system)
+    system.purchaseMerch(Customer("U1"), {"name": "totebag", "qty": 3})
+
+    system.cancelTicket(system.getOrdersByCustomer("U1")[0]["orderID"], None)
+
+    assert stock(system) == start
+
+def test_a_sale_does_not_rewrite_the_merchandise_file(system, dataFolder):
+    merchandise = dataFolder / "data" / "merchandise.json"
+    before = merchandise.read_bytes()
+
+    system.purchaseMerch(Customer("U1"), {"name": "totebag", "qty": 1})
+
+    assert merchandise.read_bytes() == before
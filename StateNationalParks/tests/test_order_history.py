@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import Customer, ticket
+from storage.JsonRepository import JsonRepository
+
+def pages(system, **filters):
+    """Every page of getOrderHistory, followed through nextCursor."""
+    result, cursor = [], None
+    while True:
+        page = system.getOrderHistory(cursor=cursor, limit=3, **filters)
+        result.append([order["orderID"] for order in page["orders"]])
+        cursor = page["nextCursor"]
+        if cursor is None:
+            return result
+
+@pytest.fixture
+def sales(system):
+    for n in range(10):
+        system.purchaseTicket(Customer("U1" if n % 2 else "U2"), ticket(visitDate=f"2027-01-{n + 1:02d}"))
+    return [order["orderID"] for order in system.repo.all("orders")[-10:]]
+
+def test_pages_cover_every_order_once_newest_first(system, sales):
+    mine = [orderID for n, orderID in enumerate(sales) if n % 2]
+    result = pages(system, customerID="U1")
+
+    assert [orderID for page in result for orderID in page] == mine[::-1]
+    assert all(len(page) <= 3 for page in result)
+
+def test_oldest_first(system, sales):
+    mine = [orderID for n, orderID in enumerate(sales) if n % 2 == 0]
+    assert [orderID for page in pages(system, customerID="U2", sort="oldest") for orderID in page] == mine
+
+def test_status_filter_stays_in_storage_order_after_updates(system, sales):
+    # cancelling and so moving rows between status buckets must not reorder them
+    for orderID in sales[2:5]:
+        system.cancelTicket(orderID, None)
+
+    cancelled = [orderID for page in pages(system, status="cancelled", sort="oldest") for orderID in page]
+    active = [orderID for page in pages(system, status="active") for orderID in page]
+
+    assert cancelled[-3:] == sales[2:5]
+    assert [orderID for orderID in active if orderID in sales] == \
+        [orderID for orderID in sales[::-1] if orderID not in sales[2:5]]
+
+def test_filtered_page_only_reads_its_rows(dataFolder):
+    files = {"orders": "data/orders.json", "statistics": "data/statistics.json"}
+    writer = JsonRepository(files)
+    writer.load()
+    writer.put({"orders": [{"orderID": f"ORD{n}", "customerID": f"U{n % 3}", "date": "2026-05-01",
+                            "status": "active"} for n in range(1, 301)]})
+
+    lazy = JsonRepository(files, lazyMinBytes=1)
+    lazy.load()
+    first = lazy.page("orders", None, 5, field="customerID", value="U1")
+    after = lazy.page("orders", first[-1]["orderID"], 5, descending=True, field="customerID", value="U1")
+    following = lazy.page("orders", first[-1]["orderID"], 5, field="customerID", value="U1")
+
+    assert [row["orderID"] for row in first] == ["ORD1", "ORD4", "ORD7", "ORD10", "ORD13"]
+    assert [row["orderID"] for row in after] == ["ORD10", "ORD7", "ORD4", "ORD1"]
+    assert [row["orderID"] for row in following] == ["ORD16", "ORD19", "ORD22", "ORD25", "ORD28"]
+    # only the rows returned were parsed, not the whole bucket
+    assert len(lazy.data["orders"].rows) <= 10
+    lazy.close()
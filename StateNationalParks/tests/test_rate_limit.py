@@ -0,0 +1,60 @@
+"""Rate limits: the limiters themselves, and the 429 answers of the login form."""
+import time
+
+import config
+from conftest import logIn, newClient
+from storage.RateLimiter import ConcurrencyLimiter, TokenBucketLimiter
+
+# ---------------------------------------------
+# Limiters
+# ---------------------------------------------
+def test_bucket_refuses_past_the_burst_and_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    limiter = TokenBucketLimiter(rate=0.5, burst=2)
+
+    assert limiter.take("ip") == 0.0 and limiter.take("ip") == 0.0
+    assert limiter.take("ip") == 2.0
+    assert limiter.take("other") == 0.0
+
+    now[0] += 2
+    assert limiter.take("ip") == 0.0
+
+def test_least_recently_used_bucket_is_dropped():
+    limiter = TokenBucketLimiter(rate=0.001, burst=1, maxKeys=2)
+    limiter.take("a")
+    limiter.take("b")
+    limiter.take("c")
+
+    assert list(limiter.buckets) == ["b", "c"]
+
+def test_concurrency_limiter_refuses_beyond_the_queue():
+    limiter = ConcurrencyLimiter(limit=1, queueSize=0)
+    assert limiter.acquire()
+    assert not limiter.acquire()
+
+    limiter.release()
+    assert limiter.acquire()
+
+# ---------------------------------------------
+# Login
+# ---------------------------------------------
+def test_login_attempts_over_the_limit_get_429(flaskApp, customer):
+    client = newClient(flaskApp)
+    limit = config.RATE_LIMITS["login"]["perUser"][1]
+    form = {"username": customer.username, "password": "wrong"}
+
+    for _ in range(limit):
+        assert client.post("/login", data=form).status_code != 429
+    response = client.post("/login", data=form)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+def test_other_users_are_not_limited(flaskApp, customer, admin):
+    client = newClient(flaskApp)
+    form = {"username": customer.username, "password": "wrong"}
+    while client.post("/login", data=form).status_code != 429:
+        pass
+
+    assert logIn(flaskApp, admin.username).get("/api/admin/storage").status_code == 200
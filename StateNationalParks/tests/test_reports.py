@@ -0,0 +1,75 @@
+"""Admin reports (ReportBuilder): numbers, periods and the incremental update."""
+from datetime import date, timedelta
+
+from conftest import Customer, logIn, ticket
+from controllers.ReportBuilder import ReportBuilder
+from models.Admin import Admin
+
+moderator = Admin("U-moderator", "moderator", "pw", "e", "f")
+
+def buy(system, customerID, **line):
+    return system.checkout(Customer(customerID), [dict(ticket(**line), type="ticket")])["orderID"]
+
+def withoutTiming(report):
+    return dict(report, millis=None)
+
+def test_ticket_and_merch_numbers(system):
+    buy(system, "U1", qty=2, price=5.0)
+    buy(system, "U2", qty=1, price=8.0, parkName="Pine Ridge", ticketName="Senior")
+    system.checkout(Customer("U3"), [{"type": "merch", "name": "totebag", "qty": 10}])
+
+    report = system.getReports()
+
+    tickets = report["tickets"]
+    assert (tickets["quantity"], tickets["revenue"]) == (3, 18.0)
+    assert tickets["byPark"]["Meadow Basin"] == {"quantity": 2, "revenue": 10.0}
+    assert tickets["byTicketType"]["Senior"] == {"quantity": 1, "revenue": 8.0}
+    accessories = report["merch"]["byCategory"]["Accessories"]
+    assert accessories["sold"] == 10 and accessories["revenue"] == 320.0
+    assert abs(accessories["sellThrough"] - 10 / (10 + accessories["stock"])) < 0.01
+
+def test_cancelled_orders_are_left_out_and_counted(system):
+    buy(system, "U1", qty=2)
+    cancelled = buy(system, "U2", qty=5)
+
+    system.cancelTicket(cancelled, None)
+    report = system.getReports()
+
+    assert report["orders"]["total"] == 2 and report["orders"]["cancelled"] == 1
+    assert report["orders"]["cancellationRate"] == 0.5
+    assert report["tickets"]["quantity"] == 2
+
+def test_period_limits_the_sale_dates(system):
+    buy(system, "U1")
+    today = date.today()
+
+    assert system.getReports(since=str(today), until=str(today))["orders"]["total"] == 1
+    assert system.getReports(since=str(today + timedelta(days=1)))["orders"]["total"] == 0
+    assert system.getReports(until=str(today - timedelta(days=1)))["tickets"]["quantity"] == 0
+
+def test_incremental_report_equals_a_rebuild(system):
+    # orders and reviews added and then changed between two reports included
+    system.getReports()     # builds the columns; later changes are merged in
+    orderIDs = [buy(system, f"U{n % 3}", qty=n % 4 + 1, parkName=["Meadow Basin", "Pine Ridge"][n % 2])
+                for n in range(12)]
+    system.checkout(Customer("U1"), [{"type": "merch", "name": "keychain", "qty": 3}])
+    system.getReports()
+    for orderID in orderIDs[::4]:
+        system.cancelTicket(orderID, None)
+    system.submitReview({"customerID": "U1", "rating": 4, "comment": "fine"})
+    reviewID = system.getModerationQueue(limit=100)["reviews"][-1]["reviewID"]
+    system.moderateReview(moderator, reviewID)
+
+    incremental = system.getReports()
+    rebuilt = ReportBuilder(system.repo).generate()
+
+    assert withoutTiming(incremental) == withoutTiming(rebuilt)
+    assert incremental["ratings"]["count"] == 1
+
+def test_reports_are_for_admins(flaskApp, customer, admin):
+    assert logIn(flaskApp, customer.username).get("/api/admin/reports").status_code == 403
+
+    response = logIn(flaskApp, admin.username).get(f"/api/admin/reports?from={date.today()}")
+
+    assert response.status_code == 200
+    assert response.get_json()["period"] == {"from": str(date.today()), "to": None}
@@ -0,0 +1,100 @@
+"""ResponseCache and the @cached views: ETags, 304 answers and invalidation."""
+import time
+
+from conftest import Customer, logIn, newClient, ticket
+from storage.ResponseCache import ResponseCache
+
+# ---------------------------------------------
+# ResponseCache
+# ---------------------------------------------
+def test_entries_expire_after_the_ttl(monkeypatch):
+    cache = ResponseCache(ttl=30)
+    entry = cache.put("page", b"body", "text/html")
+    assert cache.get("page") is entry
+
+    monkeypatch.setattr(time, "monotonic", lambda: entry.expires)
+    assert cache.get("page") is None
+
+def test_least_recently_used_entry_is_dropped():
+    cache = ResponseCache(maxEntries=2)
+    cache.put("a", b"a", "text/plain")
+    cache.put("b", b"b", "text/plain")
+    cache.get("a")
+
+    cache.put("c", b"c", "text/plain")
+
+    assert cache.get("a") is not None and cache.get("b") is None
+
+def test_invalidate_drops_the_entries_of_changed_collections_only():
+    cache = ResponseCache()
+    cache.put("availability", b"1", "application/json", ["capacity"])
+    cache.put("catalog", b"2", "application/json", ["catalog"])
+
+    cache.invalidate(["capacity"])
+
+    assert cache.get("availability") is None
+    assert cache.get("catalog") is not None
+
+def test_response_built_during_a_change_is_not_stored():
+    cache = ResponseCache()
+    generation = cache.generation(["capacity"])
+    cache.invalidate(["capacity"])      # committed while the view was running
+
+    cache.put("availability", b"stale", "application/json", ["capacity"], generation)
+
+    assert cache.get("availability") is None
+
+def test_same_body_has_the_same_etag():
+    cache = ResponseCache()
+    assert cache.put("a", b"body", "text/plain").etag == cache.put("b", b"body", "text/plain").etag
+    assert cache.put("c", b"other", "text/plain").etag != cache.get("a").etag
+
+# ---------------------------------------------
+# Through the app
+# ---------------------------------------------
+def availability(client, parkName, **headers):
+    return client.get(f"/api/availability?parkName={parkName}&visitDate=2027-03-01&ticketName=Adult",
+                      headers=headers)
+
+def test_unchanged_page_is_answered_with_304(flaskApp):
+    client = newClient(flaskApp)
+    first = availability(client, "Cedar Falls")
+    assert first.status_code == 200 and first.headers["ETag"]
+
+    again = availability(client, "Cedar Falls", **{"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304 and again.data == b""
+
+def test_purchase_invalidates_the_cached_availability(flaskApp):
+    client = newClient(flaskApp)
+    first = availability(client, "Pine Ridge")
+    seats = first.get_json()["available"]
+
+    flaskApp.system.checkout(Customer("U1"), [dict(ticket(qty=2, parkName="Pine Ridge", visitDate="2027-03-01"),
+                                                   type="ticket")])
+    again = availability(client, "Pine Ridge", **{"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 200
+    assert again.get_json()["available"] == seats - 2
+    assert again.headers["ETag"] != first.headers["ETag"]
+
+def test_static_frontend_files_are_revalidated(flaskApp):
+    client = newClient(flaskApp)
+    first = client.get("/frontend/styles.css")
+    assert first.status_code == 200
+
+    again = client.get("/frontend/styles.css", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304
+
+def test_cached_admin_pages_are_not_served_to_customers(flaskApp, customer, admin):
+    assert logIn(flaskApp, admin.username).get("/api/admin/dashboard").status_code == 200
+    assert logIn(flaskApp, customer.username).get("/api/admin/dashboard").status_code == 403
+
+def test_cached_dashboard_follows_sales(flaskApp, admin):
+    client = logIn(flaskApp, admin.username)
+    orders = client.get("/api/admin/dashboard").get_json()["totalOrders"]
+
+    flaskApp.system.checkout(Customer("U1"), [dict(ticket(), type="ticket")])
+
+    assert client.get("/api/admin/dashboard").get_json()["totalOrders"] == orders + 1
@@ -0,0 +1,83 @@
+"""ReviewIndex: search, rating summaries and the moderation queue."""
+from controllers.SystemController import SystemController
+from models.Admin import Admin
+
+moderator = Admin("U-moderator", "moderator", "pw", "e", "f")
+
+def submit(system, comment, rating=5, parkName="Meadow Basin"):
+    system.submitReview({"customerID": "U1", "rating": rating, "comment": comment, "parkName": parkName})
+    return system.getModerationQueue(limit=100)["reviews"][-1]["reviewID"]
+
+def test_pending_reviews_are_neither_searched_nor_rated(system):
+    before = system.getRatingSummary("Meadow Basin")
+    reviewID = submit(system, "Quiet trails by the lake", rating=1)
+
+    assert system.searchReviews("lake trails")["total"] == 0
+    assert system.getRatingSummary("Meadow Basin") == before
+    assert reviewID in [row["reviewID"] for row in system.getModerationQueue(limit=100)["reviews"]]
+
+    system.moderateReview(moderator, reviewID)
+
+    found = system.searchReviews("lake trails")
+    assert [row["reviewID"] for row in found["reviews"]] == [reviewID]
+    assert system.getRatingSummary("Meadow Basin")["count"] == before["count"] + 1
+    assert reviewID not in [row["reviewID"] for row in system.getModerationQueue(limit=100)["reviews"]]
+
+def test_hidden_reviews_drop_out_again(system):
+    reviewID = submit(system, "Rangers were great")
+    system.moderateReview(moderator, reviewID)
+    rated = system.getRatingSummary()["count"]
+
+    system.moderateReview(moderator, reviewID, approve=False)
+
+    assert system.searchReviews("rangers")["total"] == 0
+    assert system.getRatingSummary()["count"] == rated - 1
+
+def test_ratings_agree_with_the_reports(system):
+    for rating in (1, 4, 5):
+        reviewID = submit(system, "nice view", rating=rating)
+        if rating > 1:
+            system.moderateReview(moderator, reviewID)
+    submit(system, "still pending", rating=2)
+
+    summary = system.getRatingSummary()
+    report = system.getReports()["ratings"]
+
+    assert (summary["count"], summary["average"], summary["distribution"]) == \
+        (report["count"], report["average"], report["distribution"])
+
+def test_search_filters_by_park_and_rating(system):
+    for comment, rating, park in [("sunny canyon walk", 5, "Meadow Basin"),
+                                  ("windy canyon walk", 2, "Meadow Basin"),
+                                  ("canyon walk with kids", 4, "Elsewhere")]:
+        system.moderateReview(moderator, submit(system, comment, rating, park))
+
+    assert system.searchReviews("canyon walk")["total"] == 3
+    assert system.searchReviews("canyon walk", parkName="Meadow Basin")["total"] == 2
+    found = system.searchReviews("canyon walk", parkName="Meadow Basin", minRating=4)
+    assert [row["comment"] for row in found["reviews"]] == ["sunny canyon walk"]
+
+def test_moderation_queue_pages_oldest_first(system):
+    submitted = [submit(system, f"review {n}") for n in range(5)]
+    pending = system.getModerationQueue(limit=100)["reviews"]
+    older = [row["reviewID"] for row in pending][:-5]
+
+    seen, after = [], None
+    while True:
+        page = system.getModerationQueue(after, limit=2)
+        seen += [row["reviewID"] for row in page["reviews"]]
+        after = page["nextCursor"]
+        if after is None:
+            break
+
+    assert seen == older + submitted
+
+def test_reviews_of_other_workers_are_picked_up(openSystem):
+    first, second = openSystem(), openSystem()
+    second.reviews.catchUpEvery = 0
+    second.searchReviews("anything")      # builds the index
+
+    reviewID = submit(first, "spotted a moose")
+    first.moderateReview(moderator, reviewID)
+
+    assert [row["reviewID"] for row in second.searchReviews("moose")["reviews"]] == [reviewID]
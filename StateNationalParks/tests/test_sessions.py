@@ -0,0 +1,77 @@
+"""Server-side sessions: SessionStore, and logins / admin checks through the app."""
+import time
+
+from conftest import logIn
+from storage.SessionStore import SessionStore, SqliteSessionBackend
+
+# ---------------------------------------------
+# SessionStore
+# ---------------------------------------------
+def test_sessions_expire(monkeypatch):
+    store = SessionStore(ttl=60)
+    entry = store.create({"userID": "U1"})
+    assert store.get(entry.sid) is entry
+
+    monkeypatch.setattr(time, "time", lambda: entry.expires + 1)
+    assert store.get(entry.sid) is None
+
+def test_least_recently_used_session_is_dropped():
+    store = SessionStore(maxEntries=2)
+    first, second = store.create({"userID": "U1"}), store.create({"userID": "U2"})
+    store.get(first.sid)
+
+    store.create({"userID": "U3"})
+
+    assert store.get(first.sid) is first
+    assert store.get(second.sid) is None
+
+def test_a_shared_backend_sees_revocations_of_other_workers(dataFolder):
+    # two workers, one session database
+    here = SessionStore(backend=SqliteSessionBackend("data/sessions.db"), recheck=0)
+    there = SessionStore(backend=SqliteSessionBackend("data/sessions.db"), recheck=0)
+    entry = here.create({"userID": "U1"})
+    assert there.get(entry.sid).userID == "U1"
+
+    here.revokeUser("U1")
+
+    assert there.get(entry.sid) is None
+
+# ---------------------------------------------
+# Through the app
+# ---------------------------------------------
+def test_revoked_sessions_are_logged_out(flaskApp, customer, admin):
+    phone, laptop = logIn(flaskApp, customer.username), logIn(flaskApp, customer.username)
+    assert phone.get("/api/orders").status_code == 200
+
+    response = logIn(flaskApp, admin.username).post("/api/admin/sessions/revoke",
+                                                   json={"userID": customer.userID})
+
+    assert response.status_code == 200 and response.get_json()["revoked"] == 2
+    assert phone.get("/api/orders").status_code == 401
+    assert laptop.get("/api/orders").status_code == 401
+
+def test_only_admins_revoke_sessions(flaskApp, customer):
+    client = logIn(flaskApp, customer.username)
+    assert client.post("/api/admin/sessions/revoke", json={"userID": customer.userID}).status_code == 403
+    assert client.get("/api/orders").status_code == 200
+
+def test_demoted_admin_loses_access_at_once(flaskApp, admin):
+    client = logIn(flaskApp, admin.username)
+    assert client.get("/api/admin/storage").status_code == 200
+
+    row = dict(flaskApp.repo.get("users", admin.userID), isAdmin=False)
+    with flaskApp.repo.transaction():
+        flaskApp.repo.put({"users": [row]})
+
+    assert client.get("/api/admin/storage").status_code == 403
+
+def test_pages_for_everyone_do_not_reload_the_user(flaskApp, customer, monkeypatch):
+    client = logIn(flaskApp, customer.username)
+    reloads = []
+    # reloadUser catches up with the storage under its write lock
+    monkeypatch.setattr(flaskApp.auth, "reloadUser", reloads.append)
+
+    client.get("/dashboard")
+    client.get("/api/orders")
+
+    assert reloads == []
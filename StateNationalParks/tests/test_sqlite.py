@@ -0,0 +1,89 @@
+"""The SQLite backend: writes, rollbacks and the migration from the JSON files."""
+import json
+
+import pytest
+
+from conftest import Customer, ticket
+from storage.SqliteRepository import SqliteRepository
+from tools.migrate import migrate
+
+@pytest.fixture
+def repo(dataFolder):
+    repo = SqliteRepository("data/parks.db")
+    repo.load()
+    yield repo
+    repo.close()
+
+def order(orderID, customerID="U1", status="active"):
+    return {"orderID": orderID, "customerID": customerID, "status": status, "date": "2027-01-01"}
+
+def test_put_is_found_by_key_index_and_page(repo):
+    repo.put({"orders": [order("ORD1"), order("ORD2", "U2"), order("ORD3")]})
+    repo.put({"orders": [order("ORD1", status="cancelled")]})
+
+    assert repo.get("orders", "ORD1")["status"] == "cancelled"
+    assert [row["orderID"] for row in repo.find("orders", "customerID", "U1")] == ["ORD1", "ORD3"]
+    assert [row["orderID"] for row in repo.page("orders", "ORD3", 5, descending=True)] == ["ORD2", "ORD1"]
+    assert [row["orderID"] for row in repo.page("orders", None, 5, field="status", value="active")] == \
+        ["ORD2", "ORD3"]
+    assert repo.maxKeyNumber("orders", "ORD") == 3
+
+    reopened = SqliteRepository("data/parks.db")
+    reopened.load()
+    assert reopened.count("orders") == 3
+    reopened.close()
+
+def test_failed_put_rolls_everything_back(repo):
+    repo.put({"orders": [order("ORD1")]})
+
+    with pytest.raises(TypeError):
+        repo.put({"orders": [order("ORD2")], "payments": [{"paymentID": "PAY1", "amount": object()}]})
+
+    assert repo.get("orders", "ORD2") is None and repo.count("payments") == 0
+    # the connection is usable again
+    repo.put({"orders": [order("ORD2")]})
+    assert repo.count("orders") == 2
+
+def test_replace_all_takes_the_write_lock_and_rolls_back(repo, monkeypatch):
+    repo.put({"orders": [order("ORD1"), order("ORD2")]})
+    locked = []
+    monkeypatch.setattr(repo, "refresh", lambda: locked.append(repo.writeLock.depth))
+
+    repo.replaceAll("orders", [order("ORD3")])
+    assert locked == [1]
+    assert [row["orderID"] for row in repo.all("orders")] == ["ORD3"]
+
+    with pytest.raises(TypeError):
+        repo.replaceAll("orders", [order("ORD4"), {"orderID": "ORD5", "bad": object()}])
+    assert [row["orderID"] for row in repo.all("orders")] == ["ORD3"]
+
+def test_migrate_copies_every_collection_and_the_statistics(openSystem):
+    # changes still in the journal are migrated too
+    system = openSystem()
+    for n in range(3):
+        system.checkout(Customer(f"U{n}"), [dict(ticket(), type="ticket"), {"type": "merch", "name": "totebag", "qty": 1}])
+    expected = {name: system.repo.count(name) for name in system.repo.data}
+    statistics = json.loads(json.dumps(system.repo.getStatistics()))
+    system.repo.close()
+
+    counts = migrate("data/parks.db")
+
+    repo = SqliteRepository("data/parks.db")
+    repo.load()
+    assert {name: counts[name] for name in expected} == expected
+    assert {name: repo.count(name) for name in expected} == expected
+    assert expected["orders"] == 3
+    migrated = repo.getStatistics()
+    for key in ("totalOrders", "totalRevenue", "itemsSold", "byPark", "byDay"):
+        assert migrated[key] == statistics[key]
+    repo.close()
+
+def test_controller_runs_on_sqlite(openSystem):
+    migrate("data/parks.db")
+    system = openSystem("sqlite")
+
+    orderID = system.checkout(Customer("U1"), [dict(ticket(qty=2), type="ticket")])["orderID"]
+
+    restarted = openSystem("sqlite")
+    assert restarted.getOrder(orderID)["customerID"] == "U1"
+    assert restarted.ticketAvailability("Meadow Basin", "2027-01-01", "Adult") == 98
@@ -0,0 +1,76 @@
+"""Running statistics: updated per sale, taken back out on cancellation."""
+from datetime import date
+
+from conftest import Customer, ticket
+from models.Statistic import Statistic
+
+# ---------------------------------------------
+# Statistic
+# ---------------------------------------------
+def test_sale_is_added_to_every_bucket():
+    statistic = Statistic()
+    statistic.recordSale("Adult", 2, 10.0, "2027-01-01T09:30:00", parkName="Meadow Basin", ticketName="Adult")
+    statistic.recordSale("Tote Bag", 1, 32.0, "2027-01-01T14:00:00", category="Accessories")
+
+    assert statistic.totalRevenue == 42.0
+    assert statistic.getBucket("byDay", "2027-01-01") == {"revenue": 42.0, "items": 3}
+    assert statistic.getBucket("byHour", "2027-01-01T09") == {"revenue": 10.0, "items": 2}
+    assert statistic.getBucket("byPark", "Meadow Basin") == {"revenue": 10.0, "items": 2}
+    assert statistic.getBucket("byCategory", "Accessories") == {"revenue": 32.0, "items": 1}
+    assert statistic.getTopSellers() == [("Adult", 2), ("Tote Bag", 1)]
+
+def test_changes_hold_the_absolute_values_since_the_last_call():
+    statistic = Statistic()
+    statistic.recordSale("Adult", 2, 10.0, "2027-01-01")
+    statistic.takeChanges()
+    statistic.recordSale("Adult", 1, 5.0, "2027-01-01")
+
+    changes = statistic.takeChanges()
+
+    assert changes == {"totalRevenue": 15.0, "byDay": {"2027-01-01": {"revenue": 15.0, "items": 3}},
+                       "byHour": {"2027-01-01T00": {"revenue": 15.0, "items": 3}},
+                       "itemsSold": {"Adult": 3}}
+    assert statistic.takeChanges() == {}
+
+def test_top_sellers_follow_sales_and_cancellations():
+    statistic = Statistic(topK=2)
+    for name, qty in [("a", 5), ("b", 3), ("c", 1)]:
+        statistic.recordSale(name, qty, qty, "2027-01-01")
+    assert statistic.getTopSellers() == [("a", 5), ("b", 3)]
+
+    statistic.recordSale("c", 4, 4, "2027-01-01")
+    assert statistic.getTopSellers() == [("c", 5), ("a", 5)]
+
+    statistic.recordSale("a", 5, 5, "2027-01-01", sign=-1)
+    assert statistic.getTopSellers() == [("c", 5), ("b", 3)]
+
+# ---------------------------------------------
+# Through the controller
+# ---------------------------------------------
+def test_cancellation_takes_the_order_back_out(system):
+    before = system.getDashboard()
+    today = str(date.today())
+    result = system.checkout(Customer("U1"), [dict(ticket(qty=2, price=7.5), type="ticket"),
+                                              {"type": "merch", "name": "totebag", "qty": 1}])
+    sold = system.getDashboard()
+    assert sold["totalOrders"] == before["totalOrders"] + 1
+    assert sold["totalRevenue"] == before["totalRevenue"] + 47.0
+    assert system.statistic.getBucket("byDay", today)["items"] == \
+        before["today"]["items"] + 3
+
+    assert system.cancelTicket(result["orderID"], None)
+
+    after = system.getDashboard()
+    assert after["totalRevenue"] == before["totalRevenue"]
+    assert after["cancelledOrders"] == before["cancelledOrders"] + 1
+    assert after["byPark"].get("Meadow Basin", {"revenue": 0, "items": 0}) == \
+        before["byPark"].get("Meadow Basin", {"revenue": 0, "items": 0})
+    assert after["byCategory"].get("Accessories", {"revenue": 0, "items": 0}) == \
+        before["byCategory"].get("Accessories", {"revenue": 0, "items": 0})
+
+def test_statistics_are_shared_with_restarts_and_other_workers(openSystem):
+    first, second = openSystem(), openSystem()
+    first.checkout(Customer("U1"), [dict(ticket(qty=3), type="ticket")])
+
+    assert second.getDashboard()["byTicketType"]["Adult"] == {"revenue": 15.0, "items": 3}
+    assert openSystem().getDashboard()["totalOrders"] == first.getDashboard()["totalOrders"]
@@ -0,0 +1,103 @@
+"""Several worker processes sharing one journal (each repository stands for one process)."""
+import threading
+
+import pytest
+
+from storage.Journal import Journal
+from storage.JsonRepository import JsonRepository
+
+@pytest.fixture
+def openRepository(dataFolder):
+    opened = []
+
+    def open():
+        files = {"orders": "data/orders.json", "statistics": "data/statistics.json"}
+        repo = JsonRepository(files, Journal("data/journal.log"), "data/.write.lock")
+        repo.load()
+        opened.append(repo)
+        return repo
+
+    yield open
+    for repo in opened:
+        repo.close()
+
+def order(n):
+    return {"orderID": f"ORD{n}", "customerID": "U1", "date": "2026-05-01", "status": "active"}
+
+def orderIDs(repo):
+    return sorted(row["orderID"] for row in repo.all("orders"))
+
+def test_start_during_another_workers_compaction_loses_nothing(openRepository):
+    first = openRepository()
+    for n in (1, 2, 3):
+        first.put({"orders": [order(n)]})
+
+    # first's compaction has rotated the log and is slow to write the files it captured
+    rotated, release = threading.Event(), threading.Event()
+    writeFiles = first._writeFiles
+
+    def slowWrite(*args):
+        rotated.set()
+        release.wait(5)
+        writeFiles(*args)
+
+    first._writeFiles = slowWrite
+    compaction = threading.Thread(target=first.compact)
+    compaction.start()
+    assert rotated.wait(5)
+    first.put({"orders": [order(4)]})
+
+    # a worker starting now sees the rotated log, but must not snapshot over the compaction
+    second = openRepository()
+    second.put({"orders": [order(5)]})
+    release.set()
+    compaction.join()
+
+    assert orderIDs(openRepository()) == ["ORD1", "ORD2", "ORD3", "ORD4", "ORD5"]
+
+def test_a_compaction_that_died_is_finished_at_load(openRepository, dataFolder):
+    first = openRepository()
+    first.put({"orders": [order(1)]})
+    first.journal.rotate(lambda: None)     # and then the process died
+    first.put({"orders": [order(2)]})
+
+    second = openRepository()
+
+    assert orderIDs(second) == ["ORD1", "ORD2"]
+    assert not (dataFolder / "data" / "journal.log.1").exists()
+    assert orderIDs(openRepository()) == ["ORD1", "ORD2"]
+
+def test_follower_reloads_after_another_worker_snapshots(openRepository):
+    first, second = openRepository(), openRepository()
+    for n in (1, 2, 3):
+        first.put({"orders": [order(n)]})
+
+    # the log starts again, and soon holds more bytes than first has already read
+    second.snapshot()
+    second.put({"orders": [dict(order(4), note="x" * 1000)]})
+
+    first.refresh()
+    assert orderIDs(first) == ["ORD1", "ORD2", "ORD3", "ORD4"]
+    first.put({"orders": [order(5)]})
+    assert orderIDs(openRepository()) == ["ORD1", "ORD2", "ORD3", "ORD4", "ORD5"]
+
+def test_follower_reloads_if_the_rotated_log_disappears_while_read(openRepository):
+    first, second = openRepository(), openRepository()
+    first.put({"orders": [order(1)]})
+    second.refresh()
+    captured = first.journal.rotate(lambda: {"orders": first.all("orders").copy()})
+    first.put({"orders": [order(2)]})
+
+    # the compaction finishes between second's look at the logs and its read
+    readFrom = second.journal._readFrom
+
+    def finishing(path, offset):
+        first._writeFiles(captured)
+        first.journal.finishCompaction()
+        return readFrom(path, offset)
+
+    second.journal._readFrom = finishing
+    second.refresh()
+    second.journal._readFrom = readFrom
+
+    assert orderIDs(second) == ["ORD1", "ORD2"]
@@ -0,0 +1,129 @@
+"""Write-behind: WriteBehindQueue and JsonRepository's write-behind mode."""
+import json
+
+import pytest
+
+from storage.JsonRepository import JsonRepository
+from storage.WriteBehind import WriteBehindQueue
+
+# ---------------------------------------------
+# WriteBehindQueue
+# ---------------------------------------------
+class Recorder:
+    """A flush() that records its batches; fails while `error` is set."""
+
+    def __init__(self):
+        self.batches = []
+        self.error = None
+
+    def __call__(self, items):
+        if self.error is not None:
+            raise self.error
+        self.batches.append(items)
+
+def test_lazy_items_are_written_together():
+    flush = Recorder()
+    queue = WriteBehindQueue(flush, maxDelay=0.2)
+    tickets = [queue.submit(n) for n in range(5)]
+    assert flush.batches == []
+
+    queue.wait(tickets[-1])
+
+    assert flush.batches == [[0, 1, 2, 3, 4]]
+    queue.close()
+
+def test_urgent_item_is_written_at_once():
+    flush = Recorder()
+    queue = WriteBehindQueue(flush, maxDelay=60)
+    queue.submit("lazy")
+
+    queue.wait(queue.submit("urgent", urgent=True))
+
+    assert flush.batches == [["lazy", "urgent"]]
+    queue.close()
+
+def test_failed_flush_reaches_its_waiters_and_is_retried():
+    flush = Recorder()
+    flush.error = OSError("disk full")
+    queue = WriteBehindQueue(flush, maxDelay=0.05)
+
+    with pytest.raises(OSError):
+        queue.wait(queue.submit("order", urgent=True))
+    assert queue.metrics()["failures"] >= 1
+
+    flush.error = None
+    queue.wait(queue.submit("later", urgent=True))
+
+    assert [item for batch in flush.batches for item in batch] == ["order", "later"]
+    queue.close()
+
+def test_close_writes_everything_queued():
+    flush = Recorder()
+    queue = WriteBehindQueue(flush, maxDelay=60)
+    for n in range(3):
+        queue.submit(n)
+
+    queue.close()
+
+    assert [item for batch in flush.batches for item in batch] == [0, 1, 2]
+    with pytest.raises(RuntimeError):
+        queue.submit(3)
+
+# ---------------------------------------------
+# JsonRepository
+# ---------------------------------------------
+@pytest.fixture
+def openRepository(dataFolder):
+    opened = []
+
+    def open():
+        repo = JsonRepository({"orders": "data/orders.json", "catalog": "data/catalog.json",
+                               "statistics": "data/statistics.json"},
+                              lockPath="data/.write.lock", writeBehind=True,
+                              durability={"orders": "sync", "catalog": "lazy"}, maxDelay=60)
+        repo.load()
+        opened.append(repo)
+        return repo
+
+    yield open
+    for repo in opened:
+        repo.close()
+
+def stored(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+def order(orderID):
+    return {"orderID": orderID, "customerID": "U1", "status": "active"}
+
+def test_sync_collections_are_on_disk_when_put_returns(openRepository):
+    repo = openRepository()
+    repo.put({"orders": [order("ORD1")]})
+
+    assert [row["orderID"] for row in stored("data/orders.json")] == ["ORD1"]
+
+def test_lazy_collections_are_written_by_close(openRepository):
+    repo = openRepository()
+    row = dict(repo.get("catalog", "totebag"), stock=7)
+    repo.put({"catalog": [row]})
+    assert repo.get("catalog", "totebag")["stock"] == 7
+
+    repo.close()
+
+    assert {row["catalogID"]: row["stock"] for row in stored("data/catalog.json")}["totebag"] == 7
+
+def test_failed_write_of_a_sync_put_is_raised(openRepository, monkeypatch):
+    repo = openRepository()
+    writeFiles = repo._writeFiles
+
+    def failOnce(*args):
+        monkeypatch.setattr(repo, "_writeFiles", writeFiles)
+        raise OSError("disk full")
+    monkeypatch.setattr(repo, "_writeFiles", failOnce)
+
+    with pytest.raises(OSError):
+        repo.put({"orders": [order("ORD1")]})
+
+    # retried by the writer thread; the next sync put waits for it too
+    repo.put({"orders": [order("ORD2")]})
+    assert [row["orderID"] for row in stored("data/orders.json")] == ["ORD1", "ORD2"]
@@ -0,0 +1,296 @@
+"""
+Bulk import / export of orders, tickets and users, as CSV or JSON Lines.
+
+    python -m tools.bulk import tickets partner_sales.csv
+    python -m tools.bulk import orders orders.jsonl
+    python -m tools.bulk import users users.csv
+    python -m tools.bulk export orders season.csv [--from 2026-01-01] [--to 2026-12-31]
+    python -m tools.bulk export tickets - --format jsonl      (to stdout)
+    python -m tools.bulk export users users.csv [--with-passwords]
+
+Run it from the StateNationalParks folder. The format comes from the file
+extension (.csv, .jsonl / .ndjson) unless --format is given; "-" reads
+stdin / writes stdout. Files are streamed, nothing is loaded whole: exports
+read the collections a page (config.BULK_BATCH_SIZE rows) at a time.
+User exports leave out the password hashes unless --with-passwords is given.
+
+Import record fields:
+- tickets: customerID, parkName, visitDate, ticketName, qty, price and
+  optionally date (sale date) and orderRef (consecutive rows with the
+  same orderRef become one order; otherwise one order per row)
+- orders (JSON Lines): customerID, date, items - a list of checkout cart
+  lines ({"type": "ticket", ...} / {"type": "merch", "name", "qty"})
+- users: username, password (plaintext or already hashed), email,
+  fullName, customerType, isAdmin
+Records are written config.BULK_BATCH_SIZE at a time, each batch in one
+transaction (see SystemController.importOrders / AuthManager.importUsers).
+Invalid records are skipped and listed at the end (numbered from 1 in the
+order they were read; for tickets, one number per order). Orders must be
+for a registered customer (customerID of a stored user) and their tickets
+for one of config.PARKS.
+In plain "json" storage mode every batch rewrites the whole data files:
+import big files in "journal" or "sqlite" mode (or with a bigger --batch-size).
+In "journal" mode the journal written by the import is compacted into the
+data files at the end, so the next start does not replay it.
+"""
+import argparse
+import csv
+import gc
+import json
+import sys
+import time
+import config
+
+# columns written by export (JSON Lines rows keep every field)
+EXPORT_FIELDS = {
+    "orders": ["orderID", "customerID", "date", "createdAt", "status", "total", "items", "paymentID"],
+    "tickets": ["itemID", "orderID", "name", "quantity", "unitPrice", "visitDate", "parkName",
+                "ticketName"],
+    "merch": ["itemID", "orderID", "catalogID", "name", "quantity", "unitPrice", "category"],
+    "payments": ["paymentID", "orderID", "amount", "status"],
+    "receipts": ["receiptID", "orderID", "paymentID", "dateIssued"],
+    "reviews": ["reviewID", "customerID", "rating", "comment", "date"],
+    "users": ["userID", "username", "email", "fullName", "isAdmin", "customerType"],
+}
+
+# only exported when asked for (--with-passwords)
+SECRET_FIELDS = {"users": ["password"]}
+
+IMPORT_KINDS = ["tickets", "orders", "users"]
+
+# ---------------------------------------------
+# Reading and writing records
+# ---------------------------------------------
+def formatOf(path, fmt=None):
+    if fmt:
+        return fmt
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path}, use --format csv or jsonl")
+
+def _open(path, mode):
+    if path == "-":
+        return sys.stdin if mode == "r" else sys.stdout
+    return open(path, mode, newline="", encoding="utf-8")
+
+def readRecords(path, fmt=None):
+    """Yields one dict per CSV row / JSON line."""
+    fmt = formatOf(path, fmt) if path != "-" else (fmt or "jsonl")
+    source = _open(path, "r")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+def writeRecords(path, rows, fields, fmt=None):
+    """Writes rows (an iterable of dicts) and returns how many were written."""
+    fmt = formatOf(path, fmt) if path != "-" else (fmt or "jsonl")
+    target = _open(path, "w")
+    count = 0
+    try:
+        if fmt == "csv":
+            writer = csv.DictWriter(target, fields, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            dumps = json.JSONEncoder(separators=(",", ":")).encode
+            for row in rows:
+                target.write(dumps(row) + "\n")
+                count += 1
+    finally:
+        if target is not sys.stdout:
+            target.close()
+    return count
+
+def ticketOrders(records):
+    """Turns flat ticket records into order records (consecutive rows with the same orderRef are one order)."""
+    order, orderRef = None, None
+    for record in records:
+        line = {
+            "type": "ticket",
+            "ticketName": record.get("ticketName"),
+            "price": record.get("price"),
+            "qty": record.get("qty"),
+            "visitDate": record.get("visitDate"),
+            "parkName": record.get("parkName"),
+        }
+        if order is not None and orderRef and record.get("orderRef") == orderRef:
+            order["items"].append(line)
+            continue
+
+        if order is not None:
+            yield order
+        order = {"customerID": record.get("customerID"), "date": record.get("date") or None,
+                 "items": [line]}
+        orderRef = record.get("orderRef")
+
+    if order is not None:
+        yield order
+
+# ---------------------------------------------
+# Library entry points
+# ---------------------------------------------
+def importFile(kind, path, fmt=None, system=None, auth=None, batchSize=None):
+    """Imports a file of tickets, orders or users. Returns the summary of the import."""
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"Cannot import {kind}, only {', '.join(IMPORT_KINDS)}")
+    system, auth = connect(system, auth)
+
+    records = readRecords(path, fmt)
+    gcWasEnabled = gc.isenabled()
+    gc.disable()    # millions of new rows would trigger many useless collections
+    try:
+        if kind == "users":
+            return auth.importUsers(records, batchSize)
+        if kind == "tickets":
+            records = ticketOrders(records)
+        return system.importOrders(records, batchSize)
+    finally:
+        if gcWasEnabled:
+            gc.enable()
+        compactJournal(system.repo)
+
+def compactJournal(repo):
+    """Folds the journal into the data files (journal storage mode only)."""
+    if getattr(repo, "journal", None) is not None:
+        repo.compact()
+
+def exportFile(kind, path, fmt=None, since=None, until=None, system=None, auth=None,
+               withPasswords=False):
+    """
+    Writes a collection to a file. Orders get their total and item count;
+    since / until (ISO dates) limit orders, tickets and merch to orders sold in that period.
+    Password hashes are only written with withPasswords=True.
+    Returns the number of rows written.
+    """
+    if kind not in EXPORT_FIELDS:
+        raise ValueError(f"Cannot export {kind}, only {', '.join(EXPORT_FIELDS)}")
+    system, auth = connect(system, auth)
+    fields = EXPORT_FIELDS[kind]
+    if kind == "users":
+        rows = pages(auth.repo, "users")
+        if withPasswords:
+            fields = fields + SECRET_FIELDS[kind]
+        else:
+            # JSON Lines rows keep every field, so the secrets are taken out of the rows
+            rows = ({field: value for field, value in row.items() if field not in SECRET_FIELDS[kind]}
+                    for row in rows)
+        return writeRecords(path, rows, fields, fmt)
+
+    rows = pages(system.repo, kind)
+    if kind in ("orders", "tickets", "merch"):
+        rows = _exportSales(system, kind, rows, since, until)
+    return writeRecords(path, rows, fields, fmt)
+
+def pages(repo, name, batchSize=None):
+    """Yields every row of a collection, read a page at a time (storage order)."""
+    batchSize = batchSize or config.BULK_BATCH_SIZE
+    after = None
+    while True:
+        rows = repo.page(name, after, batchSize)
+        yield from rows
+        if len(rows) < batchSize:
+            return
+        after = rows[-1][repo.KEYS[name]]
+
+def _exportSales(system, kind, rows, since, until):
+    last = {"orderID": None, "order": None}
+
+    def lookup(orderID):
+        # the items of an order are stored next to each other: the last order looked up is kept
+        if last["orderID"] != orderID:
+            last["orderID"], last["order"] = orderID, system.repo.get("orders", orderID)
+        return last["order"]
+
+    def sold(order):
+        return order is not None and (not since or order["date"] >= since) and \
+            (not until or order["date"] <= until)
+
+    if kind != "orders":
+        if not (since or until):
+            return rows
+        return (row for row in rows if sold(lookup(row.get("orderID"))))
+
+    def withTotal(order):
+        # items are found through the orderID index, one order at a time
+        items = system.getOrderItems(order["orderID"])
+        total = round(sum(item["quantity"] * item["unitPrice"] for item in items), 2)
+        return dict(order, total=order.get("total", total), items=len(items))
+
+    return (withTotal(order) for order in rows if sold(order))
+
+def connect(system=None, auth=None):
+    """
+    Returns (system, auth) set up like app.py: one repository and ID
+    allocator shared by users and the rest of the data.
+    """
+    if system is not None and auth is not None:
+        return system, auth
+
+    from controllers.SystemController import SystemController
+    from models.AuthManager import AuthManager
+    from storage.IDAllocator import IDAllocator
+    from storage.RepositoryFactory import createRepository
+
+    given = system or auth
+    repo = given.repo if given else createRepository()
+    ids = given.ids if given else IDAllocator(config.COUNTER_FILE, config.ID_BLOCK_SIZE)
+    return (system or SystemController(repo=repo, ids=ids),
+            auth or AuthManager(repo=repo, ids=ids))
+
+# ---------------------------------------------
+# Command line
+# ---------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import / export (CSV or JSON Lines)")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("kind", help=f"import: {', '.join(IMPORT_KINDS)}; export: {', '.join(EXPORT_FIELDS)}")
+    parser.add_argument("path", help="file to read / write, - for stdin / stdout")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--batch-size", type=int, default=config.BULK_BATCH_SIZE)
+    parser.add_argument("--from", dest="since", help="export: first sale date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="until", help="export: last sale date (YYYY-MM-DD)")
+    parser.add_argument("--with-passwords", action="store_true",
+                        help="export users: include the password hashes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    system, auth = connect()
+    # messages go to stderr, so exports to stdout stay clean
+    print(f"Loaded the data in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    start = time.perf_counter()
+    try:
+        if args.action == "export":
+            count = exportFile(args.kind, args.path, args.format, args.since, args.until, system, auth,
+                               args.with_passwords)
+            print(f"Exported {count} {args.kind} in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+            return
+
+        summary = importFile(args.kind, args.path, args.format, system, auth, args.batch_size)
+    finally:
+        system.repo.close()
+
+    rejected = summary.pop("rejected")
+    done = ", ".join(f"{count} {name}" for name, count in summary.items())
+    print(f"Imported {done} in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    if rejected:
+        print(f"Skipped {len(rejected)} records:", file=sys.stderr)
+        for entry in rejected[:20]:
+            print(f"  record {entry['record']}: {entry['error']}", file=sys.stderr)
+        if len(rejected) > 20:
+            print(f"  ... and {len(rejected) - 20} more", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Copies the JSON data files (and any pending journal) into SQLite.
+
+    python -m tools.migrate [--db data/parks.db]
+
+Run it from the StateNationalParks folder, then start the app with
+SNP_STORAGE_MODE=sqlite.
+Every journal is compacted into the data files first: the app's
+(config.JOURNAL_FILE) and the one of a standalone AuthManager
+(journal.users.log), so no change written in "journal" mode is left out.
+"""
+import argparse
+import os
+import config
+from storage.Journal import Journal
+from storage.JsonRepository import JsonRepository
+from storage.SqliteRepository import SqliteRepository
+
+def migrate(dbPath, files=None, journalFile=None):
+    """Imports every collection and the statistics. Returns row counts per collection."""
+    files = files or config.DATA_FILES
+    compactJournals(files, journalFile or config.JOURNAL_FILE)
+
+    source = JsonRepository(files)
+    source.load()
+
+    target = SqliteRepository(dbPath)
+    target.load()
+
+    counts = {}
+    for name in source.data:
+        rows = source.all(name)
+        target.replaceAll(name, rows)
+        counts[name] = len(rows)
+
+    target.snapshot(source.getStatistics())
+    source.close()
+    target.close()
+    return counts
+
+def compactJournals(files, journalFile):
+    """Folds every journal into the data files it belongs to."""
+    journals = [
+        # users written by a standalone AuthManager (see AuthManager.__init__)
+        (journalFile.replace(".log", ".users.log"), {"users": files["users"]}),
+        # then the app's, which may hold newer versions of the same users
+        (journalFile, files),
+    ]
+    for path, journalFiles in journals:
+        if os.path.exists(path) or os.path.exists(path + ".1"):
+            repo = JsonRepository(journalFiles, Journal(path))
+            repo.load()
+            repo.compact()
+            repo.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate data/*.json into SQLite")
+    parser.add_argument("--db", default=config.SQLITE_FILE, help="target SQLite file")
+    args = parser.parse_args()
+
+    counts = migrate(args.db)
+    for name, count in counts.items():
+        print(f"{name}: {count} rows")
+    print(f"Done. Start the app with SNP_STORAGE_MODE=sqlite (database: {args.db})")
+
+if __name__ == "__main__":
+    main()